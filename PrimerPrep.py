@@ -18,6 +18,61 @@
 # © 2026 SIL Global
 #
 # Modifications:
+# 4.03 JCH Oct 2026
+#    Speed up the elimination teaching order calculation (external teaching_order.py module),
+#      indexing graphemes to morphemes/words once and using a priority queue for the next grapheme
+#    Keep a grapheme->words index with the analysis, so drag-and-drop in the teaching order
+#      rebuilds the example word lists without scanning every word for every grapheme
+#    After a drag-and-drop, only recalculate and update the lessons between the old and new positions
+#    For very large word lists, calculate the teaching order with graphemes stored as packed bits (numpy)
+#    Calculate the teaching order in the background, with a progress bar and Cancel button
+#      (and a Recalculate button on the Teaching Order tab, to start it again after cancelling)
+#    Cache how words and morphemes split into graphemes (saved with the project), and only
+#      split them again if the digraphs or the combining diacritics setting change
+#    Add Compare Strategies, to show the teaching orders of both strategies and all counting
+#      options side by side (calculated in parallel worker processes)
+#    Add Optimize, a local search (in parallel worker processes, for a limited time) for a teaching
+#      order in which more words can be read sooner
+#    Add a batch mode (PrimerPrep.py --batch config.ini ...), which loads texts and lexicons, applies
+#      the digraphs and affixes from the config file, and writes out the teaching order and word list
+#      without any user interface (GTK is not even imported)
+#    Read texts in a single streaming pass (SFM markers matched with precompiled RegExes), finding
+#      the characters and counting the words a chunk of lines at a time
+#    Add Text(s) reads and analyzes the files in parallel worker processes (text_import.py module),
+#      adding the results in file order so they are the same as loading the files one at a time
+#    Keep the word counts of each text, so a text can be removed (new Remove Text button), and
+#      after changing the word-breaking characters only the texts using those characters are reprocessed
+#    Store the lines of each text compactly (corpus.py module), as one UTF-8 buffer and the offsets
+#      of the lines, which takes much less memory and makes projects smaller and faster to save/load
+#    Add a Keep texts on disk option, for very large collections of texts: the (NFD) text of each file
+#      is written once to a cache file in a folder next to the project, and read through mmap
+#    Check the encoding (composed/decomposed characters) and convert to NFD in a single pass, using the
+#      quick checks of unicodedata.is_normalized; the encoding warning names the files with each form
+#    Count how often each character is used (shown in the Word Breaks dialog), and keep the counts of
+#      each text, so treating combining diacritics separately (or not) doesn't read all the texts again
+#    Split text into words with one tokenizer (text_import.WordTokenizer), compiled when the word-breaking
+#      characters change, and shared by the word counts, the concordance, the phrases and the lesson texts
+#    Keep the texts split into words (as arrays of token ids), so the concordance and the phrases
+#      don't split all the texts again each time; after changing the word-breaking characters
+#      only the lines using those characters are split again
+#    Index where each word is used in the tokenized texts, so the concordance of a word is found
+#      without looking through all the texts
+#    For the phrases of a row of the teaching order, rank each word by the row from which it can be read,
+#      and each pair of words used together by the higher of their rows, so the phrases of any row are
+#      found straight away
+#    Added a list of the decodable sentences (the sentences of the texts that can be read at each lesson,
+#      longest first) to the Teaching Order and Lesson Texts tabs, which can be exported to a text file.
+#      The sentences are ranked by their words in one pass over the texts
+#    The concordance of a word and the phrases of a lesson are shown a page at a time as they are found,
+#      with a running count of the occurrences and a button to stop the search
+#    Added File > Save Concordances, to save the concordances of all the words shown in the word list
+#      (as tab separated text, or as a web page), written to the file as they are found
+#    Keep the syllabified example words (and the positions of their letters) for the position filters,
+#      until the graphemes, vowels or syllable options change, instead of syllabifying them for every update
+#    Index the words that use each letter by the positions of the letter in them, so the position filters
+#      only need a set lookup for each example word
+#    Increase the dataModelVersion to 4 (texts stored as corpus.TextLines, word and character counts
+#      of each text, tokenizer and caches), handle loading old data
 # 4.02 JCH Jun 2026
 #    Additional tweaks for teaching order row height issues
 # 4.01 JCH Jun 2026
@@ -179,9 +234,9 @@
 #       (commas considered vowel marks in Scheherazade Compact with Graphite)
 
 APP_NAME = "PrimerPrep"
-progVersion = "4.02"
+progVersion = "4.03"
 progYear = "2026"
-dataModelVersion = 3
+dataModelVersion = 4
 DEBUG = False
 
 import sys
@@ -194,9 +249,13 @@ else:
 if sys.version_info[0] < 3:
     logger.error('This script requires Python 3')
     exit()
-from gi import require_version
-require_version('Gtk', '3.0')
-from gi.repository import Gtk, Gdk, GdkPixbuf, Pango, GLib
+# in batch mode (--batch) we run the analysis without any user interface, so don't even import GTK
+# (this also applies to worker processes, which get the same command line arguments)
+BATCH_MODE = '--batch' in sys.argv[1:]
+if not BATCH_MODE:
+    from gi import require_version
+    require_version('Gtk', '3.0')
+    from gi.repository import Gtk, Gdk, GdkPixbuf, Pango, GLib
 import os
 import subprocess
 import platform
@@ -205,9 +264,20 @@ import codecs
 import unicodedata
 import xml.etree.ElementTree as ET
 import pickle
+import copy
+import html
+import itertools
+import threading
+import multiprocessing
+import tempfile
+import shutil
+import atexit
 class UnknownProjectType(Exception):
     pass
 import numpy as np
+import teaching_order
+import text_import
+import corpus
 import configparser
 import webbrowser
 #  for internationalization
@@ -240,6 +310,11 @@ myGlobalConfigFile = ''
 myGlobalConfig = configparser.ConfigParser()
 # global variable for holding the page index of the GTK notebook
 myGlobalNotebookPage = 0
+# global variable for the SFM markers to ignore/process in batch mode (from the batch config file),
+# a tuple of two '|' separated strings (ignore, only), or None to use the same defaults as the dialog
+myGlobalBatchSFMLines = None
+# global variable for the temporary folder that texts are kept on disk in, for a project that hasn't been saved yet
+myGlobalTempCacheFolder = None
 
 
 # defaults for global CSS (Cascading Style Sheets) formatting
@@ -262,6 +337,13 @@ notebook tab:checked {
 # present a message to the user
 def SimpleMessage(title, msgType, msg):
     global myGlobalBuilder
+    if BATCH_MODE:
+        # no dialogs in batch mode, just log the message
+        if msgType == 'dialog-error':
+            logger.error('{}: {}'.format(title, msg))
+        else:
+            logger.warning('{}: {}'.format(title, msg))
+        return
     dlg = myGlobalBuilder.get_object('simpleMessageDialog')
     dlg.set_title(title)
     myGlobalBuilder.get_object('simpleMessageImage').set_from_icon_name(msgType, Gtk.IconSize.DIALOG)
@@ -321,6 +403,62 @@ def SimpleYNQuestion(title, msgType, msg):
     dlg.hide()
     return (response == 1)
 
+# write out a text file (word list or teaching order), used by the main window and by batch mode
+def WriteTextFile(filename, filetext, containsNFC, containsNFD):
+    '''Write the given text (a word list or teaching order) to the given file, in the same
+    normalization form as the input data. User will be notified of any errors in writing the file.
+    
+    Parameters: filename (str) - full file name/path
+                filetext (str) - multiline string of contents of file to write, or an iterable
+                                 of the parts of it (e.g. lines), which are written one at a time
+                containsNFC, containsNFD (bool) - whether the input data had composed/decomposed characters
+    Return value: True if the file was written
+    '''
+    logger.debug('Saving as: %s', filename)
+    
+    if isinstance(filetext, str):
+        filetext = [filetext]
+    writeNFC = False
+    if containsNFC:
+        if not containsNFD:
+            # the data needs to be written out in NFC format
+            writeNFC = True
+        else:
+            # warn the user that data is written out decomposed
+            title = _("Encoding error")
+            msg = _("""Warning: This is a reminder that your input data has inconsistent encoding,
+with some characters composed and some decomposed. This data will be saved in
+decomposed format, which may be different than your original source files.""")
+            SimpleMessage(title, 'dialog-warning', msg)
+    try:
+        with open(filename, 'w', encoding='utf-8') as save_file:
+            try:
+                # write a byte-order mark (BOM) for better file identification
+                save_file.write('\ufeff')
+                for text in filetext:
+                    if writeNFC:
+                        text = unicodedata.normalize('NFC', text)
+                    save_file.write(text)
+            except BaseException:
+                # don't leave a half-written file (errors in making the text, rather than
+                # writing it, are passed on to the caller as they are)
+                save_file.close()
+                try:
+                    os.remove(filename)
+                except OSError:
+                    pass
+                raise
+    except (OSError, UnicodeError) as e:
+        if BATCH_MODE:
+            # there is no one to ask, so say which file and why
+            logger.error('Error writing {}: {}'.format(filename, e))
+            return False
+        title = _("Error")
+        msg = _("Error. File could not be written.")
+        SimpleMessage(title, 'dialog-error', msg)
+        return False
+    return True
+
 
 # Default set of vowel characters for syllabification.
 # Users can extend this in future by adding a UI for vowel definition.
@@ -444,6 +582,68 @@ def process_syllables(graphemes, letter, vowel_graphemes=None,
     matches = any(f and p for f, p in zip(syllable_filters, positions))
     return (matches, syllabified)
 
+def syllable_positions(syllabified):
+    '''Find the positions of all the occurrences of each grapheme in a syllabified word.
+
+    The position of an occurrence is a number from 0 to 63, with a bit for each position it is in:
+    syllable initial (32), syllable medial (16), syllable final (8), word initial (4),
+    word medial (2) and word final (1).
+
+    Parameters:
+      syllabified          - grapheme list with "." at syllable boundaries (from process_syllables)
+
+    Returns a dict of { grapheme: int } with the bit (1 << position) set for the position
+    of each occurrence of the grapheme
+    '''
+    positions = {}
+    n_orig = sum(1 for g in syllabified if g != '.')
+    m = len(syllabified)
+    oi = 0  # original grapheme index (incremented for each non-"." element)
+    for si, g in enumerate(syllabified):
+        if g == '.':
+            continue
+        # a "." or the word boundary means syllable initial or final
+        is_syl_init = (si == 0 or syllabified[si - 1] == '.')
+        is_syl_fin  = (si == m - 1 or syllabified[si + 1] == '.')
+        is_syl_med  = not is_syl_init and not is_syl_fin
+        is_word_init = (oi == 0)
+        is_word_fin  = (oi == n_orig - 1)
+        is_word_med  = not is_word_init and not is_word_fin
+        position = (is_syl_init << 5 | is_syl_med << 4 | is_syl_fin << 3 |
+                    is_word_init << 2 | is_word_med << 1 | is_word_fin)
+        positions[g] = positions.get(g, 0) | (1 << position)
+        oi += 1
+    return positions
+
+def position_filter_mask(position_filters):
+    '''Find the positions (see syllable_positions) of the occurrences that pass the position filters.
+    A single occurrence must pass both the syllable and the word position filter, and a filter
+    with all (or none) of its positions selected passes everything.
+
+    Parameters:
+      position_filters     - 6-tuple of booleans (syl_initial, syl_medial, syl_final,
+                             word_initial, word_medial, word_final)
+
+    Returns an int with the bit (1 << position) set for each position that passes the filters
+    '''
+    syl_part    = position_filters[:3]
+    word_part   = position_filters[3:]
+    syl_active  = not all(syl_part) and any(syl_part)
+    word_active = not all(word_part) and any(word_part)
+    mask = 0
+    for position in range(64):
+        syl_ok  = (not syl_active or
+                   (syl_part[0] and position & 32) or
+                   (syl_part[1] and position & 16) or
+                   (syl_part[2] and position & 8))
+        word_ok = (not word_active or
+                   (word_part[0] and position & 4) or
+                   (word_part[1] and position & 2) or
+                   (word_part[2] and position & 1))
+        if syl_ok and word_ok:
+            mask |= 1 << position
+    return mask
+
 
 class VernacularRenderer:
     '''A class used to hold vernacular font rendering information
@@ -606,7 +806,13 @@ class WordBreaksDialog:
         self.wordFormStore.set_sort_column_id(0, Gtk.SortType.ASCENDING)
         self.wordFormTreeView.connect("row-activated", self.on_WordForm_doubleClick)
     
-    def Run(self, wordBreakChars, wordFormChars):
+    def Run(self, wordBreakChars, wordFormChars, charCounts):
+        '''Show the word breaking and word forming characters, with how often each is used.
+        
+        Parameters: wordBreakChars, wordFormChars (list of str) - word breaking/forming characters
+                    charCounts (dict) - { char, count } of all characters
+        Return value: True if the user clicked OK
+        '''
         global myGlobalBuilder
         global myGlobalRenderer
         
@@ -623,7 +829,7 @@ class WordBreaksDialog:
                 if unicodedata.category(dispLetter[0]) == 'Mn':
                     # then prepend the dotted circle base character
                     dispLetter = '\u25CC' + dispLetter
-                self.wordBreakStore.append([dispLetter])
+                self.wordBreakStore.append([dispLetter, charCounts.get(letter, 0)])
         
         # clear the store and add each of the letters in the wordFormChars list
         self.wordFormStore.clear()
@@ -633,7 +839,7 @@ class WordBreaksDialog:
             if unicodedata.category(dispLetter[0]) == 'Mn':
                 # then prepend the dotted circle base character
                 dispLetter = '\u25CC' + dispLetter
-            self.wordFormStore.append([dispLetter])
+            self.wordFormStore.append([dispLetter, charCounts.get(letter, 0)])
         
         self.dialog.show_all()
         response = self.dialog.run()
@@ -646,11 +852,11 @@ class WordBreaksDialog:
         Parameters: widget, row - for accessing the active row in the TreeView
         '''
         model = widget.get_model()
-        # Get the letter for this row
-        letter = model[row][0]
+        # Get the letter (and its count) for this row
+        letter, count = model[row][0], model[row][1]
         # remove this letter from the breaking list and add it to the forming list
         self.wordBreakStore.remove(model[row].iter)
-        self.wordFormStore.append([letter])
+        self.wordFormStore.append([letter, count])
         # make sure it is selected and visible
         for row in self.wordFormStore:
             if row[0] == letter:
@@ -664,11 +870,11 @@ class WordBreaksDialog:
         Parameters: widget, row - for accessing the active row in the TreeView
         '''
         model = widget.get_model()
-        # Get the letter for this row
-        letter = model[row][0]
+        # Get the letter (and its count) for this row
+        letter, count = model[row][0], model[row][1]
         # remove this letter from the forming list and add it to the breaking list
         self.wordFormStore.remove(model[row].iter)
-        self.wordBreakStore.append([letter])
+        self.wordBreakStore.append([letter, count])
         # make sure it is selected and visible
         for row in self.wordBreakStore:
             if row[0] == letter:
@@ -963,13 +1169,124 @@ class FilterDialog:
         return options
 
 
+class ConcordancePager:
+    '''A class to fill the ListStore of a concordance a page at a time.
+    
+    The lines of the concordance come from a generator, so that a concordance with
+    many occurrences doesn't have to be found all at once. The first page is shown
+    straight away, and the next pages as the user scrolls to the end of the list.
+    Meanwhile the rest of the lines are collected whenever the application is idle,
+    with a running count of them in the label, until they are all found or the user
+    stops the search.
+    
+    Attributes:
+      listStore (ListStore object) - list that holds the concordance shown
+      adjustment (Adjustment object) - vertical scrolling of the concordance
+      label (Label object) - label for what is concorded and the number of occurrences
+      stopButton (Button object) - button to stop the search
+      lines (list) - the lines of the concordance found so far, as (prefix, item, postfix)
+    '''
+    
+    # number of lines added to the ListStore at a time
+    PAGE_LINES = 200
+    # number of lines collected each time the application is idle
+    IDLE_LINES = 500
+    
+    def __init__(self, listStore, scrolledWindow, label, stopButton):
+        self.listStore = listStore
+        self.adjustment = scrolledWindow.get_vadjustment()
+        self.label = label
+        self.stopButton = stopButton
+        self.lines = []
+        self.numShown = 0
+        self.results = None
+        self.idleSource = None
+        self.labelMarkup = ''
+        # show more lines when the user scrolls down, and stop the search when asked
+        self.adjustment.connect('value-changed', self.on_Scroll)
+        self.stopButton.connect('clicked', self.on_Stop_click)
+    
+    def Start(self, labelMarkup, results):
+        '''Start showing a new concordance.
+        
+        Parameters: labelMarkup (str) - what is concorded (as markup, escape plain text with
+                                        GLib.markup_escape_text), the number of occurrences is added to it
+                    results (iterable) - the lines of the concordance, as (prefix, item, postfix)
+        '''
+        self.Stop()
+        self.listStore.clear()
+        self.lines = []
+        self.numShown = 0
+        self.labelMarkup = labelMarkup
+        self.results = iter(results)
+        # make sure concordance is scrolled to the top
+        self.adjustment.set_value(0)
+        # collect the first lines now, and the rest when idle
+        if self.Collect():
+            self.idleSource = GLib.idle_add(self.Collect)
+            self.stopButton.set_sensitive(True)
+    
+    def Collect(self):
+        '''Collect the next lines of the concordance, and show them if the page isn't full yet.
+        
+        Return value: True if there may be more lines (so keep collecting them)
+        '''
+        numLines = len(self.lines)
+        self.lines.extend(itertools.islice(self.results, self.IDLE_LINES))
+        searching = len(self.lines) - numLines == self.IDLE_LINES
+        if self.numShown < self.PAGE_LINES:
+            self.ShowPage()
+        if not searching:
+            self.results = None
+            self.idleSource = None
+            self.stopButton.set_sensitive(False)
+            self.ShowCount(_(" ({} occurrences)"))
+        else:
+            self.ShowCount(_(" ({} occurrences so far...)"))
+        return searching
+    
+    def Stop(self):
+        '''Stop collecting the lines of the concordance (e.g. when the dialog is closed).'''
+        if self.idleSource is not None:
+            GLib.source_remove(self.idleSource)
+            self.idleSource = None
+        self.results = None
+        self.stopButton.set_sensitive(False)
+    
+    def ShowPage(self):
+        '''Add the next page of the lines collected to the ListStore.'''
+        for line in self.lines[self.numShown:self.numShown + self.PAGE_LINES]:
+            self.listStore.append(line)
+        self.numShown = min(self.numShown + self.PAGE_LINES, len(self.lines))
+    
+    def ShowCount(self, countText):
+        '''Show the number of lines collected in the label.'''
+        global myGlobalWindow
+        label = self.labelMarkup
+        if myGlobalWindow.isRTL:
+            label += '\u200f'
+        self.label.set_markup(label + GLib.markup_escape_text(countText.format(len(self.lines))))
+    
+    def on_Scroll(self, adjustment):
+        # when scrolled to (near) the end of the lines shown, show the next page
+        if self.numShown < len(self.lines) and \
+           adjustment.get_value() + 2 * adjustment.get_page_size() >= adjustment.get_upper():
+            self.ShowPage()
+    
+    def on_Stop_click(self, button):
+        if self.idleSource is not None:
+            self.Stop()
+            self.ShowCount(_(" ({} occurrences, search stopped)"))
+
+
 class WordEditDialog:
     '''WordEditDialog - class to create and run a dialog to edit word info.
     
     Creating an instance of this class creates a dialog which presents
-    a concordance view of the given data. Each line of the data should contain
-    2 tabs, separating the data into 3 columns: prefix, item, postfix. In this
-    way the item being concorded can be aligned in the middle column. A label is
+    a concordance view of the given data. Each line of the data should have
+    3 columns: prefix, item, postfix (the lines are shown a page at a time, see
+    ConcordancePager). In this way the item being concorded can be aligned in
+    the middle column. A label is
     also passed in the __init__ method, so that information on what is being
     concorded can be displayed.
     
@@ -978,6 +1295,7 @@ class WordEditDialog:
       excludeWord (CheckButton object) - checked if the word should be excluded
       divideView (TextView object) - text field where user edits word divisions
       concordanceListStore (ListStore object) - list that holds the concordance
+      pager (ConcordancePager object) - fills the concordance a page at a time
     '''
 
     def __init__(self):
@@ -990,6 +1308,10 @@ class WordEditDialog:
         self.divideView = myGlobalBuilder.get_object("divideWordTextView")
         self.divideBuffer = myGlobalBuilder.get_object("divideWordTextBuffer")
         self.concordanceListStore = myGlobalBuilder.get_object("concordanceListStore")
+        self.pager = ConcordancePager(self.concordanceListStore,
+                                      myGlobalBuilder.get_object('wordEditScrolledWindow'),
+                                      myGlobalBuilder.get_object('wordConcordanceLabel'),
+                                      myGlobalBuilder.get_object('wordConcordStopButton'))
         # set up the textview to use the vernacular font
         self.divideView.get_style_context().add_class("vernacular")
         # monitor clicks of the exclude CheckButton
@@ -1003,7 +1325,7 @@ class WordEditDialog:
         Parameters: word (str) - word to edit (no formatting)
                     affix_word (str) - word with affixes marked, e.g. re- work -ing
                     wordExcluded (bool) - set if the word was marked as excluded
-                    data (str) - multiline string of prefix \t item \t postfix
+                    data (iterable) - the lines of the concordance, as (prefix, item, postfix)
         '''
         global myGlobalBuilder
         global myGlobalRenderer
@@ -1019,27 +1341,13 @@ class WordEditDialog:
         self.excludeWord.set_active(wordExcluded)
         self.divideBuffer.set_text(affix_word)
         
-        self.concordanceListStore.clear()
-        if len(data) > 0:
-            # we will need the data split into lines
-            lines = re.split('\n', data)
-            
-            # create the label with the number of occurrences
-            label = _("Concordance of the word: <b>{}</b>").format(word)
-            if myGlobalWindow.isRTL:
-                label += '\u200f'
-            label += _(" ({} occurrences)").format(len(lines))
-            myGlobalBuilder.get_object('wordConcordanceLabel').set_markup(label)
-            
-            # populate the list store with the concordance data
-            for line in lines:
-                preword, word, postword = re.split('\t', line)
-                self.concordanceListStore.append([preword, word, postword])
-        
-        # make sure concordance is scrolled to the top
-        myGlobalBuilder.get_object('wordEditScrolledWindow').get_vadjustment().set_value(0)
+        # populate the list store with the concordance data (a page at a time),
+        # with the number of occurrences in the label
+        label = _("Concordance of the word: <b>{}</b>").format(GLib.markup_escape_text(word))
+        self.pager.Start(label, data)
         
         response = self.dialog.run()
+        self.pager.Stop()
         # don't hide the dialog yet, as we run it until valid or cancel
         #self.dialog.hide()
         return (response == 1)
@@ -1101,14 +1409,16 @@ class ConcordanceDialog:
     '''A class to create and run a dialog to show a concordance.
     
     Creating an instance of this class creates and runs a dialog which presents
-    a concordance view of the given data. Each line of the data should contain
-    2 tabs, separating the data into 3 columns: prefix, item, postfix. In this
-    way the item being concorded can be aligned in the middle column. A label is
+    a concordance view of the given data. Each line of the data should have
+    3 columns: prefix, item, postfix (the lines are shown a page at a time, see
+    ConcordancePager). In this way the item being concorded can be aligned in
+    the middle column. A label is
     also passed in the __init__ method, so that information on what is being
     concorded can be displayed.
     
     Attributes:
       dialog (Dialog object) - dialog for displaying the concordance
+      pager (ConcordancePager object) - fills the concordance a page at a time
     '''
 
     def __init__(self):
@@ -1116,12 +1426,16 @@ class ConcordanceDialog:
         
         # keep track of some builder UI objects
         self.dialog = myGlobalBuilder.get_object('concordanceDialog')
+        self.pager = ConcordancePager(myGlobalBuilder.get_object("concordanceListStore"),
+                                      myGlobalBuilder.get_object('concordanceScrolledWindow'),
+                                      myGlobalBuilder.get_object('concordanceDialogLabel'),
+                                      myGlobalBuilder.get_object('concordanceStopButton'))
     
     def Run(self, letter, data):
         '''Run a concordance dialog to display the given data.
         
         Parameters: letter (str) - letter in the teaching order for the concordance
-                    data (str) - multiline string of prefix \t item \t postfix
+                    data (iterable) - the lines of the concordance, as (prefix, item, postfix)
         '''
         global myGlobalBuilder
         global myGlobalRenderer
@@ -1132,27 +1446,13 @@ class ConcordanceDialog:
         myGlobalBuilder.get_object('concordanceWordCellRendererText').set_property('font-desc', myGlobalRenderer.vernFontDesc)
         myGlobalBuilder.get_object('concordancePostCellRendererText').set_property('font-desc', myGlobalRenderer.vernFontDesc)
         
-        # we will need the data split into lines
-        lines = re.split('\n', data)
-        
-        # create the label with the number of occurrences
+        # populate the list store with the data parameter (a page at a time),
+        # with the number of occurrences in the label
         label = _("Text fragments available (from your loaded texts) in the lesson for '{}'").format(letter)
-        if myGlobalWindow.isRTL:
-            label += '\u200f'
-        label += _(" ({} occurrences)").format(len(lines))
-        myGlobalBuilder.get_object('concordanceDialogLabel').set_text(label)
-        
-        # populate the list store with the data parameter
-        listStore = myGlobalBuilder.get_object("concordanceListStore")
-        listStore.clear()
-        for line in lines:
-            preword, word, postword = re.split('\t', line)
-            listStore.append([preword, word, postword])
-        
-        # make sure concordance is scrolled to the top
-        myGlobalBuilder.get_object('concordanceScrolledWindow').get_vadjustment().set_value(0)
+        self.pager.Start(GLib.markup_escape_text(label), data)
         
         self.dialog.run()
+        self.pager.Stop()
         self.dialog.hide()
 
 
@@ -1210,73 +1510,225 @@ class WordAnalysis:
     def AddWordsFromFile(self, filename):
         '''Load all lines from the given text file and store them in the class
         object. Consider whether file is an SFM file, and handle it properly.
-        Once data is loaded, send it to FindWords to add word data to object.
         
         Parameter: file (str) - file name and path of file to check
         Return value: True if the file was loaded without error
         '''
-        # check if this is an SFM file, configure if not done yet
-        isSFMFile = self.CheckIfSFM(filename)
+        return len(self.AddWordsFromFiles([filename])) == 1
+    
+    def AddWordsFromFiles(self, filenames, maxWorkers=None):
+        '''Load the given text files and store them in the class object. Each file is
+        configured for SFMs first (one after another), then the files are read and analyzed
+        in parallel worker processes, and the results are added in the order of the files,
+        so the result is the same as loading the files one at a time.
         
-        # load in entire file in 'lines' list, processing SFMs as we go
-        lines = []
+        Parameters: filenames (list of str) - file names and paths of the files to load
+                    maxWorkers (int) - maximum number of worker processes (default: one per core)
+        Return value: list of str, the file names that were loaded without error
+        '''
+        # check if each file is an SFM file, configure if not done yet
+        jobs = []
+        for filename in filenames:
+            isSFMFile = self.CheckIfSFM(filename)
+            onlyLines = self.sfmOnlyLines if self.sfmProcessSFMs else ''
+            jobs.append((filename, isSFMFile, self.sfmProcessSFMs, self.sfmIgnoreLines, onlyLines,
+                         self.separateCombDiacritics))
+        
+        # read the files, finding the characters and counting the words
+        results = text_import.AnalyzeTextFiles(jobs, maxWorkers)
+        
+        loaded = []
+        for filename, result in zip(filenames, results):
+            if isinstance(result, Exception):
+                title = _("File error")
+                msg = _("Error. File could not be read.")
+                SimpleMessage(title, 'dialog-information', msg)
+                continue
+            self.AddTextAnalysis(filename, result)
+            loaded.append(filename)
+        
+        if loaded:
+            # if we have inconsistent encoding, and user hasn't been informed, then inform the user
+            self.ReportEncodingError()
+            # process the affixes as well, if any; also sets teachingOrderChanged to True to force recalculating teaching order
+            self.ProcessAffixes()
+        return loaded
+    
+    def AddTextAnalysis(self, filename, result):
+        '''Add the characters and words of a text (analyzed on its own by text_import.AnalyzeLines)
+        to the analysis, and store the file name and its lines.
+        
+        Parameters: filename (str) - file name and path of the text
+                    result (text_import.TextAnalysis) - the lines, characters and word counts of the text
+        '''
+        self.containsNFC = self.containsNFC or result.containsNFC
+        self.containsNFD = self.containsNFD or result.containsNFD
+        
+        # add the characters in the order they were found in the text
+        self.AddCharCounts(result.chars)
+        
+        # the words were split with the default word break characters of this text, which gives the same words
+        # unless this text uses a character that is classified differently in the project (a word break
+        # character from another text, or a character the user has made word forming or word breaking)
+        wordCounts = result.wordCounts
+        wordBreakChars = result.wordBreakChars
+        tokenizer = self.GetTokenizer()
+        if tokenizer.wordBreakChars != tuple(result.wordBreakChars):
+            changedChars = set(self.wordBreakChars) ^ set(result.wordBreakChars)
+            if not result.codePoints.isdisjoint(''.join(changedChars)):
+                wordCounts = text_import.CountWords(result.lines, tokenizer)
+                wordBreakChars = tokenizer.wordBreakChars
+        fileWordCounts = text_import.FilterWordCounts(wordCounts)
+        self.AddWordCounts(fileWordCounts)
+        
+        # store the file name/path, all the lines in the file, and its words
+        self.fileNames.append(filename)
+        self.fileLines.append(result.lines)
+        self.fileWordCounts.append(fileWordCounts)
+        self.fileWordBreakChars.append(list(wordBreakChars))
+        self.fileEncodingForms.append((result.containsNFC, result.containsNFD))
+        self.fileCharCounts.append(result.clusterCounts)
+        self.fileTokens.append(None)
+        self.filePOS.append([])
         try:
-            f = codecs.open(filename, 'r', encoding='utf-8')
-            firstline = True
-            prevLineRemoved = False
-            for line in f:
-                if firstline:
-                    # get rid of any Unicode BOM at the beginning of the file
-                    line = re.sub('^\ufeff', '', line)
-                    firstline = False
-                
-                if isSFMFile and not re.match(r'^\\', line) and len(lines)>0:
-                    # no SFM on this line
-                    if not prevLineRemoved:
-                        # attach to previous (with SFM) line
-                        lines[-1] = lines[-1] + ' ' + line.strip()
-                else:
-                    prevLineRemoved = False
-                    if self.sfmProcessSFMs:
-                        # remove certain SFM markers/lines in text
-                        if len(self.sfmIgnoreLines) > 0:
-                            if re.match(r'\\(' + self.sfmIgnoreLines + ')( |\n)', line):
-                                # remove entire line including text for certain SFMs
-                                line = ''
-                        # keep only certain SFM markers/lines in text
-                        if len(self.sfmOnlyLines) > 0:
-                            if not re.match(r'\\(' + self.sfmOnlyLines + ')( |\n)', line):
-                                # this SFM is not a keeper so remove entire line including text
-                                line = ''
-                        line = re.sub(r'\\\w+', '', line)  # remove any other SFMs
-                    line = line.strip()  # remove leading/trailing spaces
-                    # check to see if we have anything left in the line
-                    if len(line) > 0:
-                        # append the line to the list of lines
-                        lines.append(line)
-                    else:
-                        prevLineRemoved = True
-            f.close()
-        except Exception:
-            title = _("File error")
-            msg = _("Error. File could not be read.")
-            SimpleMessage(title, 'dialog-information', msg)
-            return False
+            # if texts are kept on disk, move this text to its cache file
+            result.lines.UpdateCache()
+        except OSError as e:
+            # just keep it in memory
+            logger.warning('Could not keep text on disk: {}'.format(e))
+    
+    def GetTokenizer(self):
+        '''Return the tokenizer that splits text into words with the current word break characters.
+        It is shared by everything that splits text into words, and compiled again whenever
+        the word break characters change.
+        
+        Return value: text_import.WordTokenizer
+        '''
+        if self.tokenizer is None or self.tokenizer.wordBreakChars != tuple(self.wordBreakChars):
+            self.tokenizer = text_import.WordTokenizer(self.wordBreakChars)
+        return self.tokenizer
+    
+    def GetFileTokens(self, fileNum):
+        '''Return the lines of a file split into words, splitting them the first time they are needed
+        (or if they were split with other word break characters).
         
-        # check the lines for encoding errors
-        self.CheckEncoding(lines)
+        Parameter: fileNum (int) - index of the file in fileNames
+        Return value: corpus.TokenizedLines
+        '''
+        tokenizer = self.GetTokenizer()
+        tokens = self.fileTokens[fileNum]
+        if tokens is not None and tokens.wordBreakChars != tokenizer.wordBreakChars:
+            if self.SplitsTheSame(fileNum, tokens.wordBreakChars, tokenizer.wordBreakChars):
+                tokens.wordBreakChars = tokenizer.wordBreakChars
+            else:
+                tokens = None
+        if tokens is None:
+            tokens = corpus.TokenizedLines(self.fileLines[fileNum], tokenizer)
+            self.fileTokens[fileNum] = tokens
+        return tokens
+    
+    def SplitsTheSame(self, fileNum, breakChars, otherBreakChars):
+        '''Check if a file is split into the same words with both lists of word break characters,
+        i.e. the file doesn't use any of the code points that only break words with one of the lists.
+        
+        Parameters: fileNum (int) - index of the file in fileNames
+                    breakChars, otherBreakChars (iterables of str) - word break characters
+        Return value: True if the words are the same
+        '''
+        changedCodePoints = set(''.join(breakChars)) ^ set(''.join(otherBreakChars))
+        return changedCodePoints.isdisjoint(''.join(self.fileCharCounts[fileNum]))
+    
+    def __getstate__(self):
+        '''Leave the tokenized lines (and what is found in them) and the syllabified words out
+        when the analysis is pickled (they are made again when needed).'''
+        state = self.__dict__.copy()
+        state['fileTokens'] = [None] * len(self.fileTokens)
+        state['decodableSentences'] = None
+        state['syllableCache'] = {}
+        state['syllableCacheKey'] = None
+        state['positionIndex'] = {}
+        state['positionIndexWords'] = None
+        return state
+    
+    def AddCharCounts(self, charCounts):
+        '''Add the characters that haven't been seen yet to the word forming or word breaking list,
+        and add the counts of all of the characters.
+        
+        Parameter: charCounts (Counter) - { character, count } (from text_import.CharCounts), in the order
+                                          the characters were found
+        '''
+        for char, cnt in charCounts.items():
+            text_import.AddChar(char, self.chars, self.wordFormChars, self.wordBreakChars)
+            self.chars[char] += cnt
+    
+    def AddWordCounts(self, wordCounts):
+        '''Add word counts to the words dictionary, which keeps a frequency count.
         
-        # convert this new data (from the file just loaded) to NFD encoding
-        lines = [unicodedata.normalize('NFD', line) for line in lines]
+        Parameter: wordCounts (Counter) - { word, count } (from text_import.FilterWordCounts), in the order
+                                          the words were found
+        '''
+        kWordCnt = 0
+        kWordManual = 1
+        kWordExclude = 2
+        kWordAffixForm = 3
+        kWordMarkupForm = 4
         
-        # store the file name/path, and all the lines in the file
-        self.fileNames.append(filename)
-        self.fileLines.append(lines)
+        for word, cnt in wordCounts.items():
+            if word in self.words:
+                # we've already seen this word, just increment its count
+                self.words[word][kWordCnt] += cnt
+            else:
+                # first time to see this word, set count, set defaults for all other list fields
+                self.words[word] = [cnt, False, False, word, '<b>' + word + '</b>']
+    
+    def RebuildWords(self):
+        '''Build the words dictionary again from the word counts of the files, so the words are in the
+        order they are first found in the texts (as if the texts were loaded again), keeping the other
+        fields (markup, excluded) of the words that were already there.
+        '''
+        kWordCnt = 0
         
-        # process the lines to find the characters and words
-        self.FindChars(lines)
-        self.FindWords(lines)
-        return True
+        oldWords = self.words
+        self.words = {}
+        for fileWordCounts in self.fileWordCounts:
+            for word, cnt in fileWordCounts.items():
+                if word in self.words:
+                    self.words[word][kWordCnt] += cnt
+                elif word in oldWords:
+                    self.words[word] = oldWords[word]
+                    self.words[word][kWordCnt] = cnt
+                else:
+                    self.words[word] = [cnt, False, False, word, '<b>' + word + '</b>']
+    
+    def RemoveFile(self, fileNum):
+        '''Remove a text (or lexicon) from the analysis, subtracting its word counts.
+        The characters found in it are kept, as they may have been configured as word forming/breaking.
+        
+        Parameter: fileNum (int) - index of the file in fileNames
+        '''
+        for char, cnt in text_import.CharCounts(self.fileCharCounts[fileNum], self.separateCombDiacritics).items():
+            if char in self.chars:
+                self.chars[char] -= cnt
+        del self.fileNames[fileNum]
+        del self.fileLines[fileNum]
+        del self.fileWordCounts[fileNum]
+        del self.fileWordBreakChars[fileNum]
+        del self.fileEncodingForms[fileNum]
+        del self.fileCharCounts[fileNum]
+        del self.fileTokens[fileNum]
+        del self.filePOS[fileNum]
+        if None not in self.filePOS:
+            # leave out the parts of speech of this file (if it is a lexicon)
+            self.BuildWordsWithPOS()
+        # the words of the other files, in the order they are found in them
+        self.RebuildWords()
+        if None not in self.fileEncodingForms:
+            # the encoding may be consistent again without this file
+            self.containsNFC = any(forms[0] for forms in self.fileEncodingForms)
+            self.containsNFD = any(forms[1] for forms in self.fileEncodingForms)
+        # make sure we recalculate the teaching order when we display it
+        self.teachingOrderChanged = True
+        self.dataChanged = True
     
     def AddLexiconData(self, filename, lexicon_data):
         '''Store the lexicon data as texts in the class object.
@@ -1289,6 +1741,7 @@ class WordAnalysis:
         # create a list of lines with one lexeme per line (text data for the analysis)
         # AND create a dict of lexemes that have POS, and a complete set of POS values
         lines = []
+        filePOS = []
         for entry in lexicon_data:
             lexeme = entry.get("lexeme")
             pos = entry.get("pos")
@@ -1302,44 +1755,34 @@ class WordAnalysis:
                 lexeme = unicodedata.normalize('NFD', lexeme.lower())
                 self.words_with_pos.setdefault(lexeme, []).append(pos)
                 self.pos_tags.add(pos)
+                filePOS.append((lexeme, pos))
         
-        # check the lines for encoding errors
-        self.CheckEncoding(lines)
-        
-        # convert this new data (from the file just loaded) to NFD encoding
-        lines = [unicodedata.normalize('NFD', line) for line in lines]
-        
-        # store the file name/path, and all the lines in the file
-        self.fileNames.append(filename)
-        self.fileLines.append(lines)
-        
-        # process the lines to find the characters and words
-        self.FindChars(lines)
-        self.FindWords(lines)
+        # check the encoding, find the characters and words, and store the lines
+        self.AddTextAnalysis(filename, text_import.AnalyzeLines(lines, self.separateCombDiacritics))
+        # keep the parts of speech of this file, so they can be removed with it
+        self.filePOS[-1] = filePOS
+        self.ReportEncodingError()
+        self.ProcessAffixes()
     
-    def CheckEncoding(self, lines):
-        '''Check the encoding of the given lines.
-        
-        Check for the presence of composed/decomposed characters. If inconsistent, warn the user
-        and offer to convert everything to decomposed.
-        
-        Parameter: lines (list of str) - lines of text to be analyzed
+    def BuildWordsWithPOS(self):
+        '''Build words_with_pos and pos_tags again from the parts of speech of each file (e.g. after
+        a lexicon is removed), and leave the parts of speech that are gone out of the POS filter.
+        '''
+        self.words_with_pos = {}
+        self.pos_tags = set()
+        for filePOS in self.filePOS:
+            for lexeme, pos in filePOS:
+                self.words_with_pos.setdefault(lexeme, []).append(pos)
+                self.pos_tags.add(pos)
+        if self.active_pos_filters:
+            active = self.active_pos_filters & self.pos_tags
+            # (as in FilterDialog.GetSelectedPOS, no filter if none or all of them are selected)
+            self.active_pos_filters = active if active and active != self.pos_tags else None
+    
+    def ReportEncodingError(self):
+        '''If the input data has inconsistent encoding (composed and decomposed characters),
+        and the user hasn't been informed yet, then inform the user.
         '''
-        if self.userInformedEncodingError:
-            # user already knows that data is inconsistent, and has made a choice about decomposition
-            return
-        
-        # scan through the lines looking for composed and decomposed characters
-        for line in lines:
-            if not self.containsNFC and line != unicodedata.normalize('NFD', line):
-                self.containsNFC = True
-            if not self.containsNFD and line != unicodedata.normalize('NFC', line):
-                self.containsNFD = True
-            if self.containsNFC and self.containsNFD:
-                # exit the loop early if both flags are set
-                break
-        
-        # if we have inconsistent encoding, and user hasn't been informed, then inform the user
         if self.containsNFC and self.containsNFD and not self.userInformedEncodingError:
             title = _("Encoding error")
             msg = _("""Warning: Your input data has inconsistent encoding, with some characters composed
@@ -1347,9 +1790,30 @@ and some decomposed. This is likely due to using different keyboards to type the
 Your original files will NOT be modified, but you should ask a consultant to help you
 make your data more consistent. Any outputs from PrimerPrep (word list, teaching order)
 will be output in decomposed format.""")
-            SimpleMessage(title, 'dialog-warning', msg)
+            SimpleMessage(title, 'dialog-warning', msg + self.GetEncodingFormsText())
             self.userInformedEncodingError = True
     
+    def GetEncodingFormsText(self):
+        '''Return the names of the files with composed and with decomposed characters
+        (a file in both lists is inconsistent itself), to add to an encoding error message.
+        
+        Return value: (str) - lines listing the files, or '' if that isn't known for any file
+        '''
+        composedFiles = []
+        decomposedFiles = []
+        for filename, forms in zip(self.fileNames, self.fileEncodingForms):
+            if forms is None:
+                # (project saved before the forms of each file were kept)
+                continue
+            if forms[0]:
+                composedFiles.append(os.path.basename(filename))
+            if forms[1]:
+                decomposedFiles.append(os.path.basename(filename))
+        if not composedFiles and not decomposedFiles:
+            return ''
+        return ('\n\n' + _("Composed characters were found in: ") + ', '.join(composedFiles) +
+                '\n' + _("Decomposed characters were found in: ") + ', '.join(decomposedFiles))
+    
     def CheckIfSFM(self, file):
         '''Check if the file is an SFM file, and configure appropriately.
         
@@ -1395,7 +1859,18 @@ will be output in decomposed format.""")
             isSFMFile = False
         # We used to only configure once, but it might be a different kind of SFM file (Scripture vs lexicon)
         # so run configuration every time we find an SFM file
-        if isSFMFile:
+        if isSFMFile and BATCH_MODE:
+            # no dialog in batch mode, so always remove SFMs, using the config file settings or the dialog defaults
+            self.sfmProcessSFMs = True
+            if myGlobalBatchSFMLines is not None:
+                (self.sfmIgnoreLines, self.sfmOnlyLines) = myGlobalBatchSFMLines
+            elif 'lx' in markers:
+                self.sfmIgnoreLines = ''
+                self.sfmOnlyLines = 'lx|pdv|xv'
+            else:
+                self.sfmIgnoreLines = 'id|rem|restore|h|toc1|toc2|toc3'
+                self.sfmOnlyLines = ''
+        elif isSFMFile:
             # this is an SFM file
             if 'lx' in markers:
                 self.sfmIgnoreLines = ''
@@ -1435,97 +1910,6 @@ will be output in decomposed format.""")
                     self.sfmIgnoreLines = ''
         return isSFMFile
     
-    def FindChars(self, lines):
-        '''Takes a list of lines and for each line, check each character
-        (making sure to combine diacritics or not) and record it as
-        word forming or word breaking.
-        
-        Parameter: lines (list of str) - lines of text to be analyzed
-        '''
-        # build a RegEx that splits out individual characters
-        # (built outside loop because it is the same for every line)
-        # make sure to attach any zero width joiners (ZWJs U+200d)
-        # but remove/ignore Word Joiners (WJs U+2060) - they are only there
-        # to ensure that the ZWJs get attached to the right character
-        if self.separateCombDiacritics:
-            # RegEx that treats combining diacritics separately
-            findChars = re.compile(r'(\u200d?[^\u2060]\u200d?)')
-        else:
-            # RegEx that includes combining diacritics with their preceding base characters
-            findChars = re.compile(r'(\u200d?[^\u2060][\u0300-\u036f]*\u200d?)')
-        
-        # make sure we have identified all characters in the file
-        for line in lines:
-            # check all characters in line and if not seen before, add it
-            # to word forming or breaking list (based on unicodedata.category)
-            for char in re.findall(findChars, line):
-                if ord(char[-1]) in range(0x300, 0x36f):
-                    # last character is a combining diacritic
-                    #  get base character
-                    ch = char[0]
-                    if ch == '\u200d':
-                        # skip over initial ZWJ, if present
-                        ch = char[1]
-                    if unicodedata.category(ch)[0] not in 'LM':
-                        # base is not a letter or a mark
-                        # just ignore it for building the character list
-                        # this addresses problems like when the base character is '-' or ']', messing up regexes
-                        char = ' '
-                if char not in self.chars:
-                    # this char has not been seen yet, mark as seen
-                    self.chars[char] = 1
-                    ch = char[0]
-                    if ch == '\u200d':
-                        # if it's a ZWJ, get the next letter
-                        ch = char[1]
-                    # add to either word forming/breaking character list
-                    if unicodedata.category(ch)[0] in 'LM':
-                        # only letters or combining marks
-                        self.wordFormChars.append(char)
-                    else:
-                        #  this would include punctuation, symbols, spaces, control codes
-                        self.wordBreakChars.append(char)
-    
-    def FindWords(self, lines):
-        '''Takes a list of lines and for each line, break it into words which
-        are added into the words dictionary (which keeps a frequency count).
-        
-        Parameter: lines (list of str) - lines of text to be analyzed
-        '''
-        # build 'breaks' string with all word breaking characters for RegEx splitting
-        breaks = ''
-        for char in self.wordBreakChars:
-            # need to put '\' before special characters
-            if char in '.^$*+-?{}\\[]|()':
-                breaks = breaks + '\\'
-            breaks = breaks + char
-        
-        kWordCnt = 0
-        kWordManual = 1
-        kWordExclude = 2
-        kWordAffixForm = 3
-        kWordMarkupForm = 4
-        # process each line individually
-        for line in lines:
-            # make list of words split by spaces, punctuation, other word break chars
-            linewords = re.split('[\\s' + breaks + ']+', line)
-            for word in linewords:
-                #logger.debug('"', repr(word), '"')
-                if (len(word) == 0) or re.match(r'^[-\d]+$', word):
-                    # this word is empty or just numbers/hyphens, skip to next word
-                    continue
-                word = word.lower()
-                if word in self.words:
-                    # we've already seen this word, just increase its count
-                    self.words[word][kWordCnt] += 1
-                else:
-                    # first time to see this word, set count to 1, set defaults for all other list fields
-                    self.words[word] = [1, False, False, word, '<b>' + word + '</b>']
-        
-        # process the affixes as well, if any; also sets teachingOrderChanged to True to force recalculating teaching order
-        self.ProcessAffixes()
-    
-    
     def GetNumFiles(self):
         '''Returns the current number of texts in the WordAnalysis object
         '''
@@ -1577,13 +1961,15 @@ will be output in decomposed format.""")
         # (but user can sort by clicking column headers)
         listStore.set_sort_column_id(1, Gtk.SortType.DESCENDING)
     
-    def CalculateTeachingOrder(self, excludeAffixes, countWords):
+    def CalculateTeachingOrder(self, excludeAffixes, countWords, progress=None):
         '''Using the list of words in this WordAnalysis class object,
         make sure we have broken all words into a list of graphemes and
         then calculate the teaching order of the graphemes.
         
         Parameter: excludeAffixes (bool) - True if we exclude affixes, False if they are counted as words
                    countWords (bool) - True if we count all words (tokens), False if we count words only once (types)
+                   progress (callable) - optional, called now and then with the fraction done (0.0 to 1.0),
+                                         may raise teaching_order.CalculationCancelled to stop the calculation
         '''
         #
         # Clear all data on teaching order and on how words split into graphemes in this WordAnalysis object.
@@ -1622,147 +2008,67 @@ will be output in decomposed format.""")
             # no words to process
             return
         
-        # convert the digraphs list into a RegEx OR group
-        digraphList = self.digraphs
-        # make sure that the longer multigraphs come first, or they might not get matched
-        digraphList.sort(key=len, reverse=True)
-        # build the RegEx string (escape any special characters - which would be weird, but for safety)
-        digraphStr = '|'.join(re.escape(dg) for dg in digraphList)
-        if len(digraphStr) > 0:
-            digraphStr += '|'
-        
+        # make sure that the longer multigraphs come first (as they must in the RegEx)
+        self.digraphs.sort(key=len, reverse=True)
         # build a RegEx that can split out individual graphemes including digraphs (from list)
         # (built outside loop because it is the same for every word)
-        # make sure to include any zero width joiners (ZWJs, \u200d), but exclude word joiners 
-        # (WJs, \u2060) and any zero width spaces (ZWSPs, \u200b) which are used to mark affixes
-        if self.separateCombDiacritics:
-            # RegEx that treats combining diacritics separately
-            findGraphemes = re.compile(r'(\u200d?(?:' + digraphStr + r'[^\u200b\u2060])\u200d?)')
-        else:
-            # RegEx that includes combining diacritics with their preceding base characters
-            findGraphemes = re.compile(r'(\u200d?(?:' + digraphStr + r'[^\u200b\u2060])[\u0300-\u036f]*\u200d?)')
+        findGraphemes = teaching_order.GraphemeRegex(self.digraphs, self.separateCombDiacritics)
+        
+        # splitting into graphemes only depends on the digraphs and the diacritics setting, so reuse
+        # the graphemes found before (even in a previous session) unless either of these has changed
+        cacheKey = (tuple(sorted(self.digraphs)), self.separateCombDiacritics)
+        oldCache = self.graphemeCache if self.graphemeCacheKey == cacheKey else {}
+        # build a new cache as we go, so that it only keeps the words and morphemes still in use
+        self.graphemeCache = {}
+        self.graphemeCacheKey = cacheKey
+        
+        def FindGraphemes(text):
+            graphemes = self.graphemeCache.get(text)
+            if graphemes is None:
+                graphemes = oldCache.get(text)
+                if graphemes is None:
+                    graphemes = re.findall(findGraphemes, text)
+                self.graphemeCache[text] = graphemes
+            return graphemes
+        
+        # break the words and morphemes into graphemes, and count them
+        # (the morphemes are used for the Teaching Order calculations, the words for the example words)
+        # splitting the words is (roughly) the first half of the work
+        splitProgress = None if progress is None else (lambda fraction: progress(0.5 * fraction))
+        (self.wordsAsGraphemes, self.morphemesAsGraphemes, self.analysisWords, self.analysisMorphemes,
+         self.graphemeUse) = teaching_order.SplitWords(self.words, excludeAffixes, countWords,
+                                                       FindGraphemes, splitProgress)
+        
+        # build the grapheme->words index, used to (re)build the lists of example words
+        self.BuildGraphemeWordIndex()
         
-        kWordCnt = 0
-        kWordManual = 1
-        kWordExclude = 2
         kWordAffixForm = 3
-        kWordMarkupForm = 4
-        
-        for word, word_info in self.words.items():
-            # decompose this word as a list of graphemes to determine the example words 
-            # (morphemes are used for the Teaching Order calculations)
-            self.wordsAsGraphemes[word] = re.findall(findGraphemes, word)
-            # put the word count into the analysisWords dictionary (zero if this word is excluded)
-            if not word_info[kWordExclude]:
-                self.analysisWords[word] = (word_info[kWordCnt] if countWords else 1)
-            else:
-                self.analysisWords[word] = 0
-            
-            # process the individual affixes of this word
-            affixList = word_info[kWordAffixForm].split(' ')
-            for morph in affixList:
-                # process each affix or root
-                if (not excludeAffixes) or (not morph.endswith('-') and not morph.startswith('-')):
-                    # either we aren't excluding affixes, or this isn't an affix
-                    if not word_info[kWordExclude]:
-                        # store this "word", with its count (adding to existing one if found)
-                        self.analysisMorphemes[morph] = \
-                            self.analysisMorphemes.get(morph, 0) + (word_info[kWordCnt] if countWords else 1)
-                    else:
-                        # don't count the graphemes of excluded words, but make sure it's in the word list (with zero count)
-                        if morph not in self.analysisMorphemes:
-                            self.analysisMorphemes[morph] = 0
-                    
-                    morphNoHyphen = morph
-                    if morphNoHyphen.endswith('-') or morphNoHyphen.startswith('-'):
-                        # this is an affix, so remove the hyphen before splitting into graphemes
-                        morphNoHyphen = morphNoHyphen.replace('-', '')
-                    
-                    # retrieve a list of graphemes for this morpheme
-                    if morph in self.morphemesAsGraphemes:
-                        # just load the graphemes that were generated before
-                        graphemes = self.morphemesAsGraphemes[morph]
-                    else:
-                        # generate and store the graphemes for this morpheme
-                        graphemes = re.findall(findGraphemes, morphNoHyphen)
-                        self.morphemesAsGraphemes[morph] = graphemes
-                    for grapheme in graphemes:
-                        if not word_info[kWordExclude]:
-                            # increase count of uses for this grapheme by num of words
-                            # (if first time, get default 0 then add num of words)
-                            self.graphemeUse[grapheme] = \
-                                self.graphemeUse.get(grapheme, 0) + (word_info[kWordCnt] if countWords else 1)
-                        else:
-                            # just make sure the grapheme is in the graphemeUse dictionary
-                            if grapheme not in self.graphemeUse:
-                                self.graphemeUse[grapheme] = 0
         
+        # arrange the teaching order (normally using the elimination algorithm), and build the lists of
+        # example words (the elimination engines index graphemes to morphemes/words once, rather than
+        # rescanning every round)
         teachingOrderAlgorithm = "elimination"
-        if teachingOrderAlgorithm == "elimination":
-            # arrange the teaching order using the elimination algorithm
-            #  N.B. this performs the function of StoreTeachingOrderBuildExampleWordsLists as well
-            
-            # make a copy of the graphemeUse dictionary, as we will be changing it
-            graphemeUseCopy = self.graphemeUse.copy()
-            # make a copy of the words dictionary, as we will be changing it
-            wordsCopy = self.analysisWords.copy()
-            # make a copy of the morphemes dictionary, as we will be changing it
-            morphemesCopy = self.analysisMorphemes.copy()
-            # start with an empty teaching order
-            self.teachingOrder = []
-            while len(graphemeUseCopy) > 0:
-                # dict of { grapheme, sum of frequencies of all words that use this grapheme }
-                currGraphemeFreq = {}
-                for gr in graphemeUseCopy:
-                    # find the sum of the frequencies of all the words having this grapheme
-                    freq = 0
-                    for morph in morphemesCopy:
-                        # if this morpheme contains the grapheme, add it to the list
-                        if gr in self.morphemesAsGraphemes[morph]:
-                            # this morpheme contains the grapheme, add morpheme count (tokens) or just 1 if counting types
-                            freq += morphemesCopy[morph] if countWords else 1
-                    currGraphemeFreq[gr] = freq
-                # find min value of currGraphemeFreq, introduce as last grapheme
-                # (if there is more than one with same count, it will choose one "randomly")
-                last = min(currGraphemeFreq, key=currGraphemeFreq.get)
-                if graphemeUseCopy[last] > 0:
-                    # only add to teaching order if it is counted
-                    self.teachingOrder.insert(0, last)
-                
-                # build a dictionary of example words (with counts) that use this grapheme
-                wordsWithGrapheme = {}
-                for word in wordsCopy:
-                    # if this word contains the grapheme, add it to the list
-                    if last in self.wordsAsGraphemes[word]:
-                        wordsWithGrapheme[word] = self.analysisWords[word]
-                # delete all of the words found, so they are not used in calculations for more frequent graphemes
-                # (those words are excluded because the infrequent grapheme it contains hasn't been introduced yet)
-                for word in wordsWithGrapheme:
-                    del wordsCopy[word]
-                    # delete the morphemes from this word
-                    affixList = self.words[word][kWordAffixForm].split(' ')
-                    for morph in affixList:
-                        morphNoHyphen = morph
-                        if morphNoHyphen.endswith('-') or morphNoHyphen.startswith('-'):
-                            # this is an affix, so remove the hyphen before splitting into graphemes
-                            morphNoHyphen = morphNoHyphen.replace('-', '')
-                        # this mopheme may have already been deleted in another word, so don't fail if it's not there
-                        if morphNoHyphen in morphemesCopy:
-                            del morphemesCopy[morphNoHyphen]
-                # store the list of example words for this grapheme, in decreasing order of use
-                self.graphemeExampleWords[last] = sorted(wordsWithGrapheme, key=wordsWithGrapheme.get, reverse=True)
-                # remove this grapheme from the dictionary and repeat the process
-                del graphemeUseCopy[last]
-        else:
-            # teachingOrderAlgorithm == "decreasing grapheme frequency"
-            # sort the letters by order of decreasing occurance, as draft teaching order
-            graphemeList = sorted(self.graphemeUse, key=self.graphemeUse.get, reverse=True)
-            # store this teaching order and build lists of example words
-            self.StoreTeachingOrderBuildExampleWordsLists(graphemeList)
+        wordAffixForms = {word: word_info[kWordAffixForm] for word, word_info in self.words.items()}
+        # arranging the teaching order is the second half of the work
+        orderProgress = None if progress is None else (lambda fraction: progress(0.5 + 0.5 * fraction))
+        self.teachingOrder, self.graphemeExampleWords = teaching_order.TeachingOrder(
+            teachingOrderAlgorithm, self.graphemeUse, self.morphemesAsGraphemes, self.analysisMorphemes,
+            self.wordsAsGraphemes, self.graphemeWords, self.analysisWords, self.wordRank, wordAffixForms,
+            countWords, orderProgress)
         
         # reset flag for recording a change to the data
         self.teachingOrderChanged = False
     
+    def BuildGraphemeWordIndex(self):
+        '''Build the grapheme->words index (and the word ranks used to order example words)
+        from wordsAsGraphemes and analysisWords. The index is kept with the analysis, so
+        example word lists can be rebuilt without scanning every word for every grapheme.
+        '''
+        # graphemeWords: dict of { grapheme, set of words that use this grapheme }
+        self.graphemeWords = teaching_order.BuildGraphemeWordIndex(self.wordsAsGraphemes)
+        # wordRank: dict of { word, position in analysisWords } (keeps ties in word list order)
+        self.wordRank = teaching_order.BuildWordRank(self.analysisWords)
+    
     def StoreTeachingOrderBuildExampleWordsLists(self, graphemeList):
         '''Store the given list as the teaching order, starting with the last item
         of the list, and as graphemes are stored, build a list of words that use this grapheme.
@@ -1771,27 +2077,10 @@ will be output in decomposed format.""")
         
         Parameter: graphemeList (list of str) - lines of text to be analyzed
         '''
-        # make a copy of the words dictionary, as we will be changing it
-        wordsCopy = self.analysisWords.copy()
-        self.teachingOrder = []
-        while len(graphemeList) > 0:
-            # get the least frequent grapheme
-            last = graphemeList.pop()
-            self.teachingOrder.insert(0, last)
-            # if this is a sight word lesson, don't need to do any of this
-            if not isinstance(last, int):
-                # build a dictionary of example words (with counts) that use this grapheme
-                wordsWithGrapheme = {}
-                for word in wordsCopy:
-                    # if this word contains the grapheme, add it to the list
-                    if last in self.wordsAsGraphemes[word]:
-                        wordsWithGrapheme[word] = self.analysisWords[word]
-                # delete all of the words found, so they are not used in calculations for more frequent graphemes
-                # (those words are excluded because the infrequent grapheme it contains hasn't been introduced yet)
-                for word in wordsWithGrapheme:
-                    del wordsCopy[word]
-                # store the list of example words for this grapheme, in decreasing order of use
-                self.graphemeExampleWords[last] = sorted(wordsWithGrapheme, key=wordsWithGrapheme.get, reverse=True)
+        self.teachingOrder = list(graphemeList)
+        # only the words in the grapheme->words index entries are visited
+        self.graphemeExampleWords.update(teaching_order.ExampleWordsLists(
+            self.teachingOrder, self.graphemeWords, self.analysisWords, self.wordRank))
     
     def RunSightWordsDialog(self, sightWordList):
         '''Run a dialog to collect sight words.
@@ -1875,9 +2164,12 @@ will be output in decomposed format.""")
         '''The order of graphemes in the teaching order has been modified.
         (We arrive here following a drag-and-drop in the teaching order.)
         Build up the teaching order list from the ListStore, and recalculate
-        the example words that are possible with this new order.
+        the example words that are possible with this new order. Only the lessons
+        between the old and new positions of the moved lesson can change, so only
+        those example word lists are recalculated.
         
         Parameter: listStore - data storage for current teaching order
+        Return value: list of int with the rows (lessons) whose example words may have changed
         '''
         # build up the graphemeList from the listStore
         graphemeList = []
@@ -1891,15 +2183,32 @@ will be output in decomposed format.""")
                 graph = row[3]
             graphemeList.append(graph)
         
-        # store this teaching order and build lists of example words
-        self.StoreTeachingOrderBuildExampleWordsLists(graphemeList)
-    
-    def UpdateTeachingOrderList(self, listStore):
+        span = teaching_order.ChangedSpan(self.teachingOrder, graphemeList)
+        if span is None:
+            # not just a reordering, so store this teaching order and build all lists of example words
+            self.StoreTeachingOrderBuildExampleWordsLists(graphemeList)
+            return list(range(len(graphemeList)))
+        lo, hi = span
+        # store the new teaching order, and give out the example words of the moved span again
+        self.teachingOrder = graphemeList
+        self.graphemeExampleWords.update(teaching_order.ReassignExampleWords(
+            self.teachingOrder, lo, hi, self.graphemeExampleWords, self.graphemeWords,
+            self.analysisWords, self.wordRank))
+        return list(range(lo, hi+1))
+    
+    def UpdateTeachingOrderList(self, listStore, rows=None):
         '''Update the teaching order list in the listStore provided to reflect the
         current order proposed in the WordAnalysis object.
         
         Parameter: listStore - data storage for current teaching order
+                   rows (list of int) - if given, only these rows are updated (in place),
+                                        otherwise the entire list is rebuilt
         '''
+        if rows is not None:
+            # only update the rows that changed, so the rest of the list isn't redrawn or remeasured
+            for i in rows:
+                listStore[i] = self.TeachingOrderRow(self.teachingOrder[i])
+            return
         # start by clearing the listStore
         listStore.clear()
         # if there isn't a teachingOrder yet, just return
@@ -1907,119 +2216,168 @@ will be output in decomposed format.""")
             return
         # add each element in the teaching order
         for letter in self.teachingOrder:
-            if isinstance(letter, int):
-                # this is a sight word entry, eyeballs for display letter
-                dispLetter = '\u2686\u2686'
-                cnt = ''
-                # load list of words
-                swIdx = letter
-                words = self.sightWords[swIdx-1]
-                # create a string from the list of words, separated by double spaces
-                wordList = '  '.join(words)
-            else:
-                dispLetter = letter
-                # if the first character is a combining diacritic
-                if unicodedata.category(dispLetter[0]) == 'Mn':
-                    # (previously test was if 0x0300 <= ord(dispLetter[0]) <= 0x036f)
-                    # then prepend the dotted circle base character
-                    dispLetter = '\u25CC' + dispLetter
-                cnt = str(self.graphemeUse[letter])
-                words = self.graphemeExampleWords[letter]
-                # set sight word index as zero, so we can quickly know that this is not a sight word lesson
-                swIdx = 0
-                
-                # make a list of words with the target letter highlighted in bold
-                highlightedWords = []
-                for word in words:
-                    # get a list of graphemes for this word
-                    graphemes = self.wordsAsGraphemes[word]
-                    # check to see if the word matches the part of speech filter
-                    if self.active_pos_filters:
-                        # there is an active part of speech filter - verify that this word passes
-                        word_pos = self.words_with_pos.get(word)
-                        if not word_pos or not any(p in self.active_pos_filters for p in word_pos):
-                            # we don't know POS or it doesn't match the filter, don't add it
-                            continue
-                    # check syllable and/or word position filters (occurrence-level AND:
-                    # a single occurrence of the letter must satisfy both active filters)
-                    if self.position_filters:
-                        syl_part    = self.position_filters[:3]
-                        word_part   = self.position_filters[3:]
-                        syl_active  = not all(syl_part) and any(syl_part)
-                        word_active = not all(word_part) and any(word_part)
-                        # syllabify once; passing syllable_filters=None returns the syllabified
-                        # graphemes without filtering, which we need for display and position checks
-                        _, syllabified = process_syllables(graphemes, letter,
-                                                           vowel_graphemes=self.user_defined_vowels,
-                                                           vowels_together=self.syllable_vowels_together,
-                                                           consonants_together=self.syllable_consonants_together)
-                        n_orig = len(graphemes)
-                        m      = len(syllabified)
-                        occurrence_found = False
-                        oi = 0  # original grapheme index (incremented for each non-"." element)
-                        for si, g in enumerate(syllabified):
-                            if g == '.':
-                                continue
-                            if g == letter:
-                                # syllable position: look at the adjacent elements in syllabified;
-                                # a "." or the word boundary means initial or final
-                                prev_g = syllabified[si - 1] if si > 0 else None
-                                next_g = syllabified[si + 1] if si < m - 1 else None
-                                is_syl_init = (prev_g is None or prev_g == '.')
-                                is_syl_fin  = (next_g is None or next_g == '.')
-                                is_syl_med  = not is_syl_init and not is_syl_fin
-                                # word position: use the original grapheme index
-                                is_word_init = (oi == 0)
-                                is_word_fin  = (oi == n_orig - 1)
-                                is_word_med  = not is_word_init and not is_word_fin
-                                syl_ok  = (not syl_active or
-                                           (syl_part[0] and is_syl_init) or
-                                           (syl_part[1] and is_syl_med)  or
-                                           (syl_part[2] and is_syl_fin))
-                                word_ok = (not word_active or
-                                           (word_part[0] and is_word_init) or
-                                           (word_part[1] and is_word_med)  or
-                                           (word_part[2] and is_word_fin))
-                                if syl_ok and word_ok:
-                                    occurrence_found = True
-                                    break
-                            oi += 1
-                        if not occurrence_found:
-                            continue
-                        # show syllable-boundary dots in the word display only when the
-                        # syllable position filter is active
-                        if syl_active:
-                            graphemes = syllabified
-                    # text filter: match against the plain word form (no syllable dots)
-                    if self.word_text_filter:
-                        if self.word_text_filter not in ''.join(g for g in graphemes if g != '.'):
-                            continue
-                    # highlight the current grapheme in bold
-                    highlightedGraphemes = [f"<b>{g}</b>" if g == letter else g for g in graphemes]
-                    highlightedWords.append(''.join(highlightedGraphemes))
-                # create a string from the list of words, separated by double spaces
-                # put zero-width space in front, or markup may not appear
-                wordList = '\u200B' + '  '.join(highlightedWords)
-                
-                # this is some dubugging code... using my main Chadian Arabic stories test data
-                # the line for "k" is taller than it should be, but if we drag and drop to
-                # another position in the list (with a change in cell text), then it usually
-                # goes back to its proper height
-                #if letter in ["k"]:
-                    #logger.warning('{} example words: {}'.format(letter, wordList))
-                    #wordList = "Testing: " + wordList
-                    #wordList = wordList[100:300]
-                #if letter in ["k", "u"]:
-                    #logger.warning('{} example words: {}'.format(letter, wordList))
-                    #wordList = wordList.replace("<b>", "")
-                    #wordList = wordList.replace("</b>", "")
+            listStore.append(self.TeachingOrderRow(letter))
+    
+    def GetSyllableCache(self):
+        '''Return the cache of the syllabified words, which is emptied first if the settings
+        that the syllables depend on have changed (how the words split into graphemes, the
+        vowels, and keeping doubled vowels or consonants together).
+        
+        Return value: dict of { word, (syllabified graphemes, positions of each grapheme) },
+                      see process_syllables and syllable_positions
+        '''
+        cacheKey = (self.graphemeCacheKey,
+                    None if self.user_defined_vowels is None else frozenset(self.user_defined_vowels),
+                    self.syllable_vowels_together, self.syllable_consonants_together)
+        if cacheKey != self.syllableCacheKey:
+            self.syllableCache = {}
+            self.syllableCacheKey = cacheKey
+            self.positionIndex = {}
+        return self.syllableCache
+    
+    def GetSyllables(self, word, letter):
+        '''Return the syllabified graphemes of a word, and the positions of each of its graphemes
+        (from the cache, or syllabified now and added to it).
+        
+        Parameters: word (str) - word in wordsAsGraphemes
+                    letter (str) - a grapheme of the word
+        Return value: (syllabified graphemes, positions of each grapheme), see process_syllables
+                      and syllable_positions
+        '''
+        syllableCache = self.GetSyllableCache()
+        syllables = syllableCache.get(word)
+        if syllables is None:
+            # syllabify once; passing syllable_filters=None returns the syllabified
+            # graphemes without filtering, which we need for display and position checks
+            _, syllabified = process_syllables(self.wordsAsGraphemes[word], letter,
+                                               vowel_graphemes=self.user_defined_vowels,
+                                               vowels_together=self.syllable_vowels_together,
+                                               consonants_together=self.syllable_consonants_together)
+            syllables = (syllabified, syllable_positions(syllabified))
+            syllableCache[word] = syllables
+        return syllables
+    
+    def GetPositionWords(self, letter, positionMask):
+        '''Return the words in which a letter is used in any of the positions of positionMask.
+        The first time a letter is needed, all the words that use it are indexed by the positions
+        of the letter in them, and the words found for the last positionMask of each letter are
+        kept, so the filters only need to be checked again when they are changed.
+        
+        Parameters: letter (str) - grapheme
+                    positionMask (int) - the positions that pass the filters (see position_filter_mask)
+        Return value: set of words (in syllableCache)
+        '''
+        self.GetSyllableCache()
+        if self.positionIndexWords is not self.graphemeWords:
+            # the words (or how they split into graphemes) have changed since the index was built
+            self.positionIndex = {}
+            self.positionIndexWords = self.graphemeWords
+        index = self.positionIndex.get(letter)
+        if index is None:
+            # { position, set of words with the letter in this position }
+            index = {}
+            for word in self.graphemeWords.get(letter, ()):
+                positions = self.GetSyllables(word, letter)[1].get(letter, 0)
+                while positions:
+                    # the lowest position left
+                    bit = positions & -positions
+                    index.setdefault(bit.bit_length() - 1, set()).add(word)
+                    positions ^= bit
+        else:
+            index, lastMask, positionWords = index
+            if lastMask == positionMask:
+                return positionWords
+        positionWords = set()
+        for position, words in index.items():
+            if positionMask >> position & 1:
+                positionWords |= words
+        self.positionIndex[letter] = (index, positionMask, positionWords)
+        return positionWords
+    
+    def TeachingOrderRow(self, letter):
+        '''Build the teaching order list row for one lesson (applying any active filters).
+        
+        Parameter: letter (str or int) - grapheme of the lesson, or sight word index
+        Return value: list of [display letter, count, example words markup, sight word index]
+        '''
+        if isinstance(letter, int):
+            # this is a sight word entry, eyeballs for display letter
+            dispLetter = '\u2686\u2686'
+            cnt = ''
+            # load list of words
+            swIdx = letter
+            words = self.sightWords[swIdx-1]
+            # create a string from the list of words, separated by double spaces
+            wordList = '  '.join(words)
+        else:
+            dispLetter = letter
+            # if the first character is a combining diacritic
+            if unicodedata.category(dispLetter[0]) == 'Mn':
+                # (previously test was if 0x0300 <= ord(dispLetter[0]) <= 0x036f)
+                # then prepend the dotted circle base character
+                dispLetter = '\u25CC' + dispLetter
+            cnt = str(self.graphemeUse[letter])
+            words = self.graphemeExampleWords[letter]
+            # set sight word index as zero, so we can quickly know that this is not a sight word lesson
+            swIdx = 0
             
-            ## this string could be real long, so truncate it
-            ## earlier ListView had rendering problem, diacritics shift left!
-            #if len(wordList) > 120:
-                ## add ellipsis at the end of truncated string
-                #wordList = wordList[0:120] + '\u2026'
-            listStore.append([dispLetter, cnt, wordList, swIdx])
+            if self.position_filters:
+                # the words with the letter in a position that passes the filters
+                positionWords = self.GetPositionWords(letter, position_filter_mask(self.position_filters))
+                syl_part = self.position_filters[:3]
+                syl_active = not all(syl_part) and any(syl_part)
+            
+            # make a list of words with the target letter highlighted in bold
+            highlightedWords = []
+            for word in words:
+                # get a list of graphemes for this word
+                graphemes = self.wordsAsGraphemes[word]
+                # check to see if the word matches the part of speech filter
+                if self.active_pos_filters:
+                    # there is an active part of speech filter - verify that this word passes
+                    word_pos = self.words_with_pos.get(word)
+                    if not word_pos or not any(p in self.active_pos_filters for p in word_pos):
+                        # we don't know POS or it doesn't match the filter, don't add it
+                        continue
+                # check syllable and/or word position filters (occurrence-level AND:
+                # a single occurrence of the letter must satisfy both active filters)
+                if self.position_filters:
+                    if word not in positionWords:
+                        continue
+                    # show syllable-boundary dots in the word display only when the
+                    # syllable position filter is active
+                    if syl_active:
+                        graphemes = self.syllableCache[word][0]
+                # text filter: match against the plain word form (no syllable dots)
+                if self.word_text_filter:
+                    if self.word_text_filter not in ''.join(g for g in graphemes if g != '.'):
+                        continue
+                # highlight the current grapheme in bold
+                highlightedGraphemes = [f"<b>{g}</b>" if g == letter else g for g in graphemes]
+                highlightedWords.append(''.join(highlightedGraphemes))
+            # create a string from the list of words, separated by double spaces
+            # put zero-width space in front, or markup may not appear
+            wordList = '\u200B' + '  '.join(highlightedWords)
+            
+            # this is some dubugging code... using my main Chadian Arabic stories test data
+            # the line for "k" is taller than it should be, but if we drag and drop to
+            # another position in the list (with a change in cell text), then it usually
+            # goes back to its proper height
+            #if letter in ["k"]:
+                #logger.warning('{} example words: {}'.format(letter, wordList))
+                #wordList = "Testing: " + wordList
+                #wordList = wordList[100:300]
+            #if letter in ["k", "u"]:
+                #logger.warning('{} example words: {}'.format(letter, wordList))
+                #wordList = wordList.replace("<b>", "")
+                #wordList = wordList.replace("</b>", "")
+        
+        ## this string could be real long, so truncate it
+        ## earlier ListView had rendering problem, diacritics shift left!
+        #if len(wordList) > 120:
+            ## add ellipsis at the end of truncated string
+            #wordList = wordList[0:120] + '\u2026'
+        return [dispLetter, cnt, wordList, swIdx]
     
     def TeachingOrderDoubleClick(self, widget, row):
         '''User double-clicked on a lesson in the teaching order. If a letter,
@@ -2048,11 +2406,12 @@ will be output in decomposed format.""")
                     self.sightWords[sightWordIdx] = sightWordList
                     model[row][2] = '  '.join(sightWordList)
         else:
-            phrases = self.GetPhrases(row[0])
-            if len(phrases) > 0:
+            phrases = self.IterPhrases(row[0])
+            firstPhrase = next(phrases, None)
+            if firstPhrase is not None:
                 # only display a concordance if we have data
                 # create and run a class instance of ConcordanceDialog
-                myGlobalWindow.theConcordanceDialog.Run(letter, phrases)
+                myGlobalWindow.theConcordanceDialog.Run(letter, itertools.chain([firstPhrase], phrases))
             else:
                 title = _("Information")
                 msg = _("No phrases of two or more words available.")
@@ -2086,27 +2445,97 @@ will be output in decomposed format.""")
             txt += dispLetter+'\t'+ str(cnt)+'\t'+wordList+'\n'
         return txt
     
+    def GetWordListText(self):
+        '''Build a text version of the word list, with the higher frequency words first.
+        
+        Return value: str of entire word list (formatted for text output)
+        '''
+        kWordCnt = 0
+        kWordManual = 1
+        kWordExclude = 2
+        kWordAffixForm = 3
+        kWordMarkupForm = 4
+        
+        lines = []
+        for word in sorted(self.words, key=self.words.get, reverse=True):
+            word_info = self.words[word]
+            if len(self.affixes) == 0:
+                # no affixes, just print out word and count
+                lines.append(word + '\t' + str(word_info[kWordCnt]) + '\n')
+            else:
+                #  print out word, count, and affix form
+                lines.append(word + '\t' + str(word_info[kWordCnt]) + '\t' + word_info[kWordAffixForm] + '\n')
+        return ''.join(lines)
+    
     def ReprocessTextsForChars(self):
-        '''Reprocess all texts to find chars (e.g. if diacritics are now separated)
+        '''Find the chars of all texts again (e.g. if diacritics are now separated), from the counts of
+        the character clusters of each text, without reading the texts again.
         '''
         # start with new character lists
-        self.chars = {' ': 1, '\xa0': 1}
+        self.chars = {' ': 0, '\xa0': 0}
         self.wordBreakChars = [' ', '\xa0']  # must include space and no-break space
         self.wordFormChars = []
         # add all characters from the text data
-        for lines in self.fileLines:
-            #logger.debug('Reprocessing:', self.fileNames[i].encode('utf-8'), ' for chars')
-            self.FindChars(lines)
+        for clusterCounts in self.fileCharCounts:
+            self.AddCharCounts(text_import.CharCounts(clusterCounts, self.separateCombDiacritics))
     
     def ReprocessTextsForWords(self):
-        '''Reprocess all texts to find words (e.g. given modified word break character information)
+        '''Reprocess the texts to find words (e.g. given modified word break character information).
+        Only the texts with a character that is now classified differently are counted again, and if a text
+        has been split into words already, only its lines with such a character are split again.
         '''
-        # clear out current word data
-        self.words = {}
-        # find words in each file again
-        for i in range(len(self.fileNames)):
-            #logger.debug('Reprocessing:', self.fileNames[i].encode('utf-8'), ' for words')
-            self.FindWords(self.fileLines[i])
+        tokenizer = self.GetTokenizer()
+        for fileNum, lines in enumerate(self.fileLines):
+            oldBreakChars = self.fileWordBreakChars[fileNum]
+            if self.SplitsTheSame(fileNum, oldBreakChars, tokenizer.wordBreakChars):
+                # this text doesn't use any of the characters that are classified differently
+                self.fileWordBreakChars[fileNum] = list(self.wordBreakChars)
+                continue
+            tokens = self.fileTokens[fileNum]
+            if tokens is not None and self.SplitsTheSame(fileNum, tokens.wordBreakChars, oldBreakChars):
+                # the lines have been split into words already, so only split the lines with a code point
+                # of a character that is now classified differently (skipping the chunks of lines that
+                # don't have any of them), and count the words from the tokens
+                changedChars = set(oldBreakChars) ^ set(self.wordBreakChars)
+                findChanged = re.compile('[' + re.escape(''.join(changedChars)) + ']')
+                changedLineNums = []
+                changedLines = []
+                for start in range(0, len(lines), text_import.CHUNK_LINES):
+                    stop = start + text_import.CHUNK_LINES
+                    if findChanged.search(lines.Text(start, stop)):
+                        for lineNum, line in enumerate(lines[start:stop], start):
+                            if findChanged.search(line):
+                                changedLineNums.append(lineNum)
+                                changedLines.append(line)
+                tokens.Retokenize(changedLineNums, changedLines, tokenizer)
+                wordCounts = tokens.WordCounts()
+            else:
+                wordCounts = text_import.CountWords(lines, tokenizer)
+            # the words of the text, in the order they are first found (which the teaching order
+            # uses to order words with the same counts)
+            self.fileWordCounts[fileNum] = text_import.FilterWordCounts(wordCounts)
+            self.fileWordBreakChars[fileNum] = list(self.wordBreakChars)
+        self.RebuildWords()
+        
+        # process the affixes as well, if any; also sets teachingOrderChanged to True to force recalculating teaching order
+        self.ProcessAffixes()
+    
+    def BuildFileCharCounts(self):
+        '''Count the character clusters of each file, and the characters in chars
+        (for projects saved before the characters were counted).'''
+        self.fileCharCounts = [text_import.CountCharClusters(lines) for lines in self.fileLines]
+        self.chars = dict.fromkeys(self.chars, 0)
+        for clusterCounts in self.fileCharCounts:
+            for char, cnt in text_import.CharCounts(clusterCounts, self.separateCombDiacritics).items():
+                if char in self.chars:
+                    self.chars[char] += cnt
+    
+    def BuildFileWordCounts(self):
+        '''Count the words of each file (for projects saved before the counts were kept per file).'''
+        tokenizer = self.GetTokenizer()
+        self.fileWordCounts = [text_import.FilterWordCounts(text_import.CountWords(lines, tokenizer))
+                               for lines in self.fileLines]
+        self.fileWordBreakChars = [list(self.wordBreakChars) for lines in self.fileLines]
     
     def ProcessAffixes(self):
         '''Words or affixes have changed. Make sure that all words in the word list have affixes marked appropriately.'''
@@ -2131,7 +2560,8 @@ will be output in decomposed format.""")
         kWordMarkupForm = 4
         
         zwj = ''
-        if 'Scheherazade' in myGlobalRenderer.fontName or 'Harmattan' in myGlobalRenderer.fontName:
+        # (there is no renderer in batch mode, but then the markup form is never displayed anyway)
+        if myGlobalRenderer is not None and ('Scheherazade' in myGlobalRenderer.fontName or 'Harmattan' in myGlobalRenderer.fontName):
             # include zero width joiners (ZWJ, U+200D) for these two fonts, to approximate joining across markup
             zwj = '\u200d'
         
@@ -2222,7 +2652,7 @@ will be output in decomposed format.""")
         # save a copy of the list to compare later
         saveChars = self.wordBreakChars[:]
         # run the WordBreaksDialog
-        if myGlobalWindow.theWordBreaksDialog.Run(self.wordBreakChars, self.wordFormChars):
+        if myGlobalWindow.theWordBreaksDialog.Run(self.wordBreakChars, self.wordFormChars, self.chars):
             # user clicked OK, so get and store data from the listStores
             # make sure to include the invisible space and invisible non-breaking space
             self.wordBreakChars = [' ', '\xa0'] + myGlobalWindow.theWordBreaksDialog.GetWordBreakChars()
@@ -2305,9 +2735,6 @@ will be output in decomposed format.""")
         #  get the word info, which is modifiable (in place)
         word_info = self.words[word]
         
-        #  get a concordance of this word
-        concordance = self.GetConcordance(word)
-        
         zwj = ''
         if 'Scheherazade' in myGlobalRenderer.fontName or 'Harmattan' in myGlobalRenderer.fontName:
             # include zero width joiners (ZWJ, U+200D) for these two bad fonts, to approximate joining across markup
@@ -2316,8 +2743,9 @@ will be output in decomposed format.""")
         
         valid = False
         while not valid:
-            # run the word edit dialog
-            if myGlobalWindow.theWordEditDialog.Run(word, word_info[kWordAffixForm], word_info[kWordExclude], concordance):
+            # run the word edit dialog (with a concordance of this word)
+            if myGlobalWindow.theWordEditDialog.Run(word, word_info[kWordAffixForm], word_info[kWordExclude],
+                                                    self.IterConcordance(word)):
                 # user clicked OK in the WordEditDialog, assume we have a valid input
                 valid = True
                 # check if we should exclude it
@@ -2459,50 +2887,97 @@ Please try again.""")
         Parameter: word (str) - the word to find in the text
         Return value: (str) - "concordance" of word in context
         '''
-        # build 'breaks' string with all word breaking characters for RegEx matching
-        breaks = ' '
-        for char in self.wordBreakChars:
-            # need to put '\' before special characters
-            if char in '.^$*+-?{}\\[]|()':
-                breaks = breaks + '\\'
-            breaks = breaks + char
-        
-        concordance = ""
-        for fileNum in range(len(self.fileNames)):
-            for line in self.fileLines[fileNum]:
-                # we split the line, which returns a list of strings with
-                # the word desired (as elements 1,3,...)
-                # and with the surrounding context (as elements 0,2,4,...)
-                wordsFound = re.split("("+word+")", line, 0, re.I)
-                # for i = each odd index in the list (ie. index of each word found)
-                for i in range(1, len(wordsFound), 2):
-                    pretext = "".join(wordsFound[:i])
-                    # skip if the word is not immediately preceded by word break char
-                    if len(pretext)>0 and pretext[-1] not in breaks:
-                        continue
-                    posttext = "".join(wordsFound[i+1:])
-                    # skip if the word is not immediately followed by word break char
-                    if len(posttext)>0 and posttext[0] not in breaks:
-                        continue
+        return '\n'.join('\t'.join(line) for line in self.IterConcordance(word))
+    
+    def IterConcordance(self, word):
+        '''Find the given word in context, one occurrence at a time (so a concordance
+        can be shown before all of the occurrences are found).
+        
+        Parameter: word (str) - the word to find in the text
+        Return value: generator of (pre-context, word, post-context) of each occurrence
+        '''
+        for concordWord, pretext, wordFound, posttext in self.IterConcordances([word]):
+            yield (pretext, wordFound, posttext)
+    
+    def IterConcordances(self, words):
+        '''Find each of the given words in context, one word after the other (with all of its
+        occurrences in each text). The occurrences are looked up in the index of the words of
+        each text (see corpus.TokenizedLines.Find), so the texts are only gone through once
+        to build it, however many words there are.
+        
+        Parameter: words (iterable of str) - the words to find in the text
+        Return value: generator of (word, pre-context, word found, post-context) of each occurrence
+        '''
+        tokenizer = self.GetTokenizer()
+        # RegExes to only show full words in the context
+        findAfterFirstBreaks = re.compile(tokenizer.breakClass + '+(.+)')
+        findToLastBreaks = re.compile('(.+' + tokenizer.breakClass + '+)')
+        
+        fileTokens = None
+        for word in words:
+            if fileTokens is None:
+                fileTokens = [self.GetFileTokens(fileNum) for fileNum in range(len(self.fileNames))]
+            wordLower = word.lower()
+            for tokens in fileTokens:
+                # look up where this word (in any case) is used
+                for lineNum, pos in tokens.Find(tokens.WordIds(wordLower)):
+                    lineIds = tokens.Line(lineNum)
+                    wordFound = tokens.vocab[lineIds[pos]]
                     # limit the context to 40 characters before/after
-                    if len(pretext)>40: pretext = pretext[-40:]
-                    if len(posttext)>40: posttext = posttext[:40]
+                    pretext = tokens.Join(lineIds[:pos])[-40:]
+                    posttext = tokens.Join(lineIds[pos+1:])[:40]
                     # only show full words in the pretext and posttext
-                    m = re.search(r'[\s' + breaks + ']+(.+)', pretext)
+                    m = findAfterFirstBreaks.search(pretext)
                     if m:
                         # only keep the text found after the first breaks
                         pretext = m.group(1)
-                    m = re.search(r'(.+[\s' + breaks + ']+)', posttext)
+                    m = findToLastBreaks.search(posttext)
                     if m:
                         # only keep the text up to and including last breaks
                         posttext = m.group(1)
-                    # store this information as a line in the concordance
                     # make sure to remove any tab characters in strings, to not throw off columns
-                    concordance += pretext.replace('\t', ' ') + "\t" + \
-                                   wordsFound[i].replace('\t', ' ') + "\t" + \
-                                   posttext.replace('\t', ' ') + "\n"
-        # return the concordance, but without the final newline
-        return concordance[:-1]
+                    yield (word, pretext.replace('\t', ' '), wordFound.replace('\t', ' '), posttext.replace('\t', ' '))
+    
+    def IterConcordancesText(self, words, asHTML=False, fontFamily='', isRTL=False):
+        '''Build a text version of the concordances of the given words, a part at a time
+        (so it can be written to a file as it is made). Each line of the text version looks like this:
+           word \t pre-context \t word found \t post-context \n
+        and the HTML version has a table of the occurrences of each word, under a heading with the word.
+        
+        Parameters: words (iterable of str) - the words to find in the text
+                    asHTML (bool) - True for an HTML page instead of text
+                    fontFamily (str) - font for the vernacular text (in the HTML page)
+                    isRTL (bool) - True if the vernacular text is right-to-left (in the HTML page)
+        Return value: generator of str, the parts of the text
+        '''
+        if not asHTML:
+            for line in self.IterConcordances(words):
+                yield '\t'.join(line) + '\n'
+            return
+        
+        yield '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        yield '<title>' + html.escape(_("Concordance")) + '</title>\n'
+        yield '<style>\n'
+        # (leave out any characters that would end the font name, or the style)
+        fontFamily = re.sub("['<>\\\\]", '', fontFamily)
+        yield 'body { font-family: ' + ("'" + fontFamily + "', " if fontFamily else '') + 'Charis, Gentium, serif; }\n'
+        yield 'td.pre { text-align: end; white-space: pre; }\n'
+        yield 'td.word { font-weight: bold; text-align: center; white-space: pre; }\n'
+        yield 'td.post { text-align: start; white-space: pre; }\n'
+        yield '</style>\n</head>\n'
+        yield '<body dir="rtl">\n' if isRTL else '<body>\n'
+        prevWord = None
+        for word, pretext, wordFound, posttext in self.IterConcordances(words):
+            if word != prevWord:
+                if prevWord is not None:
+                    yield '</table>\n'
+                yield '<h2>' + html.escape(word) + '</h2>\n<table>\n'
+                prevWord = word
+            yield '<tr><td class="pre">' + html.escape(pretext) + '</td><td class="word">' + \
+                  html.escape(wordFound) + '</td><td class="post">' + html.escape(posttext) + '</td></tr>\n'
+        if prevWord is not None:
+            yield '</table>\n'
+        yield '</body>\n</html>\n'
     
     def GetPhrases(self, row):
         '''Return a string which contains a "concordance" of the phrases that are
@@ -2514,62 +2989,136 @@ Please try again.""")
                                from the teaching order
         Return value: (str) - "concordance" of phrases possible with these letters
         '''
-        # build 'breaks' string with a list of all of the word-breaking
-        # characters for RegEx matching
-        breaks = ''
-        for char in self.wordBreakChars:
-            # need to put '\' before special characters
-            if char in '.^$*+-?{}\\[]|()':
-                breaks = breaks + '\\'
-            breaks = breaks + char
-        
-        # build up a list of all possible words using letters that are
-        # taught down to row #row
-        possibleWords = []
-        for i in range(row+1):
-            letter = self.teachingOrder[i]
-            if isinstance(letter, int):
-                # add sight word list
-                possibleWords.extend(self.sightWords[letter-1])
-            else:
-                # add example word list
-                possibleWords.extend(self.graphemeExampleWords[letter])
+        return '\n'.join('\t'.join(line) for line in self.IterPhrases(row))
+    
+    def IterPhrases(self, row):
+        '''Find the phrases that are possible by using the words that are available at this
+        row number and higher in the teaching order, longest possible phrase first (so all of the
+        phrases are found when the first one is asked for, to put them in order).
+        
+        Parameter: row (int) - include letters/words down to this row number
+                               from the teaching order
+        Return value: generator of (pre-context, phrase, post-context) of each phrase
+        '''
+        # the words are possible from the row where they are first used as example words (or sight words)
+        wordLessons = self.GetWordLessons()
         
         # build a list of tuples that contain the length of the found string
         # (because we want to put the longest strings first)
         phraseList = []
         for fileNum in range(len(self.fileNames)):
-            for line in self.fileLines[fileNum]:
-                # turn tabs in text into spaces (since tabs delineate the concordance)
-                line = line.replace('\t', ' ')
-                # split the line into words
-                linewords = re.split(r'([\s' + breaks + r']+)', line)
+            tokens = self.GetFileTokens(fileNum)
+            tokens.RankWords(wordLessons)
+            # the rows from which each token is a possible word
+            tokenLessons = tokens.tokenRanks
+            # only look at the lines that have at least 2 possible words together
+            lineNums = dict.fromkeys(lineNum for lineNum, pos in tokens.FindRanked(row))
+            for lineNum in lineNums:
+                # the token ids of the words (even elements) and breaks (odd elements) in the line
+                linewords = tokens.Line(lineNum)
                 i = 0
                 while i < len(linewords):
-                    if linewords[i].lower() in possibleWords:
+                    if tokenLessons[linewords[i]] <= row:
                         j = i+2
                         while j < len(linewords) and \
-                              linewords[j].lower()in possibleWords:
+                              tokenLessons[linewords[j]] <= row:
                             j += 2
                         if j > i+2:
                             # we have at least 2 example words together
                             strt = max(i-6, 0) # try to show 3 words before as context
                             fnsh = min(j+6, len(linewords)) # and 3 words after
-                            phrase = ''.join(linewords[strt:i]) + "\t"
-                            possiblePhrase = ''.join(linewords[i:j-1])
-                            phrase += possiblePhrase + "\t"
-                            phrase += ''.join(linewords[j-1:fnsh]) + "\n"
+                            # turn tabs in text into spaces (since tabs delineate the concordance)
+                            pretext = tokens.Join(linewords[strt:i]).replace('\t', ' ')
+                            possiblePhrase = tokens.Join(linewords[i:j-1]).replace('\t', ' ')
+                            posttext = tokens.Join(linewords[j-1:fnsh]).replace('\t', ' ')
                             # add this phrase to the list, with the length of its possible phrase
-                            phraseList.append( (len(possiblePhrase), phrase) )
+                            phraseList.append( (len(possiblePhrase), pretext, possiblePhrase, posttext) )
                             # move counter past last example word already matched
                             i = j
                     i += 1
-        # combine the phrases, longest possible phrase first
-        phrases = ""
-        for (ln, s) in sorted(phraseList, reverse=True):
-            phrases += s
-        # return the phrases, but without the final newline
-        return phrases[:-1]
+        # longest possible phrase first
+        phraseList.sort(reverse=True)
+        for ln, pretext, possiblePhrase, posttext in phraseList:
+            yield (pretext, possiblePhrase, posttext)
+    
+    def GetWordLessons(self):
+        '''Return the row of the teaching order from which each word can be read, i.e. the first row
+        that has it as an example word (or sight word).
+        
+        Return value: dict of { word, row in teachingOrder }
+        '''
+        wordLessons = {}
+        for row, letter in enumerate(self.teachingOrder):
+            if isinstance(letter, int):
+                # sight word list
+                words = self.sightWords[letter-1]
+            else:
+                # example word list
+                words = self.graphemeExampleWords[letter]
+            for word in words:
+                wordLessons.setdefault(word, row)
+        return wordLessons
+    
+    def GetDecodableSentences(self):
+        '''Find the sentences of the texts that can be read at some row of the teaching order, i.e.
+        all of their words are example words (or sight words) up to that row. The sentences of each
+        text are ranked in one pass over its words, which is only done again when the teaching order
+        (or the text) changes.
+        
+        Return value: list of (row in teachingOrder, number of words, sentence) - each different sentence,
+                      in the order of the rows, with the longest sentences of each row first
+        '''
+        wordLessons = self.GetWordLessons()
+        rankedSentences = []
+        for fileNum in range(len(self.fileNames)):
+            tokens = self.GetFileTokens(fileNum)
+            tokens.RankWords(wordLessons)
+            rankedSentences.append(tokens.RankSentences(text_import.SENTENCE_ENDS))
+        if self.decodableSentences is not None and len(self.decodableSentences[0]) == len(rankedSentences) and \
+           all(old is new for old, new in zip(self.decodableSentences[0], rankedSentences)):
+            # nothing has been ranked again since last time, so the sentences are the same
+            return self.decodableSentences[1]
+        sentences = {}
+        for fileNum, fileSentences in enumerate(rankedSentences):
+            tokens = self.fileTokens[fileNum]
+            for row, start, stop in fileSentences:
+                sentenceIds = tokens.ids[start:stop]
+                # turn tabs in the text into spaces (since tabs delineate the exported list)
+                sentence = tokens.Join(sentenceIds).replace('\t', ' ').strip()
+                if sentence not in sentences:
+                    numWords = sum(1 for tokenId in sentenceIds[0::2] if tokens.vocab[tokenId])
+                    sentences[sentence] = (row, numWords)
+        decodable = [(row, numWords, sentence) for sentence, (row, numWords) in sentences.items()]
+        decodable.sort(key=lambda s: (s[0], -s[1]))
+        self.decodableSentences = (rankedSentences, decodable)
+        return decodable
+    
+    def GetDecodableSentencesText(self, decodable):
+        '''Build a text version of the decodable sentences.
+        
+        Parameter: decodable (list) - the sentences, as returned by GetDecodableSentences
+        Return value: str of the lesson number, letter, number of words and sentence
+                      of each sentence (formatted for text output)
+        '''
+        lines = []
+        for row, numWords, sentence in decodable:
+            lines.append(str(row + 1) + '\t' + self.GetLessonLetter(row) + '\t' +
+                         str(numWords) + '\t' + sentence + '\n')
+        return ''.join(lines)
+    
+    def GetLessonLetter(self, row):
+        '''Return the letter of a row of the teaching order, as it is displayed.
+        
+        Parameter: row (int) - row in teachingOrder
+        Return value: str, the grapheme, or "StWds" for a sight word lesson
+        '''
+        letter = self.teachingOrder[row]
+        if isinstance(letter, int):
+            return _("StWds")
+        if unicodedata.category(letter[0]) == 'Mn':
+            # prepend the dotted circle base character to a combining diacritic
+            return '\u25CC' + letter
+        return letter
     
     def LevenshteinRatio(self, s, t):
         ''' Calculates levenshtein distance ratio of similarity between two strings.
@@ -2611,9 +3160,26 @@ Please try again.""")
         '''
         # fileNames: list of file names (with path) that have been loaded
         self.fileNames = []
-        # fileLines: list of lists of lines in the files
+        # fileLines: list of the lines in the files
         self.fileLines = []
-        # note that fileLines[n] is a list of lines in fileNames[n]
+        # note that fileLines[n] is a corpus.TextLines with the lines in fileNames[n]
+        # fileWordCounts: list of Counters of { word, count in the file }, one per file
+        self.fileWordCounts = []
+        # fileWordBreakChars: list of the wordBreakChars that each file's words were split with
+        self.fileWordBreakChars = []
+        # fileEncodingForms: list of (containsNFC, containsNFD) of each file (None if not known)
+        self.fileEncodingForms = []
+        # fileCharCounts: list of Counters of { character cluster (with its combining diacritics), count }, one per file
+        self.fileCharCounts = []
+        # filePOS: list of the (lexeme, part of speech) pairs of each file, for words_with_pos
+        #   ([] for a text, None if not known)
+        self.filePOS = []
+        # fileTokens: list of the corpus.TokenizedLines of each file (None until needed, see GetFileTokens),
+        #   not saved with the project
+        self.fileTokens = []
+        # decodableSentences: (the ranked sentences of each file, the sentences from GetDecodableSentences)
+        #   of the last time they were found, not saved with the project
+        self.decodableSentences = None
         
         # flag for if the data contains NFC composed characters
         self.containsNFC = False
@@ -2622,11 +3188,13 @@ Please try again.""")
         # flag for if the user has been warned about inconsistent encoding
         self.userInformedEncodingError = False
         
-        # chars: dictionary of { char: 1 } for all characters used in all texts
-        self.chars = {' ': 1, '\xa0': 1}
+        # chars: dictionary of { char: count } for all characters used in all texts
+        self.chars = {' ': 0, '\xa0': 0}
         # lists of characters that are used for word breaking or word forming
         self.wordBreakChars = [' ', '\xa0']  # must include space and no-break space
         self.wordFormChars = []
+        # tokenizer: text_import.WordTokenizer that splits text into words with wordBreakChars (see GetTokenizer)
+        self.tokenizer = None
         # digraphs: list of character combinations that should be considered digraphs
         self.digraphs = []
         # affixes: list of affixes, each of which includes '-' at beginning or end, to indicate attach point
@@ -2665,6 +3233,20 @@ Please try again.""")
         
         # default value for treating combining diacritics separately
         self.separateCombDiacritics = False
+        # graphemeCache: dict of { word or morpheme (str), list of graphemes in it }, saved with the project
+        #   graphemeCacheKey: the orthography settings (digraphs, separateCombDiacritics) used for the cache
+        self.graphemeCache = {}
+        self.graphemeCacheKey = None
+        # syllableCache: dict of { word, (syllabified graphemes, positions of each grapheme) }, not saved with the project
+        #   syllableCacheKey: the settings (graphemes, vowels, syllable options) used for the cache
+        self.syllableCache = {}
+        self.syllableCacheKey = None
+        # positionIndex: dict of { grapheme, ({ position, set of words with the grapheme in this position },
+        #   the last positionMask, the words with the grapheme in its positions) } (see GetPositionWords),
+        #   not saved with the project
+        #   positionIndexWords: the graphemeWords that the index was built from
+        self.positionIndex = {}
+        self.positionIndexWords = None
         # define default parameters for dealing with SFM files
         self.sfmProcessSFMs = False
         self.sfmIgnoreLines = 'id|rem|restore|h|toc1|toc2|toc3'
@@ -2677,7 +3259,7 @@ Please try again.""")
 
 
 
-class GtkBuilder(Gtk.Builder):
+class GtkBuilder(object if BATCH_MODE else Gtk.Builder):
 
     def __init__(self, glade_file, APP_NAME):
         super().__init__()
@@ -2789,28 +3371,64 @@ class Handler:
         chooser.set_default_response(Gtk.ResponseType.OK)
         if chooser.run() == Gtk.ResponseType.OK:
             filename = chooser.get_filename()
-            filetext = ''
-            kWordCnt = 0
-            kWordManual = 1
-            kWordExclude = 2
-            kWordAffixForm = 3
-            kWordMarkupForm = 4
-            
-            # save the higher frequency words first
-            for word in sorted(myGlobalWindow.analysis.words, key=myGlobalWindow.analysis.words.get, reverse=True):
-                word_info = myGlobalWindow.analysis.words[word]
-                if len(myGlobalWindow.analysis.affixes) == 0:
-                    # no affixes, just print out word and count
-                    filetext = filetext + word + '\t' + str(word_info[kWordCnt]) + '\n'
-                else:
-                    #  print out word, count, and affix form
-                    filetext = filetext + word + '\t' + str(word_info[kWordCnt]) + '\t' + word_info[kWordAffixForm] + '\n'
+            filetext = myGlobalWindow.analysis.GetWordListText()
             # write out the data
             myGlobalWindow.WriteFile(filename, filetext, myGlobalWindow.analysis.containsNFC, myGlobalWindow.analysis.containsNFD)
             # save this path for next time we need to write out a file
             myGlobalPath = os.path.dirname(filename)
         chooser.destroy()
     
+    def on_saveConcordancesMenuItem_activate(self, *args):
+        '''Process the File > Save Concordances menu, for the words shown in the word list.'''
+        global myGlobalWindow
+        global myGlobalPath
+        global myGlobalRenderer
+        # the words shown in the word list (all of them, or those that match the filters), in the same order
+        words = [row[2] for row in myGlobalWindow.wordListTreeView.get_model()]
+        if len(words) == 0:
+            # no words, just exit quietly
+            return
+        msg = _("Save concordances as...")
+        chooser = Gtk.FileChooserDialog(title=msg, parent=myGlobalWindow.window,
+                                        action=Gtk.FileChooserAction.SAVE)
+        chooser.add_buttons(Gtk.STOCK_SAVE, Gtk.ResponseType.OK,
+                            Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL)
+        chooser.set_transient_for(myGlobalWindow.window)
+        chooser.set_current_name(_("Concordances.txt"))
+        chooser.set_current_folder(myGlobalPath)
+        chooser.set_do_overwrite_confirmation(True)
+        chooser.set_default_response(Gtk.ResponseType.OK)
+        
+        # set up file filters for the chooser (the file is saved as a web page if its name ends with .html)
+        filter = Gtk.FileFilter()
+        filter.set_name(_("Text files (tab separated)"))
+        filter.add_pattern("*.txt")
+        chooser.add_filter(filter)
+        filter = Gtk.FileFilter()
+        filter.set_name(_("Web pages"))
+        filter.add_pattern("*.html")
+        filter.add_pattern("*.htm")
+        chooser.add_filter(filter)
+        
+        if chooser.run() == Gtk.ResponseType.OK:
+            filename = chooser.get_filename()
+            asHTML = filename.lower().endswith(('.html', '.htm'))
+            filetext = myGlobalWindow.analysis.IterConcordancesText(words, asHTML,
+                                                                    myGlobalRenderer.vernFontDesc.get_family(),
+                                                                    myGlobalWindow.isRTL)
+            # write out the data (as it is found)
+            try:
+                myGlobalWindow.WriteFile(filename, filetext, myGlobalWindow.analysis.containsNFC, myGlobalWindow.analysis.containsNFD)
+            except Exception as e:
+                # an error finding the concordances (errors writing the file are reported by WriteFile)
+                logger.exception("Error finding the concordances")
+                title = _("Error")
+                msg = _("Error finding the concordances: ") + str(e)
+                SimpleMessage(title, 'dialog-error', msg)
+            # save this path for next time we need to write out a file
+            myGlobalPath = os.path.dirname(filename)
+        chooser.destroy()
+    
     def on_selectFontMenuItem_activate(self, *args):
         '''Process the Configure > Select the Text Font menu, to choose display font.'''
         global myGlobalWindow
@@ -2904,6 +3522,11 @@ introducing the letters in a primer.""")
         #SimpleMessage(title, 'dialog-information', msg)
         # run the open file dialog, and handle loading the lexicon file chosen
         myGlobalWindow.AddLexicon()
+    
+    def on_removeTextButton_clicked(self, *args):
+        '''Remove the text (or lexicon) selected in the file list from the analysis.'''
+        global myGlobalWindow
+        myGlobalWindow.RemoveText()
         
     def on_showFullPathCheckButton_toggled(self, *args):
         global myGlobalBuilder
@@ -2917,6 +3540,18 @@ introducing the letters in a primer.""")
                 name = filename.split('\\')[-1]
             fileListStore.append([name])
     
+    def on_keepTextsOnDiskCheckButton_toggled(self, widget, data=None):
+        global myGlobalWindow
+        global myGlobalConfig
+        global myGlobalProjectPath
+        global myGlobalProjectName
+        # update config object and save
+        myGlobalConfig['Option']['keeptextsondisk'] = '1' if widget.get_active() else '0'
+        SaveConfig()
+        # move the texts to the cache files (or back into memory)
+        projectFile = os.path.join(myGlobalProjectPath, myGlobalProjectName) if myGlobalProjectName else ''
+        myGlobalWindow.UpdateCorpusCache(projectFile)
+    
     def on_affixesRadioButton_toggled(self, *args):
         global myGlobalWindow
         global myGlobalConfig
@@ -3142,8 +3777,13 @@ introducing the letters in a primer.""")
                     context (unused)
         '''
         global myGlobalWindow
-        myGlobalWindow.analysis.TeachingOrderModified(myGlobalWindow.teachingOrderListStore)
-        myGlobalWindow.analysis.UpdateTeachingOrderList(myGlobalWindow.teachingOrderListStore)
+        # only the rows between the old and new positions of the dragged lesson change,
+        # so only those rows are updated (and remeasured by the TreeView)
+        changedRows = myGlobalWindow.analysis.TeachingOrderModified(myGlobalWindow.teachingOrderListStore)
+        if len(changedRows) == 0:
+            # dropped back in the same place, nothing to do
+            return
+        myGlobalWindow.analysis.UpdateTeachingOrderList(myGlobalWindow.teachingOrderListStore, changedRows)
         myGlobalWindow.analysis.dataChanged = True
         
         # find letter and select that row in the new teaching order
@@ -3233,6 +3873,40 @@ introducing the letters in a primer.""")
         global myGlobalWindow
         myGlobalWindow.MarkUntaught(myGlobalWindow.lessonTextsTextBuffer)
     
+    def on_compareTeachingOrdersButton_clicked(self, button):
+        '''Show the teaching orders of the different strategies and counting options side by side.'''
+        myGlobalWindow.CompareTeachingOrders()
+    
+    def on_optimizeTeachingOrderButton_clicked(self, button):
+        '''Search for a teaching order with better word coverage.'''
+        myGlobalWindow.OptimizeTeachingOrder()
+    
+    def on_decodableSentencesButton_clicked(self, button):
+        '''Show the sentences that can be read at each lesson, from the selected lesson on.'''
+        global myGlobalWindow
+        (model, row) = myGlobalWindow.teachingOrderTreeView.get_selection().get_selected()
+        if row is None:
+            # no lesson selected, just exit quietly
+            return
+        myGlobalWindow.ShowDecodableSentences(model.get_path(row).get_indices()[0])
+    
+    def on_lessonTextsSentencesButton_clicked(self, button):
+        '''Show the sentences that can be read at each lesson, from the selected lesson on.'''
+        global myGlobalWindow
+        (model, row) = myGlobalWindow.lessonTextsTreeView.get_selection().get_selected()
+        if row is None:
+            # no lesson selected, just exit quietly
+            return
+        myGlobalWindow.ShowDecodableSentences(model.get_path(row).get_indices()[0])
+    
+    def on_teachingOrderCancelButton_clicked(self, button):
+        '''Stop calculating the teaching order.'''
+        myGlobalWindow.CancelTeachingOrderCalculation()
+    
+    def on_teachingOrderRecalculateButton_clicked(self, button):
+        '''Start calculating the teaching order again (after it was cancelled or failed).'''
+        myGlobalWindow.StartTeachingOrderCalculation()
+    
     def on_notebook_switch_page(self, notebook, tab, index):
         '''User has moved to a different tab (page) in the notebook interface.
         
@@ -3249,20 +3923,12 @@ introducing the letters in a primer.""")
             if myGlobalNotebookPage == 0 and index >= 1:
                 # moving from word discovery to a page where we need to display the teaching order
                 if myGlobalWindow.analysis.teachingOrderChanged:
-                    # if data has changed, calculate a new teaching order
-                    myGlobalWindow.analysis.CalculateTeachingOrder(myGlobalWindow.affixesExcluded.get_active(),
-                                                                   myGlobalWindow.countEachWord.get_active())
-                    myGlobalWindow.analysis.UpdateTeachingOrderList(myGlobalWindow.teachingOrderListStore)
-                    GLib.idle_add(myGlobalWindow._fix_teaching_order_heights_after_draw)
-                    # reset the selection of the Teaching Order to the beginning of the lists
-                    treeview = myGlobalWindow.teachingOrderTreeView
-                    treeview.get_selection().select_path(Gtk.TreePath("0"))
-                    treeview = myGlobalWindow.lessonTextsTreeView
-                    treeview.get_selection().select_path(Gtk.TreePath("0"))
-                    # allow the teaching order to be saved
-                    menu = myGlobalBuilder.get_object("saveTeachingOrderMenuItem")
-                    menu.set_sensitive(True)
+                    # if data has changed, calculate a new teaching order (in the background,
+                    # the teaching order lists are updated when the calculation is finished)
+                    myGlobalWindow.StartTeachingOrderCalculation()
             elif myGlobalNotebookPage >= 1 and index == 0:
+                # any teaching order still being calculated will be out of date once changes are made
+                myGlobalWindow.CancelTeachingOrderCalculation()
                 # moving from a teaching order page back to word discovery, give warning that changes could cause loss of some information
                 if not myGlobalWindow.suppressTabWarning and not myGlobalWindow.suppress_word_discovery_warning:
                     title = _("Warning")
@@ -3298,31 +3964,9 @@ class PrimerPrepWindow:
         User will be notified of any errors in writing the file.
         
         Parameters: filename (str) - full file name/path
-                    filetext (str) - multiline string of contents of file to write
+                    filetext (str) - multiline string of contents of file to write (or its parts)
         '''
-        logger.debug('Saving as:', filename)
-        
-        if containsNFC:
-            if not containsNFD:
-                # the data needs to be written out in NFC format
-                filetext = unicodedata.normalize('NFC', filetext)
-            else:
-                # warn the user that data is written out decomposed
-                title = _("Encoding error")
-                msg = _("""Warning: This is a reminder that your input data has inconsistent encoding,
-with some characters composed and some decomposed. This data will be saved in
-decomposed format, which may be different than your original source files.""")
-                SimpleMessage(title, 'dialog-warning', msg)
-        try:
-            save_file = open(filename, 'w', encoding='utf-8')
-            # write a byte-order mark (BOM) for better file identification
-            save_file.write('\ufeff')
-            save_file.write(filetext)
-            save_file.close()
-        except Exception:
-            title = _("Error")
-            msg = _("Error. File could not be written.")
-            SimpleMessage(title, 'dialog-error', msg)
+        WriteTextFile(filename, filetext, containsNFC, containsNFD)
     
     def NewProject(self):
         '''Create a new project (after confirmation not to save existing data). We want
@@ -3341,6 +3985,9 @@ decomposed format, which may be different than your original source files.""")
                 return
         # either data hasn't changed since last save or user confirmed to continue anyway
         
+        # stop any teaching order calculation for the old data
+        self.CancelTeachingOrderCalculation()
+        self.ShowTeachingOrderPlaceholder(None)
         # get rid of the old WordAnalysis object
         del self.analysis
         # create a new instance of WordAnalysis to store our data
@@ -3371,6 +4018,8 @@ decomposed format, which may be different than your original source files.""")
         # make sure there is no project name, including in the window title
         myGlobalProjectName = ""
         self.window.set_title("PrimerPrep")
+        # new texts are kept on disk (if at all) in a temporary folder, until the project is saved
+        self.UpdateCorpusCache('')
         # reset the vernacular font to the application default
         myGlobalRenderer.SetFont(myGlobalRenderer.defaultFontName)
         self.ApplyNewFont()
@@ -3420,6 +4069,34 @@ decomposed format, which may be different than your original source files.""")
             title = _("Error")
             msg = _("Error writing project: ") + str(e)
             SimpleMessage(title, "dialog-error", msg)
+            return
+        
+        # if texts are kept on disk, keep them next to the project now (and clean up after removed texts)
+        self.UpdateCorpusCache(filename)
+        corpus.RemoveUnusedCacheFiles(self.analysis.fileLines)
+    
+    def UpdateCorpusCache(self, projectFile):
+        '''If the texts should be kept on disk, move all of the texts to the cache folder of the project,
+        otherwise move them all back into memory.
+        
+        Parameter: projectFile (str) - file name/path of the project, or '' if it hasn't been saved yet
+        '''
+        global myGlobalBuilder
+        
+        folder = None
+        if myGlobalBuilder.get_object('keepTextsOnDiskCheckButton').get_active():
+            folder = CorpusCacheFolder(projectFile)
+        try:
+            corpus.SetCacheFolder(folder)
+            for lines in self.analysis.fileLines:
+                lines.UpdateCache()
+        except OSError as e:
+            title = _("Error")
+            msg = _("The texts could not be kept on disk, so they are kept in memory: ") + str(e)
+            SimpleMessage(title, "dialog-error", msg)
+            corpus.SetCacheFolder(None)
+            for lines in self.analysis.fileLines:
+                lines.UpdateCache()
     
     def SaveProjectAs(self):
         '''Ask user for a filename and save the entire project configuration to that .ppdata
@@ -3482,11 +4159,21 @@ decomposed format, which may be different than your original source files.""")
         try:
             with open(filename, 'rb') as f:
                 vernum = pickle.load(f)
-                if not isinstance(vernum, int) or vernum not in (1, 2, 3, ):
+                if not isinstance(vernum, int) or vernum not in (1, 2, 3, 4, ):
                     # this is not a project file that we know how to load
                     raise UnknownProjectType
                 
+                # stop any teaching order calculation for the old data
+                self.CancelTeachingOrderCalculation()
+                self.ShowTeachingOrderPlaceholder(None)
                 del self.analysis
+                # if texts are kept on disk, each text goes to the project's cache folder as it is loaded
+                # (any that can't are moved there, or the user is told why, with UpdateCorpusCache below)
+                if myGlobalBuilder.get_object('keepTextsOnDiskCheckButton').get_active():
+                    try:
+                        corpus.SetCacheFolder(CorpusCacheFolder(filename))
+                    except OSError:
+                        corpus.SetCacheFolder(None)
                 self.analysis = pickle.load(f)
                 
                 # initially there are no changes (so you can quit without confirmation)
@@ -3500,26 +4187,21 @@ decomposed format, which may be different than your original source files.""")
                     self.analysis.userInformedEncodingError = False
                     # we need to make sure that all data is NFD
                     fileLinesNFD = []
+                    self.analysis.fileEncodingForms = []
                     for lines in self.analysis.fileLines:
-                        # process this list of text lines (from each file)
-                        # sets containsNFC and NFD and gives warning if inconsistent
-                        self.analysis.CheckEncoding(lines)
-                        # make sure this data (set of lines) is in NFD encoding
-                        linesNFD = [unicodedata.normalize('NFD', line) for line in lines]
+                        # make sure this data (set of lines from each file) is in NFD encoding,
+                        # noting whether it had composed and/or decomposed characters
+                        linesNFD, composed, decomposed = text_import.NormalizeLines(lines)
+                        self.analysis.containsNFC = self.analysis.containsNFC or composed
+                        self.analysis.containsNFD = self.analysis.containsNFD or decomposed
+                        self.analysis.fileEncodingForms.append((composed, decomposed))
                         # add this normalized set of text lines to the files list
                         fileLinesNFD.append(linesNFD)
                     # save the normalized text lines as the new
                     self.analysis.fileLines = fileLinesNFD
                     self.analysis.dataChanged = True
-                else:
-                    if self.analysis.containsNFC and self.analysis.containsNFD:
-                        # re-warn the user that this data contains inconsistent encoding
-                        title = _("Encoding error")
-                        msg = _("""Warning: This is a reminder that your input data has inconsistent encoding,
-with some characters composed and some decomposed. Ask a consultant to help you
-make your data more consistent. Any outputs from PrimerPrep (word list, teaching order)
-will be output in decomposed format.""")
-                        SimpleMessage(title, 'dialog-warning', msg)
+                    # gives warning if inconsistent
+                    self.analysis.ReportEncodingError()
                 if vernum < 3:
                     # new fields need to be added
                     self.analysis.pos_tags = set()
@@ -3530,6 +4212,37 @@ will be output in decomposed format.""")
                     self.analysis.syllable_consonants_together = False
                     self.analysis.user_defined_vowels = None
                     self.analysis.dataChanged = True
+                if vernum < 4:
+                    # new fields need to be added
+                    if vernum > 1:
+                        self.analysis.fileEncodingForms = [None] * len(self.analysis.fileNames)
+                    self.analysis.fileTokens = [None] * len(self.analysis.fileNames)
+                    self.analysis.filePOS = [None] * len(self.analysis.fileNames)
+                    self.analysis.decodableSentences = None
+                    self.analysis.tokenizer = None
+                    self.analysis.syllableCache = {}
+                    self.analysis.syllableCacheKey = None
+                    self.analysis.positionIndex = {}
+                    self.analysis.positionIndexWords = None
+                    self.analysis.graphemeCache = {}
+                    self.analysis.graphemeCacheKey = None
+                    if hasattr(self.analysis, 'wordsAsGraphemes'):
+                        # the teaching order has been calculated, so index its graphemes to the words
+                        self.analysis.BuildGraphemeWordIndex()
+                    # store the lines of each file compactly, and count their characters and words
+                    self.analysis.fileLines = [corpus.TextLines(lines) for lines in self.analysis.fileLines]
+                    self.analysis.BuildFileCharCounts()
+                    self.analysis.BuildFileWordCounts()
+                    self.analysis.dataChanged = True
+                if vernum > 1 and self.analysis.containsNFC and self.analysis.containsNFD:
+                    # re-warn the user that this data contains inconsistent encoding
+                    title = _("Encoding error")
+                    msg = _("""Warning: This is a reminder that your input data has inconsistent encoding,
+with some characters composed and some decomposed. Ask a consultant to help you
+make your data more consistent. Any outputs from PrimerPrep (word list, teaching order)
+will be output in decomposed format.""")
+                    SimpleMessage(title, 'dialog-warning', msg + self.analysis.GetEncodingFormsText())
+                self.UpdateCorpusCache(filename)
                 
                 # word_text_filter is never saved (it's transient UI state), so always reset it
                 self.analysis.word_text_filter = ''
@@ -3681,24 +4394,48 @@ will be output in decomposed format.""")
         
         if chooser.run() == Gtk.ResponseType.OK:
             filenames = chooser.get_filenames()
-            fileLoaded = False
-            for filename in filenames:
-                #logger.debug('Loading:', filename.encode('utf-8'))
-                if self.analysis.AddWordsFromFile(filename):
-                    # loaded successfully
-                    fileLoaded = True
-                    if myGlobalBuilder.get_object('showFullPathCheckButton').get_active():
-                        name = filename
-                    else:
-                        name = filename.split('\\')[-1]
-                    myGlobalBuilder.get_object('fileListStore').append([name])
-                    self.analysis.dataChanged = True
-            if fileLoaded:
+            # load the files (in parallel), in order
+            loaded = self.analysis.AddWordsFromFiles(filenames)
+            for filename in loaded:
+                if myGlobalBuilder.get_object('showFullPathCheckButton').get_active():
+                    name = filename
+                else:
+                    name = filename.split('\\')[-1]
+                myGlobalBuilder.get_object('fileListStore').append([name])
+                self.analysis.dataChanged = True
+            if loaded:
                 # at least one loaded, update data on screen
                 self.analysis.UpdateWordList(self.wordListStore)
                 self.ShowSummaryStatusBar()
         chooser.destroy()
     
+    def RemoveText(self):
+        '''Process a Remove Text button click. After confirmation, remove the text selected in
+        the file list from the analysis (only its word counts are subtracted, the other texts
+        don't need to be reprocessed).
+        '''
+        global myGlobalBuilder
+        
+        sel = myGlobalBuilder.get_object('fileListTreeView').get_selection()
+        (model, row) = sel.get_selected()
+        if row is None:
+            title = _("Information")
+            msg = _("Select a text in the list of files to remove it.")
+            SimpleMessage(title, 'dialog-information', msg)
+            return
+        fileNum = model.get_path(row).get_indices()[0]
+        title = _("Remove text")
+        msg = _("Remove this text from the analysis?") + "\n\n" + self.analysis.fileNames[fileNum]
+        if not SimpleYNQuestion(title, 'dialog-warning', msg):
+            return
+        
+        self.analysis.RemoveFile(fileNum)
+        self.fileListStore.remove(row)
+        # update data on screen (the POS filter may have changed, if a lexicon was removed)
+        self.analysis.UpdateWordList(self.wordListStore)
+        self.UpdateFilterCancelButton()
+        self.ShowSummaryStatusBar()
+    
     def ChooseWritingSystem(self, ws_list):
         dialog = Gtk.Dialog(title=_("Choose writing system"),
                             parent=self.window, flags=0)
@@ -3734,6 +4471,278 @@ will be output in decomposed format.""")
         dialog.destroy()
         return result
 
+    def CompareTeachingOrders(self):
+        '''Show the teaching orders given by each strategy ("elimination" or "decreasing grapheme
+        frequency"), with affixes excluded or not, and counting tokens or types, side by side.
+        The first column is the one with the current settings, and lessons in the other columns
+        that differ from it are highlighted. All of the teaching orders are calculated at once in
+        worker processes (from a worker thread, so the dialog keeps responding meanwhile).
+        '''
+        global myGlobalRenderer
+        
+        # put the variant with the current settings first, to compare the others with
+        variants = teaching_order.AllVariants()
+        current = ("elimination", self.affixesExcluded.get_active(), self.countEachWord.get_active())
+        variants.remove(current)
+        variants.insert(0, current)
+        
+        dialog = Gtk.Dialog(title=_("Compare teaching order strategies"),
+                            parent=self.window, flags=0)
+        dialog.add_buttons(Gtk.STOCK_CLOSE, Gtk.ResponseType.CLOSE)
+        dialog.set_default_size(900, 500)
+        
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        vbox.set_border_width(15)
+        label = Gtk.Label(label=_("Calculating the teaching orders..."))
+        label.set_xalign(0)
+        
+        # one row per lesson: the lesson number, then the grapheme (markup) of each variant
+        listStore = Gtk.ListStore(*([str] * (len(variants) + 1)))
+        treeView = Gtk.TreeView(model=listStore)
+        treeView.append_column(Gtk.TreeViewColumn(_("Lesson"), Gtk.CellRendererText(), text=0))
+        algorithmNames = {"elimination": _("Elimination"),
+                          "decreasing grapheme frequency": _("Grapheme frequency")}
+        for i, (algorithm, excludeAffixes, countWords) in enumerate(variants):
+            title = algorithmNames[algorithm]
+            title += "\n" + (_("affixes excluded") if excludeAffixes else _("affixes analyzed separately"))
+            title += "\n" + (_("tokens") if countWords else _("types"))
+            if i == 0:
+                title += "\n" + _("(current)")
+            renderer = Gtk.CellRendererText()
+            renderer.set_property('font-desc', myGlobalRenderer.vernFontDesc)
+            treeView.append_column(Gtk.TreeViewColumn(title, renderer, markup=i + 1))
+        scrolledWindow = Gtk.ScrolledWindow()
+        scrolledWindow.add(treeView)
+        
+        vbox.pack_start(label, False, False, 0)
+        vbox.pack_start(scrolledWindow, True, True, 0)
+        box = dialog.get_content_area()
+        box.pack_start(vbox, True, True, 0)
+        
+        # set to True once the dialog is closed, so late results are ignored
+        closed = [False]
+        
+        def ShowResults(results, error):
+            if closed[0]:
+                return False
+            if error is not None:
+                label.set_text(_("Error calculating the teaching orders: ") + error)
+                return False
+            currentOrder = results[0][0]
+            numLessons = max(len(teachingOrder) for teachingOrder, exampleCounts in results)
+            for lesson in range(numLessons):
+                row = [str(lesson + 1)]
+                for teachingOrder, exampleCounts in results:
+                    if lesson >= len(teachingOrder):
+                        row.append('')
+                        continue
+                    gr = teachingOrder[lesson]
+                    # show the grapheme with its number of example words
+                    cell = GLib.markup_escape_text(gr) + ' <small>({})</small>'.format(exampleCounts.get(gr, 0))
+                    if lesson >= len(currentOrder) or gr != currentOrder[lesson]:
+                        # this lesson is different from the current teaching order
+                        cell = '<span background="yellow">' + cell + '</span>'
+                    row.append(cell)
+                listStore.append(row)
+            label.set_text(_("Lessons that are different from the current teaching order are highlighted."))
+            return False
+        
+        def Calculate(words, digraphs, separateCombDiacritics, graphemeCache):
+            # (runs in a worker thread, the results are shown from the main thread)
+            try:
+                results = teaching_order.CompareVariants(words, digraphs, separateCombDiacritics,
+                                                         variants, graphemeCache)
+            except Exception as e:
+                logger.exception("Error comparing teaching orders")
+                GLib.idle_add(ShowResults, None, str(e))
+                return
+            GLib.idle_add(ShowResults, results, None)
+        
+        # the grapheme cache can only be used if it was made with the current orthography settings
+        graphemeCache = None
+        if self.analysis.graphemeCacheKey == (tuple(sorted(self.analysis.digraphs)),
+                                              self.analysis.separateCombDiacritics):
+            graphemeCache = self.analysis.graphemeCache
+        worker = threading.Thread(target=Calculate,
+                                  args=(self.analysis.words, list(self.analysis.digraphs),
+                                        self.analysis.separateCombDiacritics, graphemeCache),
+                                  daemon=True)
+        
+        dialog.show_all()
+        worker.start()
+        dialog.run()
+        closed[0] = True
+        dialog.destroy()
+    
+    def ShowDecodableSentences(self, row):
+        '''Show the sentences of the texts that can be read at each lesson of the teaching order
+        (see WordAnalysis.GetDecodableSentences), starting at the selected lesson, and let the
+        user export the list to a text file.
+        
+        Parameter: row (int) - the selected row in the teaching order
+        '''
+        global myGlobalRenderer
+        global myGlobalPath
+        if not getattr(self.analysis, 'teachingOrder', None):
+            # no teaching order (yet)
+            return
+        decodable = self.analysis.GetDecodableSentences()
+        
+        dialog = Gtk.Dialog(title=_("Decodable sentences"),
+                            parent=self.window, flags=0)
+        dialog.add_buttons(_("Export..."), Gtk.ResponseType.APPLY,
+                           Gtk.STOCK_CLOSE, Gtk.ResponseType.CLOSE)
+        dialog.set_default_size(900, 500)
+        
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        vbox.set_border_width(15)
+        numReadable = sum(1 for sentenceRow, numWords, sentence in decodable if sentenceRow <= row)
+        msg = _("Sentences that can be read by lesson {}: {}   (by the last lesson: {})")
+        label = Gtk.Label(label=msg.format(row + 1, numReadable, len(decodable)))
+        label.set_xalign(0)
+        
+        # one row per sentence: the lesson (number and letter) from which it can be read,
+        # its number of words and the sentence
+        listStore = Gtk.ListStore(str, int, str)
+        for sentenceRow, numWords, sentence in decodable:
+            listStore.append([str(sentenceRow + 1) + '  ' + self.analysis.GetLessonLetter(sentenceRow),
+                              numWords, sentence])
+        treeView = Gtk.TreeView(model=listStore)
+        renderer = Gtk.CellRendererText()
+        renderer.set_property('font-desc', myGlobalRenderer.vernFontDesc)
+        treeView.append_column(Gtk.TreeViewColumn(_("Lesson"), renderer, text=0))
+        treeView.append_column(Gtk.TreeViewColumn(_("Words"), Gtk.CellRendererText(), text=1))
+        renderer = Gtk.CellRendererText()
+        renderer.set_property('font-desc', myGlobalRenderer.vernFontDesc)
+        treeView.append_column(Gtk.TreeViewColumn(_("Sentence"), renderer, text=2))
+        scrolledWindow = Gtk.ScrolledWindow()
+        scrolledWindow.add(treeView)
+        
+        vbox.pack_start(label, False, False, 0)
+        vbox.pack_start(scrolledWindow, True, True, 0)
+        box = dialog.get_content_area()
+        box.pack_start(vbox, True, True, 0)
+        dialog.show_all()
+        
+        # start at the first sentence of the selected lesson (or of the next lesson that has one)
+        first = next((i for i, (sentenceRow, numWords, sentence) in enumerate(decodable)
+                      if sentenceRow >= row), None)
+        if first is not None:
+            path = Gtk.TreePath(first)
+            treeView.get_selection().select_path(path)
+            treeView.scroll_to_cell(path, None, True, 0.0, 0.0)
+        
+        while dialog.run() == Gtk.ResponseType.APPLY:
+            chooser = Gtk.FileChooserDialog(title=_("Save decodable sentences as..."), parent=dialog,
+                                            action=Gtk.FileChooserAction.SAVE)
+            chooser.add_buttons(Gtk.STOCK_SAVE, Gtk.ResponseType.OK,
+                                Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL)
+            chooser.set_transient_for(dialog)
+            chooser.set_current_name(_("DecodableSentences.txt"))
+            chooser.set_current_folder(myGlobalPath)
+            chooser.set_do_overwrite_confirmation(True)
+            chooser.set_default_response(Gtk.ResponseType.OK)
+            if chooser.run() == Gtk.ResponseType.OK:
+                filename = chooser.get_filename()
+                filetext = self.analysis.GetDecodableSentencesText(decodable)
+                # write out the data
+                self.WriteFile(filename, filetext, self.analysis.containsNFC, self.analysis.containsNFD)
+                # save this path for next time we need to write out a file
+                myGlobalPath = os.path.dirname(filename)
+            chooser.destroy()
+        dialog.destroy()
+    
+    def OptimizeTeachingOrder(self):
+        '''Starting from the current teaching order, search (for a limited time, in worker
+        processes) for a teaching order in which the words become decodable sooner, i.e.
+        with more cumulative decodable coverage over the lessons. If a better order is found,
+        the user can choose to use it. Sight word lessons stay at the same positions.
+        '''
+        if not getattr(self.analysis, 'teachingOrder', None):
+            # no teaching order (yet)
+            return
+        graphemeList = [gr for gr in self.analysis.teachingOrder if not isinstance(gr, int)]
+        
+        dialog = Gtk.Dialog(title=_("Optimize teaching order"),
+                            parent=self.window, flags=0)
+        dialog.add_buttons(_("Stop"), Gtk.ResponseType.CANCEL)
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        vbox.set_border_width(15)
+        label = Gtk.Label(label=_("Searching for a teaching order that lets more words be read sooner..."))
+        label.set_xalign(0)
+        progressBar = Gtk.ProgressBar()
+        vbox.pack_start(label, False, False, 0)
+        vbox.pack_start(progressBar, False, False, 0)
+        box = dialog.get_content_area()
+        box.add(vbox)
+        
+        stop = threading.Event()
+        result = []
+        # set to True once the dialog is closed, so late updates are ignored
+        closed = [False]
+        
+        def ShowProgress(fraction):
+            if not closed[0]:
+                progressBar.set_fraction(fraction)
+            return False
+        
+        def Finished():
+            if not closed[0]:
+                dialog.response(Gtk.ResponseType.OK)
+            return False
+        
+        def Optimize(wordsAsGraphemes, analysisWords):
+            # (runs in a worker thread, the dialog is updated from the main thread)
+            try:
+                result.append(teaching_order.OptimizeTeachingOrder(
+                    graphemeList, wordsAsGraphemes, analysisWords,
+                    progress=lambda fraction: GLib.idle_add(ShowProgress, fraction),
+                    stop=stop.is_set))
+            except Exception as e:
+                logger.exception("Error optimizing the teaching order")
+                result.append(e)
+            GLib.idle_add(Finished)
+        
+        worker = threading.Thread(target=Optimize,
+                                  args=(self.analysis.wordsAsGraphemes, self.analysis.analysisWords),
+                                  daemon=True)
+        dialog.show_all()
+        worker.start()
+        while dialog.run() != Gtk.ResponseType.OK:
+            # stopped by the user, the best order found so far is used after the current round
+            # (keep the dialog, and the main loop, running until the worker has finished)
+            stop.set()
+            label.set_text(_("Stopping..."))
+            dialog.set_response_sensitive(Gtk.ResponseType.CANCEL, False)
+        closed[0] = True
+        dialog.destroy()
+        
+        if isinstance(result[0], Exception):
+            title = _("Error")
+            msg = _("Error optimizing the teaching order: ") + str(result[0])
+            SimpleMessage(title, 'dialog-error', msg)
+            return
+        bestOrder, bestCoverage, startCoverage = result[0]
+        if bestCoverage <= startCoverage:
+            title = _("Optimize teaching order")
+            msg = _("No better teaching order was found.")
+            SimpleMessage(title, 'dialog-information', msg)
+            return
+        title = _("Optimize teaching order")
+        msg = _("On average, {:.1f}% of the words can be read in each lesson of the current teaching order,\n"
+                "and {:.1f}% in the optimized teaching order. Use the optimized teaching order?").format(
+                    startCoverage * 100, bestCoverage * 100)
+        if not SimpleYNQuestion(title, 'dialog-warning', msg):
+            return
+        
+        # put the optimized graphemes in the places of the graphemes (sight word lessons stay where they are)
+        optimized = iter(bestOrder)
+        newOrder = [gr if isinstance(gr, int) else next(optimized) for gr in self.analysis.teachingOrder]
+        self.analysis.StoreTeachingOrderBuildExampleWordsLists(newOrder)
+        self.analysis.UpdateTeachingOrderList(self.teachingOrderListStore)
+        GLib.idle_add(self._fix_teaching_order_heights_after_draw)
+        self.analysis.dataChanged = True
+    
     def ChooseSFMMarker(self, marker_list, label_text):
         dialog = Gtk.Dialog(title=_("Choose SFM marker"),
                             parent=self.window, flags=0)
@@ -3783,6 +4792,129 @@ will be output in decomposed format.""")
         tv.set_model(ls)
         return False
 
+    def StartTeachingOrderCalculation(self):
+        '''Calculate a new teaching order in a worker thread, so that the window keeps
+        responding on large projects. Until the result is ready, the teaching order pages
+        show a placeholder, with a progress bar and Cancel button below the notebook.
+        The result is applied (in the main thread) by _teaching_order_calculated.
+        '''
+        self.CancelTeachingOrderCalculation()
+        
+        # the worker calculates using a copy of the analysis, so that nothing changes in the
+        # real analysis until the result is ready (copy whatever the calculation changes in place)
+        calc = copy.copy(self.analysis)
+        calc.words = {word: list(word_info) for word, word_info in self.analysis.words.items()}
+        calc.digraphs = list(self.analysis.digraphs)
+        calc.lessonTexts = dict(self.analysis.lessonTexts)
+        
+        cancelled = threading.Event()
+        self.teachingOrderCancel = cancelled
+        self.ShowTeachingOrderPlaceholder(_("Calculating the teaching order..."))
+        self.teachingOrderProgressBar.set_fraction(0.0)
+        self.teachingOrderProgressBox.show()
+        worker = threading.Thread(target=self._calculate_teaching_order,
+                                  args=(calc, cancelled, self.affixesExcluded.get_active(),
+                                        self.countEachWord.get_active()),
+                                  daemon=True)
+        worker.start()
+    
+    def CancelTeachingOrderCalculation(self):
+        '''Stop the teaching order calculation in progress (if any). The placeholder
+        stays on the teaching order pages, as the old teaching order is out of date.
+        '''
+        if self.teachingOrderCancel is None:
+            return
+        self.teachingOrderCancel.set()
+        self.teachingOrderCancel = None
+        self.teachingOrderProgressBox.hide()
+        self.ShowTeachingOrderPlaceholder(_("The teaching order calculation was cancelled."), recalculate=True)
+    
+    def ShowTeachingOrderPlaceholder(self, text, recalculate=False):
+        '''Show a placeholder message instead of the teaching order lists, or show the lists again.
+        
+        Parameters: text (str) - message to show, or None to show the teaching order lists
+                    recalculate (bool) - show a button to start the calculation again with the message
+        '''
+        global myGlobalBuilder
+        
+        showLists = text is None
+        if not showLists:
+            self.teachingOrderPlaceholderLabel.set_text(text)
+            # empty the lists (also shown in the Lesson Texts tab) and don't allow the old order to be saved
+            self.teachingOrderListStore.clear()
+            myGlobalBuilder.get_object("saveTeachingOrderMenuItem").set_sensitive(False)
+        self.teachingOrderPlaceholderLabel.set_visible(not showLists)
+        myGlobalBuilder.get_object("teachingOrderRecalculateButton").set_visible(recalculate and not showLists)
+        myGlobalBuilder.get_object("teachingOrderScrolledWindow").set_visible(showLists)
+        self.teachingOrderTextFilter.set_sensitive(showLists)
+        myGlobalBuilder.get_object("teachingorderbuttonshbox").set_sensitive(showLists)
+        myGlobalBuilder.get_object("lessontextshbox").set_sensitive(showLists)
+    
+    def _calculate_teaching_order(self, calc, cancelled, excludeAffixes, countWords):
+        # This runs in the worker thread, so it must not touch any GTK objects.
+        # Everything for the interface is passed back to the main thread with GLib.idle_add.
+        shownPercent = [-1]
+        def progress(fraction):
+            if cancelled.is_set():
+                raise teaching_order.CalculationCancelled
+            # only send whole percentages, so the main loop isn't flooded with updates
+            percent = int(fraction * 100)
+            if percent > shownPercent[0]:
+                shownPercent[0] = percent
+                GLib.idle_add(self._show_teaching_order_progress, cancelled, fraction)
+        
+        try:
+            calc.CalculateTeachingOrder(excludeAffixes, countWords, progress)
+        except teaching_order.CalculationCancelled:
+            return
+        except Exception as e:
+            logger.exception("Error calculating the teaching order")
+            GLib.idle_add(self._teaching_order_calculated, None, cancelled, str(e))
+            return
+        GLib.idle_add(self._teaching_order_calculated, calc, cancelled, None)
+    
+    def _show_teaching_order_progress(self, cancelled, fraction):
+        if cancelled is self.teachingOrderCancel:
+            self.teachingOrderProgressBar.set_fraction(fraction)
+        return False
+    
+    def _teaching_order_calculated(self, calc, cancelled, error):
+        global myGlobalBuilder
+        
+        if cancelled is not self.teachingOrderCancel:
+            # this calculation was cancelled (or replaced by a newer one), so ignore it
+            return False
+        self.teachingOrderCancel = None
+        self.teachingOrderProgressBox.hide()
+        if error is not None:
+            self.ShowTeachingOrderPlaceholder(_("The teaching order could not be calculated."), recalculate=True)
+            title = _("Error")
+            msg = _("Error calculating the teaching order: ") + error
+            SimpleMessage(title, 'dialog-error', msg)
+            return False
+        
+        # copy the results of the calculation into the analysis
+        for attr in ('wordsAsGraphemes', 'morphemesAsGraphemes', 'analysisWords', 'analysisMorphemes',
+                     'graphemeUse', 'teachingOrder', 'sightWords', 'graphemeExampleWords',
+                     'graphemeWords', 'wordRank', 'lessonTexts', 'digraphs', 'graphemeCache', 'graphemeCacheKey',
+                     'teachingOrderChanged'):
+            if hasattr(calc, attr):
+                setattr(self.analysis, attr, getattr(calc, attr))
+        
+        self.ShowTeachingOrderPlaceholder(None)
+        self.analysis.UpdateTeachingOrderList(self.teachingOrderListStore)
+        GLib.idle_add(self._fix_teaching_order_heights_after_draw)
+        # reset the selection of the Teaching Order to the beginning of the lists
+        self.teachingOrderTreeView.get_selection().select_path(Gtk.TreePath("0"))
+        self.lessonTextsTreeView.get_selection().select_path(Gtk.TreePath("0"))
+        # allow the teaching order to be saved
+        menu = myGlobalBuilder.get_object("saveTeachingOrderMenuItem")
+        menu.set_sensitive(True)
+        if self.mainNB.get_current_page() == 2:
+            # on the Lesson Texts tab, make sure that the text tagging is up-to-date
+            self.MarkUntaught(self.lessonTextsTextBuffer)
+        return False
+    
     def UpdateFilterCancelButton(self):
         '''Set the filter button style and cancel button state to match the current filter settings.'''
         if self.analysis.active_pos_filters or self.analysis.position_filters or self.analysis.word_text_filter:
@@ -3956,24 +5088,14 @@ will be output in decomposed format.""")
         # quick way to tell if grapheme found has been taught or not
         graphemesTaughtSet = set(graphemesTaughtList)
         
-        # build 'wordBreaks' string with all word breaking characters for RegEx splitting
-        wordBreaks = ''
-        for char in self.analysis.wordBreakChars:
-            # need to put '\' before special characters
-            if char in '.^$*+-?{}\\[]|()':
-                wordBreaks = wordBreaks + '\\'
-            wordBreaks = wordBreaks + char
-        # add line breaks as well, since they don't seem to be in the wordBreakChars list
-        wordBreaks += '\n\r'
-        
-        # a regex for finding words
-        findWord = re.compile('[^' + wordBreaks + ']+')
+        # split the lesson texts into words the same way as the texts (spaces, including line breaks, are word breaks)
+        tokenizer = self.analysis.GetTokenizer()
         # create a set of words already taught in previous lessons
         wordsPrevUsed = set()
         for i in range(idx):
             letter = self.analysis.teachingOrder[i]
             txt = self.analysis.lessonTexts.get(letter, "")
-            wordsPrevUsed.update(word.lower() for word in findWord.findall(txt))
+            wordsPrevUsed.update(word.lower() for word in tokenizer.Words(txt))
         
         # remove existing "filter" and "newWord" tags
         start_iter = buffer.get_start_iter()
@@ -4013,9 +5135,6 @@ will be output in decomposed format.""")
         # pos is the Mn's current position in the buffer.  Processing in reverse keeps
         # earlier offsets valid because inserting ◌ before an Mn only shifts later positions.
         deferred_insertions = []
-
-        # create a regex for finding the next word chunk
-        findWordChunk = re.compile(r'(.*?)([' + wordBreaks + ']+|$)')
         
         # loop over entire text
         # - find the next word, up to the next wordbreak character(s), and see if it's a sightword
@@ -4025,11 +5144,10 @@ will be output in decomposed format.""")
         
         while pos < len(text):
             # find next word (this will always match, but sometimes will give empty string)
-            m = findWordChunk.match(text, pos)
-            nextWord = m.group(1)
+            nextWord, wordBreaks = tokenizer.WordAndBreaks(text, pos)
             # get the length of the word
             wordLength = len(nextWord)
-            wordBreaksLength = len(m.group(2))
+            wordBreaksLength = len(wordBreaks)
             endWordPos = pos + wordLength
             if nextWord not in wordsPrevUsed:
                 match_start = buffer.get_iter_at_offset(pos)
@@ -4330,6 +5448,11 @@ will be output in decomposed format.""")
         self.lessonTextsLetterCellRenderer = myGlobalBuilder.get_object("lessonTextsLetterCellRenderer")
         self.lessonTextsFreqCellRenderer = myGlobalBuilder.get_object("lessonTextsFreqCellRenderer")
         self.lessonTextsFilterTextEntry = myGlobalBuilder.get_object("lessonTextsFilterTextEntry")
+        self.teachingOrderProgressBox = myGlobalBuilder.get_object("teachingOrderProgressBox")
+        self.teachingOrderProgressBar = myGlobalBuilder.get_object("teachingOrderProgressBar")
+        self.teachingOrderPlaceholderLabel = myGlobalBuilder.get_object("teachingOrderPlaceholderLabel")
+        # teachingOrderCancel: threading.Event for the teaching order calculation in progress (None if none)
+        self.teachingOrderCancel = None
         
         # allow markup in the examples column (in teaching order) - clear "text" attribute first
         self.teachingOrderExamplesColumn.clear_attributes(self.teachingOrderExamplesCellRenderer)
@@ -4434,10 +5557,227 @@ def SaveConfig():
     with open(myGlobalConfigFile, 'w') as configfile:
         myGlobalConfig.write(configfile)        
 
+def CorpusCacheFolder(projectFile):
+    '''Return the folder that the texts of a project are kept in when they are kept on disk (see corpus.py):
+    a folder next to the project file, or a temporary folder if the project hasn't been saved yet.
+    
+    Parameter: projectFile (str) - file name/path of the project, or '' if it hasn't been saved yet
+    Return value: (str) - path of the folder
+    '''
+    global myGlobalTempCacheFolder
+    
+    if projectFile:
+        return os.path.splitext(projectFile)[0] + '_texts'
+    if myGlobalTempCacheFolder is None:
+        myGlobalTempCacheFolder = tempfile.mkdtemp(prefix='PrimerPrep')
+        # (files that are still mapped may not be deleted on Windows, so ignore errors)
+        atexit.register(shutil.rmtree, myGlobalTempCacheFolder, True)
+    return myGlobalTempCacheFolder
+
+def BatchFileList(value, baseDir):
+    '''Split a list of file names from a batch config file (one per line) into full paths.
+    
+    Parameters: value (str) - config value, with one file name per line
+                baseDir (str) - folder of the config file, which relative file names are relative to
+    Return value: list of str of full file paths
+    '''
+    return [os.path.join(baseDir, name.strip()) for name in value.splitlines() if name.strip()]
+
+def BatchAddLexicon(analysis, filename, section):
+    '''Import a LIFT or SFM lexicon file in batch mode, where there is no dialog to choose the
+    writing system or markers, so use the ones in the config file, or else the first ones found.
+    
+    Parameters: analysis (WordAnalysis) - analysis to add the lexicon data to
+                filename (str) - full file name/path of the lexicon
+                section (configparser.SectionProxy) - the [Input] section of the batch config file
+    Return value: True if any lexicon data was loaded
+    '''
+    import lexicon_import
+    
+    lexicon_data = []
+    if filename.lower().endswith(".lift"):
+        tree, ws_list = lexicon_import.LiftLexiconPrep(filename)
+        selected_ws = section.get('lexiconws', ws_list[0] if ws_list else '')
+        if selected_ws in ws_list:
+            lexicon_data = lexicon_import.LoadLiftLexicon(tree, selected_ws)
+    else:
+        entries, lx_markers, pos_markers = lexicon_import.SFMLexiconPrep(filename)
+        selected_lx = section.get('lexememarker', 'lx' if 'lx' in lx_markers else (lx_markers[0] if lx_markers else ''))
+        if selected_lx in lx_markers:
+            selected_pos = section.get('posmarker', pos_markers[0] if pos_markers else '')
+            if selected_pos not in pos_markers:
+                selected_pos = None
+            lexicon_data = lexicon_import.LoadSFMLexicon(entries, selected_lx, selected_pos)
+    if not lexicon_data:
+        logger.error('No meaningful lexicon data could be extracted from: {}'.format(filename))
+        return False
+    analysis.AddLexiconData(filename, lexicon_data)
+    return True
+
+def RunBatchConfig(configFile):
+    '''Do the whole analysis for one batch config file, without any user interface: load the texts
+    and lexicons, apply the digraphs and affixes, calculate the teaching order, and write out the
+    teaching order and word list (and optionally the project). Relative file names in the config file
+    are relative to the folder of the config file. The config file looks like this (all optional):
+    
+        [Input]
+        texts = story1.txt
+                scripture.sfm
+        lexicons = dictionary.lift
+        lexiconws = (LIFT writing system of the lexemes, default the first one)
+        lexememarker = (SFM lexeme marker, default lx)
+        posmarker = (SFM part of speech marker, default the first one)
+        sfmignore = (SFM markers to ignore in SFM texts, e.g. id rem h toc1)
+        sfmonly = (SFM markers to process in SFM texts, instead of sfmignore, e.g. lx pdv xv)
+        [Orthography]
+        digraphs = ch sh ng
+        affixes = ka- -ne
+        separatecombdia = 0
+        [Option]
+        excludeaffixes = 1
+        countallwords = 1
+        font = (font saved with the project)
+        keeptextsondisk = (1 to keep the texts in cache files instead of in memory, default 0)
+        [Output]
+        teachingorder = TeachingOrder.txt
+        wordlist = WordList.txt
+        project = Language.ppdata
+    
+    Parameter: configFile (str) - file name/path of the batch config file
+    Return value: True if everything was processed and written without error
+    '''
+    global myGlobalBatchSFMLines
+    
+    config = configparser.ConfigParser()
+    try:
+        with open(configFile, 'r', encoding='utf-8-sig') as f:
+            config.read_file(f)
+    except (OSError, configparser.Error) as e:
+        logger.error('Error reading batch config file {}: {}'.format(configFile, e))
+        return False
+    baseDir = os.path.dirname(os.path.abspath(configFile))
+    for name in ('Input', 'Orthography', 'Option', 'Output'):
+        if name not in config:
+            config[name] = {}
+    
+    analysis = WordAnalysis()
+    
+    # set up the orthography before loading the texts, so the characters are found correctly
+    text = unicodedata.normalize('NFD', config['Orthography'].get('digraphs', '').strip().lower())
+    digraphList = re.split(r'\s+', text) if text else []
+    if any(len(digraph) < 2 for digraph in digraphList) or len(digraphList) != len(set(digraphList)):
+        logger.error('All digraphs must have at least two characters, and must be unique: {}'.format(text))
+        return False
+    analysis.digraphs = digraphList
+    text = unicodedata.normalize('NFD', config['Orthography'].get('affixes', '').strip().lower())
+    affixList = re.split(r'\s+', text) if text else []
+    for affix in affixList:
+        if len(affix) < 2 or affix.count('-') != 1 or not (affix.startswith('-') ^ affix.endswith('-')):
+            logger.error("All affixes must start or end with '-', and must be unique: {}".format(text))
+            return False
+    if len(affixList) != len(set(affixList)):
+        logger.error("All affixes must start or end with '-', and must be unique: {}".format(text))
+        return False
+    analysis.affixes = affixList
+    analysis.separateCombDiacritics = config['Orthography'].get('separatecombdia', '0') != '0'
+    
+    # SFM settings for text files (there is no Configure SFM dialog in batch mode)
+    inputSection = config['Input']
+    if 'sfmonly' in inputSection:
+        myGlobalBatchSFMLines = ('', '|'.join(m.lstrip('\\') for m in inputSection['sfmonly'].split()))
+    elif 'sfmignore' in inputSection:
+        myGlobalBatchSFMLines = ('|'.join(m.lstrip('\\') for m in inputSection['sfmignore'].split()), '')
+    else:
+        myGlobalBatchSFMLines = None
+    
+    # keep the texts on disk (next to the project, if there is one), or in memory
+    folder = None
+    if config['Option'].get('keeptextsondisk', '0') != '0':
+        projectFile = config['Output'].get('project', '')
+        folder = CorpusCacheFolder(os.path.join(baseDir, projectFile) if projectFile else '')
+    try:
+        corpus.SetCacheFolder(folder)
+    except OSError as e:
+        logger.error('Error creating folder for the texts {}: {}'.format(folder, e))
+        return False
+    
+    # load the texts and lexicons
+    filenames = BatchFileList(inputSection.get('texts', ''), baseDir)
+    logger.info('Loading texts: {}'.format(', '.join(filenames)))
+    ok = len(analysis.AddWordsFromFiles(filenames)) == len(filenames)
+    for filename in BatchFileList(inputSection.get('lexicons', ''), baseDir):
+        logger.info('Loading lexicon: {}'.format(filename))
+        try:
+            ok = BatchAddLexicon(analysis, filename, inputSection) and ok
+        except Exception as e:
+            logger.error('Error reading lexicon {}: {}'.format(filename, e))
+            ok = False
+    if len(analysis.words) == 0:
+        logger.error('No words were found in the texts of: {}'.format(configFile))
+        return False
+    
+    # calculate the teaching order
+    excludeAffixes = config['Option'].get('excludeaffixes', '1') == '1'
+    countWords = config['Option'].get('countallwords', '1') == '1'
+    analysis.CalculateTeachingOrder(excludeAffixes, countWords)
+    analysis.teachingOrderChanged = False
+    logger.info('{} words, {} lessons in the teaching order'.format(len(analysis.words), len(analysis.teachingOrder)))
+    
+    # write out the results
+    outputSection = config['Output']
+    if 'teachingorder' in outputSection:
+        filename = os.path.join(baseDir, outputSection['teachingorder'])
+        ok = WriteTextFile(filename, analysis.GetTeachingOrderText(), analysis.containsNFC, analysis.containsNFD) and ok
+    if 'wordlist' in outputSection:
+        filename = os.path.join(baseDir, outputSection['wordlist'])
+        ok = WriteTextFile(filename, analysis.GetWordListText(), analysis.containsNFC, analysis.containsNFD) and ok
+    if 'project' in outputSection:
+        # same format as PrimerPrepWindow.SaveProject(), so the project can be opened and adjusted later
+        filename = os.path.join(baseDir, outputSection['project'])
+        defaultFontName = "Charis 14" if platform.system() == "Windows" else "Ubuntu 14"
+        options = (config['Option'].get('font', defaultFontName), excludeAffixes, countWords)
+        try:
+            with open(filename, 'wb') as f:
+                pickle.dump(dataModelVersion, f)
+                pickle.dump(analysis, f)
+                pickle.dump(options, f)
+        except (OSError, pickle.PicklingError) as e:
+            logger.error('Error writing project {}: {}'.format(filename, e))
+            ok = False
+        # clean up after texts that are no longer in the project
+        corpus.RemoveUnusedCacheFiles(analysis.fileLines)
+    return ok
+
+def RunBatch(configFiles):
+    '''Run PrimerPrep without a user interface (PrimerPrep.py --batch config.ini ...), e.g. to
+    regenerate the teaching orders for many languages on a build machine. See RunBatchConfig().
+    
+    Parameter: configFiles (list of str) - file names/paths of the batch config files
+    Return value: exit code for the program (0 if all config files were processed without error)
+    '''
+    if len(configFiles) == 0:
+        print('Usage: PrimerPrep.py --batch config.ini [config.ini ...]', file=sys.stderr)
+        return 2
+    # report the progress of each config file
+    logger.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+    failed = 0
+    for configFile in configFiles:
+        logger.info('Processing batch config file: {}'.format(configFile))
+        if not RunBatchConfig(configFile):
+            logger.error('Batch processing failed for: {}'.format(configFile))
+            failed += 1
+    return 1 if failed else 0
+
 
 # If the program is run directly or passed as an argument to the python
 # interpreter then create a PrimerPrepWindow class instance and run it
 if __name__ == "__main__":
+    # needed for worker processes (e.g. comparing teaching orders) in a PyInstaller bundle
+    multiprocessing.freeze_support()
+    if BATCH_MODE:
+        # headless batch mode: no splash screen or window, just process the given config files
+        _ = gettext.gettext
+        sys.exit(RunBatch([arg for arg in sys.argv[1:] if arg != '--batch']))
     # prep to display a splash screen, especially since the opening of the initial window can take some time
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
         myGlobalProgramPath = sys._MEIPASS
@@ -4542,13 +5882,16 @@ It should have a .ppdata extension.""") + " ( " + filename + " )"
             myGlobalBuilder.get_object("countWordOnlyOnceRadioButton").set_active(True)
         if myGlobalConfig['Option'].get('separatecombdia', '0') != '0':
             myGlobalBuilder.get_object("separateDiacriticsCheckButton").set_active(True)
+        if myGlobalConfig['Option'].get('keeptextsondisk', '0') != '0':
+            myGlobalBuilder.get_object("keepTextsOnDiskCheckButton").set_active(True)
     else:
         # no config file, create a default one and save it out
         myGlobalConfig['Option'] = {'lang': 'en_US',
                                     'digraphautosearch': '1',  # deprecated
                                     'excludeaffixes': '1', 
                                     'countallwords': '1',
-                                    'separatecombdia' : '0'}
+                                    'separatecombdia' : '0',
+                                    'keeptextsondisk': '0'}
         # create the .ini file
         SaveConfig()
     
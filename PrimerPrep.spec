@@ -11,7 +11,7 @@ a1 = Analysis(['PrimerPrep.py'],
 	datas=[('PrimerPrep.glade', '.'), ('PrimerPrep.ico', '.'),
 		('PrimerPrepCancelFilterON.png', '.'), ('PrimerPrepCancelFilterOFF.png', '.'),
 		('Help', 'Help'), ('translations', 'translations')],
-	hiddenimports=['lexicon_import'],
+	hiddenimports=['corpus', 'lexicon_import', 'teaching_order', 'text_import'],
 	hookspath=[],
 	runtime_hooks=[],
 	win_no_prefer_redirects=False,
@@ -0,0 +1,498 @@
+#!/usr/bin/python3
+#
+# corpus
+#
+# Compact storage of the lines of the texts loaded into PrimerPrep. Nothing in
+# this module uses GTK, so it can be used from worker processes.
+
+import os
+import mmap
+import bisect
+import hashlib
+import itertools
+from array import array
+from collections import Counter
+try:
+    # numpy is only needed to find words in the tokenized texts faster
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# folder of the cache files that the texts are kept in (see SetCacheFolder), None to keep them in memory
+cacheFolder = None
+
+
+def SetCacheFolder(folder):
+    '''
+    Keep the texts in cache files (read through mmap) in this folder, instead of in memory,
+    e.g. for very large collections of texts. The texts aren't moved until TextLines.UpdateCache
+    is called, but texts that are unpickled go straight to the cache.
+
+    Parameter: folder (str) - folder for the cache files (created if needed), or None to keep
+                              the texts in memory
+    '''
+    global cacheFolder
+    if folder is not None:
+        os.makedirs(folder, exist_ok=True)
+    cacheFolder = folder
+
+
+def RemoveUnusedCacheFiles(textLinesList):
+    '''
+    Delete the files in the cache folder that none of the texts (TextLines) are kept in,
+    e.g. those of texts that have been removed. Files that can't be deleted are left.
+    '''
+    if cacheFolder is None:
+        return
+    used = {os.path.normcase(lines.cacheFile) for lines in textLinesList if lines.cacheFile is not None}
+    for name in os.listdir(cacheFolder):
+        path = os.path.join(cacheFolder, name)
+        if name.endswith('.txt') and os.path.normcase(path) not in used:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class TextLines:
+    '''
+    The lines of one text, stored as a single UTF-8 buffer (each line followed by a newline)
+    and an array of the offsets where the lines start, instead of a list of str.
+    Lines can be iterated, indexed and sliced like a list; a line is only decoded (into a str)
+    when it is used. Pickled as the raw bytes of the buffer and the offsets.
+    The buffer can also be kept in a cache file (see SetCacheFolder), so the text isn't kept
+    in memory, but read from the file through mmap.
+    '''
+    # number of lines decoded at one time when iterating
+    CHUNK_LINES = 1000
+
+    def __init__(self, lines=()):
+        '''
+        lines: iterable of str, the lines of the text
+        '''
+        self.data = bytearray()
+        # offsets[n] is where line n starts, and offsets[-1] is the end of the buffer
+        self.offsets = array('q', [0])
+        # the cache file that data is mapped from (None if data is in memory)
+        self.cacheFile = None
+        self.Extend(lines)
+
+    def Extend(self, lines):
+        '''Add lines (iterable of str) to the end of the text.'''
+        if self.cacheFile is not None:
+            # the text has to be in memory to add to it
+            self.Unmap()
+        elif not isinstance(self.data, bytearray):
+            # (unpickled)
+            self.data = bytearray(self.data)
+        lines = iter(lines)
+        while True:
+            encoded = [line.encode('utf-8') for line in itertools.islice(lines, self.CHUNK_LINES)]
+            if not encoded:
+                break
+            self.data += b'\n'.join(encoded)
+            self.data += b'\n'
+            # each line starts after the previous one and its newline
+            lineEnds = itertools.accumulate((len(line) + 1 for line in encoded), initial=self.offsets[-1])
+            self.offsets.extend(itertools.islice(lineEnds, 1, None))
+
+    def MapFile(self, folder):
+        '''
+        Keep the text in a cache file in the folder, and read it from the file through mmap
+        from now on. The file is named after (a hash of) the text, so it is only written once.
+        '''
+        filename = os.path.join(folder, hashlib.sha1(self.data).hexdigest() + '.txt')
+        if filename == self.cacheFile:
+            return
+        if not os.path.isfile(filename) or os.path.getsize(filename) != len(self.data):
+            # write to a temporary file first, so there is never a partly written cache file
+            with open(filename + '.tmp', 'wb') as f:
+                f.write(self.data)
+            os.replace(filename + '.tmp', filename)
+        if len(self.data) == 0:
+            # an empty file can't be mapped (and there is nothing to keep in memory anyway)
+            return
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        oldData = self.data if self.cacheFile is not None else None
+        self.data = data
+        self.cacheFile = filename
+        if oldData is not None:
+            # (the text was in another cache file)
+            oldData.close()
+
+    def Unmap(self):
+        '''Keep the text in memory again, if it is in a cache file.'''
+        if self.cacheFile is None:
+            return
+        data = self.data
+        self.data = bytearray(data)
+        self.cacheFile = None
+        data.close()
+
+    def UpdateCache(self):
+        '''Move the text to the cache folder (see SetCacheFolder), or back into memory.'''
+        if cacheFolder is None:
+            self.Unmap()
+        elif self.cacheFile is None or os.path.dirname(self.cacheFile) != cacheFolder:
+            self.MapFile(cacheFolder)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _Range(self, start, stop):
+        '''Return the range of line numbers start:stop (as in a slice).'''
+        return range(*slice(start, stop).indices(len(self)))
+
+    def Text(self, start=0, stop=None):
+        '''
+        Return the lines start:stop joined with newlines (like '\\n'.join(lines[start:stop])),
+        decoded all at once.
+        '''
+        lineRange = self._Range(start, stop)
+        if len(lineRange) == 0:
+            return ''
+        return self.data[self.offsets[lineRange.start]:self.offsets[lineRange.stop] - 1].decode('utf-8')
+
+    def Chunks(self, chunkLines=CHUNK_LINES):
+        '''Return a generator of the text, chunkLines lines at a time (see Text).'''
+        for start in range(0, len(self), chunkLines):
+            yield self.Text(start, start + chunkLines)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line number out of range')
+        return self.data[self.offsets[index]:self.offsets[index + 1] - 1].decode('utf-8')
+
+    def __iter__(self):
+        for start in range(0, len(self), self.CHUNK_LINES):
+            stop = min(start + self.CHUNK_LINES, len(self))
+            lines = self.Text(start, stop).split('\n')
+            if len(lines) != stop - start:
+                # a line contains a newline itself (e.g. from a lexicon), so decode line by line
+                lines = self[start:stop]
+            yield from lines
+
+    def __eq__(self, other):
+        if isinstance(other, TextLines):
+            return memoryview(self.data) == memoryview(other.data) and self.offsets == other.offsets
+        if isinstance(other, list):
+            return len(self) == len(other) and all(itertools.starmap(str.__eq__, zip(self, other)))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'TextLines(%d lines, %d bytes%s)' % (len(self), len(self.data),
+                                                    ', in ' + self.cacheFile if self.cacheFile else '')
+
+    def __getstate__(self):
+        return (bytes(self.data), self.offsets.typecode, self.offsets.tobytes())
+
+    def __setstate__(self, state):
+        data, typecode, offsets = state
+        self.data = data
+        self.offsets = array(typecode)
+        self.offsets.frombytes(offsets)
+        self.cacheFile = None
+        try:
+            self.UpdateCache()
+        except OSError:
+            # (e.g. the cache folder is read-only) just keep the text in memory
+            pass
+
+
+class TokenizedLines:
+    '''
+    The lines of one text split into words and the word breaks between them (by a
+    text_import.WordTokenizer), stored as an array of token ids into a vocabulary of the different
+    words and word breaks, so the words of the text can be found and counted without splitting
+    the lines again. Each line is stored as word, break, word, ..., word and then an empty break
+    for the end of the line, so the words are at the even positions and the breaks at the odd ones.
+    '''
+
+    def __init__(self, lines, tokenizer):
+        '''
+        lines: iterable of str (e.g. TextLines), the lines of the text
+        tokenizer: text_import.WordTokenizer that splits the lines into words
+        '''
+        # the word breaking characters the lines were split with
+        self.wordBreakChars = tokenizer.wordBreakChars
+        # the token (str) of each token id, and the token id of each token
+        self.vocab = []
+        self.tokenIds = {}
+        self.ids = array('i')
+        # lineStarts[n] is where the tokens of line n start, and lineStarts[-1] is the end
+        self.lineStarts = array('q', [0])
+        # index of the words, built when first needed (see WordIds and WordPositions)
+        self.lowercaseIds = None
+        self.wordPositions = None
+        # ranks of the words, and the pairs of words used together by rank (see RankWords)
+        self.wordRanks = None
+        self.tokenRanks = None
+        self.rankedPairs = None
+        # the sentences ranked by their words, and the characters that ended them (see RankSentences)
+        self.rankedSentences = None
+        self.sentenceEnds = None
+        lines = iter(lines)
+        while True:
+            chunk = list(itertools.islice(lines, TextLines.CHUNK_LINES))
+            if not chunk:
+                break
+            ids, lineLengths = self._Tokenize(chunk, tokenizer)
+            self.ids += ids
+            lineEnds = itertools.accumulate(lineLengths, initial=self.lineStarts[-1])
+            self.lineStarts.extend(itertools.islice(lineEnds, 1, None))
+
+    def _Tokenize(self, lines, tokenizer):
+        '''Split the lines into tokens, and return their token ids and the number of tokens in each line.'''
+        tokens = []
+        lineLengths = []
+        for line in lines:
+            lineTokens = tokenizer.SplitWithBreaks(line)
+            lineTokens.append('')
+            tokens += lineTokens
+            lineLengths.append(len(lineTokens))
+        # add the new tokens to the vocabulary (in the order they are found)
+        for token in dict.fromkeys(tokens):
+            if token not in self.tokenIds:
+                self.tokenIds[token] = len(self.vocab)
+                self.vocab.append(token)
+        return array('i', map(self.tokenIds.__getitem__, tokens)), lineLengths
+
+    def Retokenize(self, lineNums, lines, tokenizer):
+        '''
+        Split some of the lines again (e.g. the lines with a character that has become a word
+        break), leaving the tokens of the other lines as they are.
+
+        Parameters: lineNums (list of int) - the line numbers, in ascending order
+                    lines (list of str) - the text of these lines
+                    tokenizer (text_import.WordTokenizer) - splits the lines into words
+        '''
+        newIds, newLengths = self._Tokenize(lines, tokenizer)
+        ids = array('i')
+        lineStarts = array('q')
+        # copy the tokens of the lines in between as they are, and only replace these lines
+        prevLine = 0
+        newStart = 0
+        for lineNum, length in zip(lineNums, newLengths):
+            start = self.lineStarts[prevLine]
+            stop = self.lineStarts[lineNum]
+            shift = len(ids) - start
+            ids += self.ids[start:stop]
+            lineStarts.extend(lineStart + shift for lineStart in self.lineStarts[prevLine:lineNum])
+            lineStarts.append(len(ids))
+            ids += newIds[newStart:newStart + length]
+            newStart += length
+            prevLine = lineNum + 1
+        start = self.lineStarts[prevLine]
+        shift = len(ids) - start
+        ids += self.ids[start:]
+        lineStarts.extend(lineStart + shift for lineStart in self.lineStarts[prevLine:])
+        self.ids = ids
+        self.lineStarts = lineStarts
+        self.wordBreakChars = tokenizer.wordBreakChars
+        self.lowercaseIds = None
+        self.wordPositions = None
+        self.wordRanks = None
+
+    def __len__(self):
+        return len(self.lineStarts) - 1
+
+    def Line(self, lineNum):
+        '''Return the token ids of a line (words at the even positions), without the end of the line.'''
+        return self.ids[self.lineStarts[lineNum]:self.lineStarts[lineNum + 1] - 1]
+
+    def Join(self, ids):
+        '''Return the text of the tokens with these ids.'''
+        return ''.join(map(self.vocab.__getitem__, ids))
+
+    def WordIds(self, word):
+        '''Return the list of token ids of a (lowercase) word, in any case (e.g. 'the', 'The', 'THE').'''
+        if self.lowercaseIds is None:
+            self.lowercaseIds = {}
+            for tokenId, token in enumerate(self.vocab):
+                self.lowercaseIds.setdefault(token.lower(), []).append(tokenId)
+        return self.lowercaseIds.get(word, [])
+
+    def WordPositions(self, tokenIds):
+        '''
+        Return where words with any of these token ids are used, from an index of the positions
+        of each word (built the first time it is needed), so it takes time in proportion to the
+        number of times the words are used, not the size of the text.
+
+        Return value: list of the positions in the text (in order) of the words (as word numbers,
+                      i.e. the positions in ids divided by 2)
+        '''
+        if self.wordPositions is None:
+            words = self.ids[0::2]
+            if np is not None:
+                # the word numbers sorted by token id, and where the word numbers of each token id start
+                words = np.frombuffer(words, dtype=np.dtype('i%d' % words.itemsize))
+                order = np.argsort(words, kind='stable').astype(np.int64)
+                starts = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+                np.cumsum(np.bincount(words, minlength=len(self.vocab)), out=starts[1:])
+                self.wordPositions = (order, starts)
+            else:
+                positions = {}
+                for wordNum, tokenId in enumerate(words):
+                    positions.setdefault(tokenId, array('q')).append(wordNum)
+                self.wordPositions = positions
+        if isinstance(self.wordPositions, tuple):
+            order, starts = self.wordPositions
+            found = [order[starts[tokenId]:starts[tokenId + 1]].tolist() for tokenId in tokenIds]
+        else:
+            found = [self.wordPositions.get(tokenId, ()) for tokenId in tokenIds]
+        if len(found) == 1:
+            return list(found[0])
+        return sorted(itertools.chain.from_iterable(found))
+
+    def WordCounts(self, lineNums=None):
+        '''
+        Count the words (as they are, not lowercased or filtered, like text_import.CountWords)
+        in all the lines, or in the lines with these line numbers.
+
+        Return value: Counter of { word, count }, in the order the words are first found
+        '''
+        if lineNums is None:
+            idCounts = Counter(self.ids[0::2])
+        else:
+            idCounts = Counter()
+            for lineNum in lineNums:
+                idCounts.update(self.ids[self.lineStarts[lineNum]:self.lineStarts[lineNum + 1]:2])
+        return Counter({self.vocab[tokenId]: cnt for tokenId, cnt in idCounts.items()})
+
+    def Find(self, tokenIds):
+        '''
+        Find where words with any of these token ids are used.
+
+        Return value: list of (line number, position of the word in the line's tokens)
+        '''
+        if not tokenIds or len(self.ids) == 0:
+            return []
+        return self._LinePositions(self.WordPositions(tokenIds))
+
+    def _LinePositions(self, wordNums):
+        '''Return the (line number, position in the line's tokens) of each word number (in order).'''
+        if np is not None and len(wordNums) > 100:
+            positions = np.asarray(wordNums, dtype=np.int64) * 2
+            lineStarts = np.frombuffer(self.lineStarts, dtype=np.int64)
+            lineNums = np.searchsorted(lineStarts, positions, side='right') - 1
+            return list(zip(lineNums.tolist(), (positions - lineStarts[lineNums]).tolist()))
+        found = []
+        for wordNum in wordNums:
+            lineNum = bisect.bisect_right(self.lineStarts, wordNum * 2) - 1
+            found.append((lineNum, wordNum * 2 - self.lineStarts[lineNum]))
+        return found
+
+    # rank of the words that aren't ranked (higher than any rank)
+    NO_RANK = 2 ** 62
+
+    def RankWords(self, wordRanks):
+        '''
+        Give each word (in any case) a rank, e.g. the row of the teaching order from which it can be read,
+        and rank each pair of words used together (in the same line) by the higher rank of the two,
+        so FindRanked can find the words used together up to a rank without looking at all the words.
+        Nothing is done if the ranks are the same as last time.
+
+        Parameter: wordRanks (dict) - { lowercase word, rank (int >= 0) }, words not in it are never found
+        '''
+        if wordRanks == self.wordRanks:
+            return
+        self.wordRanks = wordRanks
+        self.rankedSentences = None
+        # (the words not in wordRanks get a rank higher than any rank, and so do the pairs with them)
+        maxRank = max(wordRanks.values(), default=0)
+        self.tokenRanks = array('q', (wordRanks.get(token.lower(), self.NO_RANK) for token in self.vocab))
+        words = self.ids[0::2]
+        breaks = self.ids[1::2]
+        endId = self.tokenIds.get('')
+        if np is not None:
+            intType = np.dtype('i%d' % self.ids.itemsize)
+            ranks = np.frombuffer(self.tokenRanks, dtype=np.int64)[np.frombuffer(words, dtype=intType)]
+            pairRanks = np.maximum(ranks[:-1], ranks[1:])
+            # (the last word of a line and the first word of the next line aren't used together)
+            pairRanks[np.frombuffer(breaks, dtype=intType)[:-1] == endId] = self.NO_RANK
+            # the pairs (as the word number of their first word) sorted by rank, and where each rank starts
+            pairs = np.flatnonzero(pairRanks != self.NO_RANK)
+            pairRanks = pairRanks[pairs]
+            order = pairs[np.argsort(pairRanks, kind='stable')].astype(np.int64)
+            starts = np.zeros(maxRank + 2, dtype=np.int64)
+            np.cumsum(np.bincount(pairRanks, minlength=maxRank + 1), out=starts[1:])
+            self.rankedPairs = (order, starts)
+        else:
+            rankedPairs = {}
+            for wordNum in range(len(words) - 1):
+                if breaks[wordNum] != endId:
+                    rank = max(self.tokenRanks[words[wordNum]], self.tokenRanks[words[wordNum + 1]])
+                    if rank != self.NO_RANK:
+                        rankedPairs.setdefault(rank, array('q')).append(wordNum)
+            self.rankedPairs = rankedPairs
+
+    def FindRanked(self, maxRank):
+        '''
+        Find where two words that both have a rank (see RankWords) up to maxRank are used together.
+
+        Return value: list of (line number, position of the first word in the line's tokens)
+        '''
+        if isinstance(self.rankedPairs, tuple):
+            order, starts = self.rankedPairs
+            wordNums = np.sort(order[:starts[min(maxRank + 1, len(starts) - 1)]])
+        else:
+            wordNums = sorted(itertools.chain.from_iterable(pairs for rank, pairs in self.rankedPairs.items()
+                                                            if rank <= maxRank))
+        return self._LinePositions(wordNums)
+
+    def RankSentences(self, sentenceEnds):
+        '''
+        Split the lines into sentences, which end at the word breaks with any of the sentenceEnds
+        characters (and at the end of each line), and rank each sentence by the highest rank of its
+        words (see RankWords, which must be called first), in one pass over the words.
+        Nothing is done if the ranks and sentenceEnds are the same as last time.
+
+        Parameter: sentenceEnds (str) - the characters that end a sentence
+        Return value: list of (rank, start, stop) of the sentences with all their words ranked, in the
+                      order of the text, where ids[start:stop] are the tokens of the sentence (from
+                      its first word to the word break after its last word)
+        '''
+        if self.rankedSentences is not None and sentenceEnds == self.sentenceEnds:
+            return self.rankedSentences
+        self.sentenceEnds = sentenceEnds
+        endChars = set(sentenceEnds)
+        # the breaks that end a sentence (the end of a line always does)
+        endsSentence = [token == '' or not endChars.isdisjoint(token) for token in self.vocab]
+        words = self.ids[0::2]
+        breaks = self.ids[1::2]
+        endId = self.tokenIds.get('')
+        # (an empty word, e.g. before a quote mark at the start of a line, doesn't change the rank)
+        tokenRanks = array('q', self.tokenRanks)
+        if endId is not None:
+            tokenRanks[endId] = -1
+        if np is not None and len(words) > 0:
+            intType = np.dtype('i%d' % self.ids.itemsize)
+            ranks = np.frombuffer(tokenRanks, dtype=np.int64)[np.frombuffer(words, dtype=intType)]
+            # the word numbers of the last word of each sentence, and of the first word
+            ends = np.flatnonzero(np.array(endsSentence, dtype=bool)[np.frombuffer(breaks, dtype=intType)])
+            starts = np.concatenate(([0], ends[:-1] + 1))
+            sentenceRanks = np.maximum.reduceat(ranks, starts)
+            ranked = np.flatnonzero((sentenceRanks >= 0) & (sentenceRanks != self.NO_RANK))
+            self.rankedSentences = list(zip(sentenceRanks[ranked].tolist(), (starts[ranked] * 2).tolist(),
+                                            (ends[ranked] * 2 + 2).tolist()))
+        else:
+            rankedSentences = []
+            rank = -1
+            start = 0
+            for wordNum, (tokenId, breakId) in enumerate(zip(words, breaks)):
+                rank = max(rank, tokenRanks[tokenId])
+                if endsSentence[breakId]:
+                    if 0 <= rank < self.NO_RANK:
+                        rankedSentences.append((rank, start * 2, wordNum * 2 + 2))
+                    rank = -1
+                    start = wordNum + 1
+            self.rankedSentences = rankedSentences
+        return self.rankedSentences
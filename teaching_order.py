@@ -0,0 +1,735 @@
+#!/usr/bin/python3
+#
+# teaching_order
+#
+# Calculation engines for the PrimerPrep teaching order. Nothing in this
+# module uses GTK, so it can be used from worker threads/processes.
+
+import os
+import re
+import time
+import heapq
+import random
+from collections import Counter
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+try:
+    # numpy is only needed for the compact (bitset) elimination engine
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CalculationCancelled(Exception):
+    '''Raised by a progress callback to stop a calculation part way through.'''
+    pass
+
+
+def MorphemeKeyForRemoval(morph):
+    '''
+    Return the key under which a morpheme of a word's affix form is removed
+    from the analysis morphemes, once that word drops out of the elimination.
+    (Affix hyphens are removed, just as they are when splitting into graphemes.)
+    '''
+    if morph.endswith('-') or morph.startswith('-'):
+        return morph.replace('-', '')
+    return morph
+
+
+def GraphemeRegex(digraphs, separateCombDiacritics):
+    '''
+    Build a RegEx that can split out individual graphemes including digraphs (from list).
+
+    Parameters: digraphs (list of str) - character combinations that are to be treated as one grapheme
+                separateCombDiacritics (bool) - True if combining diacritics are graphemes on their own
+    Return value: compiled RegEx, to be used with findall()
+    '''
+    # make sure that the longer multigraphs come first, or they might not get matched
+    digraphList = sorted(digraphs, key=len, reverse=True)
+    # build the RegEx string (escape any special characters - which would be weird, but for safety)
+    digraphStr = '|'.join(re.escape(dg) for dg in digraphList)
+    if len(digraphStr) > 0:
+        digraphStr += '|'
+
+    # make sure to include any zero width joiners (ZWJs, \u200d), but exclude word joiners
+    # (WJs, \u2060) and any zero width spaces (ZWSPs, \u200b) which are used to mark affixes
+    if separateCombDiacritics:
+        # RegEx that treats combining diacritics separately
+        return re.compile(r'(\u200d?(?:' + digraphStr + r'[^\u200b\u2060])\u200d?)')
+    else:
+        # RegEx that includes combining diacritics with their preceding base characters
+        return re.compile(r'(\u200d?(?:' + digraphStr + r'[^\u200b\u2060])[\u0300-\u036f]*\u200d?)')
+
+
+def SplitWords(words, excludeAffixes, countWords, findGraphemes, progress=None):
+    '''
+    Break all words (and their morphemes) into lists of graphemes, and count the
+    words, morphemes and graphemes, ready for calculating the teaching order.
+
+    Parameters: words (dict) - { word, [word count, manual split?, excluded?, affix form, markup form] }
+                excludeAffixes (bool) - True if we exclude affixes, False if they are counted as words
+                countWords (bool) - True if we count all words (tokens), False if types
+                findGraphemes (callable) - returns the list of graphemes in a word or morpheme
+                progress (callable) - optional, called every 1000 words with the fraction done
+    Return value: tuple of (wordsAsGraphemes, morphemesAsGraphemes, analysisWords,
+                            analysisMorphemes, graphemeUse), as stored in WordAnalysis
+    '''
+    kWordCnt = 0
+    kWordExclude = 2
+    kWordAffixForm = 3
+
+    wordsAsGraphemes = {}
+    morphemesAsGraphemes = {}
+    analysisWords = {}
+    analysisMorphemes = {}
+    graphemeUse = {}
+    for wordNum, (word, word_info) in enumerate(words.items()):
+        if progress is not None and wordNum % 1000 == 0:
+            progress(wordNum / len(words))
+        # decompose this word as a list of graphemes to determine the example words
+        # (morphemes are used for the Teaching Order calculations)
+        wordsAsGraphemes[word] = findGraphemes(word)
+        # put the word count into the analysisWords dictionary (zero if this word is excluded)
+        if not word_info[kWordExclude]:
+            analysisWords[word] = (word_info[kWordCnt] if countWords else 1)
+        else:
+            analysisWords[word] = 0
+
+        # process the individual affixes of this word
+        affixList = word_info[kWordAffixForm].split(' ')
+        for morph in affixList:
+            # process each affix or root
+            if (not excludeAffixes) or (not morph.endswith('-') and not morph.startswith('-')):
+                # either we aren't excluding affixes, or this isn't an affix
+                if not word_info[kWordExclude]:
+                    # store this "word", with its count (adding to existing one if found)
+                    analysisMorphemes[morph] = \
+                        analysisMorphemes.get(morph, 0) + (word_info[kWordCnt] if countWords else 1)
+                else:
+                    # don't count the graphemes of excluded words, but make sure it's in the word list (with zero count)
+                    if morph not in analysisMorphemes:
+                        analysisMorphemes[morph] = 0
+
+                morphNoHyphen = morph
+                if morphNoHyphen.endswith('-') or morphNoHyphen.startswith('-'):
+                    # this is an affix, so remove the hyphen before splitting into graphemes
+                    morphNoHyphen = morphNoHyphen.replace('-', '')
+
+                # retrieve a list of graphemes for this morpheme
+                if morph in morphemesAsGraphemes:
+                    # just load the graphemes that were generated before
+                    graphemes = morphemesAsGraphemes[morph]
+                else:
+                    # generate and store the graphemes for this morpheme
+                    graphemes = findGraphemes(morphNoHyphen)
+                    morphemesAsGraphemes[morph] = graphemes
+                for grapheme in graphemes:
+                    if not word_info[kWordExclude]:
+                        # increase count of uses for this grapheme by num of words
+                        # (if first time, get default 0 then add num of words)
+                        graphemeUse[grapheme] = \
+                            graphemeUse.get(grapheme, 0) + (word_info[kWordCnt] if countWords else 1)
+                    else:
+                        # just make sure the grapheme is in the graphemeUse dictionary
+                        if grapheme not in graphemeUse:
+                            graphemeUse[grapheme] = 0
+    return wordsAsGraphemes, morphemesAsGraphemes, analysisWords, analysisMorphemes, graphemeUse
+
+
+def BuildGraphemeWordIndex(wordsAsGraphemes):
+    '''
+    Build the inverted index of which words use each grapheme.
+    Returns:
+        { grapheme: set of words having this grapheme }
+    '''
+    graphemeWords = {}
+    for word, graphemes in wordsAsGraphemes.items():
+        for gr in graphemes:
+            graphemeWords.setdefault(gr, set()).add(word)
+    return graphemeWords
+
+
+def BuildWordRank(analysisWords):
+    '''
+    Return { word: position of word in analysisWords }, which is used to keep
+    example words with the same count in their original (word list) order.
+    '''
+    return {word: i for i, word in enumerate(analysisWords)}
+
+
+def SortExampleWords(words, analysisWords, wordRank):
+    '''
+    Return the given words as a list in decreasing order of use
+    (words with the same count stay in word list order).
+    '''
+    return sorted(words, key=lambda word: (-analysisWords[word], wordRank[word]))
+
+
+def ExampleWordsLists(graphemeList, graphemeWords, analysisWords, wordRank):
+    '''
+    Build the example word lists for the given teaching order. Starting from the
+    last grapheme, each grapheme gets all words using it that haven't already been
+    given to a later grapheme (a word can't be used before all its graphemes are taught).
+    Sight word lessons (int entries in graphemeList) are skipped.
+    Only the index entries of the graphemes are visited, never the whole word list.
+    Returns:
+        { grapheme: list of example words, in decreasing order of use }
+    '''
+    usedWords = set()
+    graphemeExampleWords = {}
+    for gr in reversed(graphemeList):
+        if isinstance(gr, int):
+            continue
+        words = graphemeWords.get(gr, set()) - usedWords
+        usedWords |= words
+        graphemeExampleWords[gr] = SortExampleWords(words, analysisWords, wordRank)
+    return graphemeExampleWords
+
+
+def ChangedSpan(oldOrder, newOrder):
+    '''
+    Compare two teaching orders which differ only by a reordering (e.g. a drag-and-drop).
+    Returns:
+        (lo, hi) = first and last positions that differ (lo > hi if nothing changed)
+        or None if newOrder is not just a reordering of oldOrder
+    '''
+    if len(oldOrder) != len(newOrder):
+        return None
+    lo = 0
+    while lo < len(newOrder) and oldOrder[lo] == newOrder[lo]:
+        lo += 1
+    hi = len(newOrder) - 1
+    while hi >= lo and oldOrder[hi] == newOrder[hi]:
+        hi -= 1
+    if Counter(oldOrder[lo:hi+1]) != Counter(newOrder[lo:hi+1]):
+        return None
+    return (lo, hi)
+
+
+def ReassignExampleWords(newOrder, lo, hi, graphemeExampleWords, graphemeWords, analysisWords, wordRank):
+    '''
+    Rebuild the example word lists for the lessons lo..hi of a reordered teaching order.
+    Graphemes before lo and after hi still have the same set of graphemes following them,
+    so their example words don't change; only the words that were examples for the
+    graphemes in the span need to be given out again among those graphemes.
+    Returns:
+        { grapheme: list of example words } for the (non sight word) graphemes in the span
+    '''
+    span = newOrder[lo:hi+1]
+    # the pool of words to reassign: all examples of the graphemes in the span
+    pool = set()
+    for gr in span:
+        if not isinstance(gr, int):
+            pool.update(graphemeExampleWords.get(gr, ()))
+    changed = {}
+    for gr in reversed(span):
+        if isinstance(gr, int):
+            continue
+        words = pool & graphemeWords.get(gr, set())
+        pool -= words
+        changed[gr] = SortExampleWords(words, analysisWords, wordRank)
+    return changed
+
+
+def EliminationTeachingOrder(graphemeUse, morphemesAsGraphemes, analysisMorphemes,
+                             graphemeWords, analysisWords, wordRank, wordAffixForms, countWords,
+                             progress=None):
+    '''
+    Calculate the teaching order with the elimination algorithm.
+
+    The least frequent grapheme (summing the counts of the morphemes that still
+    contain it) is taught last. All words containing that grapheme are then used
+    as its example words, and they (and their morphemes) are removed before
+    the next least frequent grapheme is chosen, and so on.
+
+    Rather than rescanning every morpheme for every grapheme on each round, a
+    grapheme->morphemes index is built once, each grapheme's frequency is
+    updated as morphemes drop out, and a priority queue gives the next minimum.
+    Example words come from the grapheme->words index (see BuildGraphemeWordIndex).
+    Ties are resolved in the order of graphemeUse (the same as min() on a dict).
+
+    Parameters: graphemeUse (dict) - { grapheme, grapheme count in all texts }
+                morphemesAsGraphemes (dict) - { morpheme, list of graphemes in morpheme }
+                analysisMorphemes (dict) - { morpheme, morpheme count in all texts }
+                graphemeWords (dict) - { grapheme, set of words having this grapheme }
+                analysisWords (dict) - { word, word count in all texts }
+                wordRank (dict) - { word, position of word in analysisWords }
+                wordAffixForms (dict) - { word, affix form of word, e.g. "re- work -ing" }
+                countWords (bool) - True if we count all words (tokens), False if types
+                progress (callable) - optional, called after each grapheme with the fraction
+                                      done (0.0 to 1.0); may raise CalculationCancelled
+    Return value: tuple of (teachingOrder (list of str),
+                            graphemeExampleWords (dict of { grapheme, list of example words }))
+    '''
+    # give each grapheme a fixed rank (for breaking ties) and its initial frequency,
+    # the sum of the counts of all morphemes having this grapheme
+    rank = {gr: i for i, gr in enumerate(graphemeUse)}
+    freq = dict.fromkeys(graphemeUse, 0)
+    # morphemeGraphemes: dict of { morpheme, set of graphemes in morpheme }
+    morphemeGraphemes = {}
+    morphemeWeight = {}
+    for morph, cnt in analysisMorphemes.items():
+        graphemes = set(morphemesAsGraphemes[morph])
+        weight = cnt if countWords else 1
+        morphemeGraphemes[morph] = graphemes
+        morphemeWeight[morph] = weight
+        for gr in graphemes:
+            freq[gr] += weight
+
+    heap = [(f, rank[gr], gr) for gr, f in freq.items()]
+    heapq.heapify(heap)
+    remainingMorphemes = set(morphemeGraphemes)
+    remainingWords = set(analysisWords)
+    teachingOrder = []
+    graphemeExampleWords = {}
+    while heap:
+        f, _, last = heapq.heappop(heap)
+        if last not in freq or freq[last] != f:
+            # stale entry (this grapheme has already been taught, or its frequency dropped)
+            continue
+        del freq[last]
+        if graphemeUse[last] > 0:
+            # only add to teaching order if it is counted
+            teachingOrder.append(last)
+
+        # collect the words that still remain and use this grapheme
+        wordsWithGrapheme = graphemeWords.get(last, set()) & remainingWords
+        for word in wordsWithGrapheme:
+            # this word is no longer available for more frequent graphemes
+            remainingWords.discard(word)
+            for morph in wordAffixForms[word].split(' '):
+                morph = MorphemeKeyForRemoval(morph)
+                if morph in remainingMorphemes:
+                    remainingMorphemes.remove(morph)
+                    weight = morphemeWeight[morph]
+                    if weight == 0:
+                        continue
+                    # this morpheme no longer counts towards its graphemes
+                    for gr in morphemeGraphemes[morph]:
+                        if gr in freq:
+                            freq[gr] -= weight
+                            heapq.heappush(heap, (freq[gr], rank[gr], gr))
+        # store the list of example words for this grapheme, in decreasing order of use
+        graphemeExampleWords[last] = SortExampleWords(wordsWithGrapheme, analysisWords, wordRank)
+        if progress is not None:
+            progress(len(graphemeExampleWords) / len(graphemeUse))
+
+    # graphemes were found from least to most frequent, so reverse for the teaching order
+    teachingOrder.reverse()
+    return teachingOrder, graphemeExampleWords
+
+
+# word lists at least this large use the compact (bitset) elimination engine, if numpy is available
+BITSET_MIN_WORDS = 50000
+
+
+class GraphemeBitsets:
+    '''
+    Compact storage of many sets of graphemes (e.g. one per word or morpheme).
+    Graphemes are interned as integer ids (columns), and each set is stored as
+    a row of packed bits, so 64 graphemes take 8 bytes per word.
+    Requires numpy.
+    '''
+    # number of rows unpacked at one time, to keep the temporary memory use bounded
+    CHUNK_ROWS = 8192
+
+    def __init__(self, graphemeIds, graphemeSets):
+        '''
+        graphemeIds:  { grapheme: column id }
+        graphemeSets: list of iterables of graphemes (graphemes not in graphemeIds are ignored)
+        '''
+        self.numGraphemes = len(graphemeIds)
+        numBytes = (self.numGraphemes + 7) // 8
+        self.packed = np.zeros((len(graphemeSets), numBytes), dtype=np.uint8)
+        for start in range(0, len(graphemeSets), self.CHUNK_ROWS):
+            chunk = graphemeSets[start:start + self.CHUNK_ROWS]
+            dense = np.zeros((len(chunk), self.numGraphemes), dtype=bool)
+            for i, graphemes in enumerate(chunk):
+                dense[i, [graphemeIds[gr] for gr in graphemes if gr in graphemeIds]] = True
+            self.packed[start:start + len(chunk)] = np.packbits(dense, axis=1)
+
+    def Column(self, gid):
+        '''Return a boolean array telling which rows contain the grapheme with id gid.'''
+        return ((self.packed[:, gid >> 3] >> (7 - (gid & 7))) & 1).astype(bool)
+
+    def WeightedSums(self, weights, rows=None):
+        '''
+        Return, for each grapheme, the sum of the weights of the rows containing it
+        (the matrix-vector product weights x rows).
+        rows: array of row indices that the weights belong to (all rows if None)
+        '''
+        packed = self.packed if rows is None else self.packed[rows]
+        sums = np.zeros(self.numGraphemes, dtype=np.int64)
+        for start in range(0, len(packed), self.CHUNK_ROWS):
+            dense = np.unpackbits(packed[start:start + self.CHUNK_ROWS], axis=1, count=self.numGraphemes)
+            sums += weights[start:start + self.CHUNK_ROWS] @ dense.astype(np.int64)
+        return sums
+
+
+def EliminationTeachingOrderBitsets(graphemeUse, morphemesAsGraphemes, analysisMorphemes,
+                                    wordsAsGraphemes, analysisWords, wordAffixForms, countWords,
+                                    progress=None):
+    '''
+    Calculate the teaching order with the elimination algorithm, like
+    EliminationTeachingOrder, but with the words and morphemes held as GraphemeBitsets.
+    The grapheme frequencies are one weighted sum over the morpheme rows, and when
+    morphemes drop out their rows are summed and subtracted in one vectorized step.
+    Gives exactly the same results as EliminationTeachingOrder. Requires numpy.
+
+    Parameters: as for EliminationTeachingOrder, except wordsAsGraphemes
+                (dict of { word, list of graphemes in word }) replaces the index
+    Return value: tuple of (teachingOrder, graphemeExampleWords)
+    '''
+    # intern the graphemes as ids, in graphemeUse order (so argmin breaks ties like min() on a dict)
+    graphemes = list(graphemeUse)
+    graphemeIds = {gr: i for i, gr in enumerate(graphemes)}
+
+    morphemes = list(analysisMorphemes)
+    morphemeIds = {morph: i for i, morph in enumerate(morphemes)}
+    morphemeSets = GraphemeBitsets(graphemeIds, [morphemesAsGraphemes[morph] for morph in morphemes])
+    weights = np.array([analysisMorphemes[morph] if countWords else 1 for morph in morphemes], dtype=np.int64)
+    freq = morphemeSets.WeightedSums(weights)
+
+    words = list(analysisWords)
+    wordSets = GraphemeBitsets(graphemeIds, [wordsAsGraphemes[word] for word in words])
+    counts = np.array([analysisWords[word] for word in words], dtype=np.int64)
+    # the morpheme ids which drop out with each word
+    wordMorphemes = []
+    for word in words:
+        keys = (MorphemeKeyForRemoval(morph) for morph in wordAffixForms[word].split(' '))
+        wordMorphemes.append([morphemeIds[key] for key in keys if key in morphemeIds])
+
+    remainingWords = np.ones(len(words), dtype=bool)
+    remainingMorphemes = np.ones(len(morphemes), dtype=bool)
+    remainingGraphemes = np.ones(len(graphemes), dtype=bool)
+    maxFreq = np.iinfo(np.int64).max
+    teachingOrder = []
+    graphemeExampleWords = {}
+    for _ in range(len(graphemes)):
+        # the least frequent remaining grapheme is taught last
+        gid = int(np.argmin(np.where(remainingGraphemes, freq, maxFreq)))
+        remainingGraphemes[gid] = False
+        last = graphemes[gid]
+        if graphemeUse[last] > 0:
+            # only add to teaching order if it is counted
+            teachingOrder.append(last)
+
+        # the words that still remain and use this grapheme (in word order)
+        wordIdx = np.flatnonzero(wordSets.Column(gid) & remainingWords)
+        remainingWords[wordIdx] = False
+        removed = []
+        for w in wordIdx:
+            for m in wordMorphemes[w]:
+                if remainingMorphemes[m]:
+                    remainingMorphemes[m] = False
+                    removed.append(m)
+        if removed:
+            # these morphemes no longer count towards their graphemes
+            freq -= morphemeSets.WeightedSums(weights[removed], removed)
+        # store the list of example words for this grapheme, in decreasing order of use
+        # (lexsort uses the last key first: count descending, then word order)
+        wordIdx = wordIdx[np.lexsort((wordIdx, -counts[wordIdx]))]
+        graphemeExampleWords[last] = [words[w] for w in wordIdx]
+        if progress is not None:
+            progress(len(graphemeExampleWords) / len(graphemes))
+
+    # graphemes were found from least to most frequent, so reverse for the teaching order
+    teachingOrder.reverse()
+    return teachingOrder, graphemeExampleWords
+
+
+# the strategies for arranging the teaching order ("elimination" is the one normally used)
+ALGORITHMS = ("elimination", "decreasing grapheme frequency")
+
+
+def TeachingOrder(algorithm, graphemeUse, morphemesAsGraphemes, analysisMorphemes, wordsAsGraphemes,
+                  graphemeWords, analysisWords, wordRank, wordAffixForms, countWords, progress=None):
+    '''
+    Arrange the teaching order with the given strategy (one of ALGORITHMS),
+    and build the lists of example words.
+
+    Parameters: as for EliminationTeachingOrder, plus wordsAsGraphemes (for the compact engine)
+    Return value: tuple of (teachingOrder, graphemeExampleWords)
+    '''
+    if algorithm == "elimination":
+        if np is not None and len(analysisWords) >= BITSET_MIN_WORDS:
+            # for very large word lists, use the compact engine (graphemes as bits, vectorized sums)
+            return EliminationTeachingOrderBitsets(graphemeUse, morphemesAsGraphemes, analysisMorphemes,
+                                                   wordsAsGraphemes, analysisWords, wordAffixForms, countWords,
+                                                   progress)
+        return EliminationTeachingOrder(graphemeUse, morphemesAsGraphemes, analysisMorphemes,
+                                        graphemeWords, analysisWords, wordRank, wordAffixForms, countWords,
+                                        progress)
+    else:
+        # algorithm == "decreasing grapheme frequency"
+        # sort the letters by order of decreasing occurance, as draft teaching order
+        graphemeList = sorted(graphemeUse, key=graphemeUse.get, reverse=True)
+        return graphemeList, ExampleWordsLists(graphemeList, graphemeWords, analysisWords, wordRank)
+
+
+def CalculateVariant(words, digraphs, separateCombDiacritics, algorithm, excludeAffixes, countWords,
+                     graphemeCache=None):
+    '''
+    Calculate a teaching order from scratch for one combination of the settings,
+    the same way as WordAnalysis.CalculateTeachingOrder (but without storing anything).
+
+    Parameters: words (dict) - { word, [word count, manual split?, excluded?, affix form, markup form] }
+                digraphs, separateCombDiacritics - the orthography settings (see GraphemeRegex)
+                algorithm (str) - one of ALGORITHMS
+                excludeAffixes, countWords (bool) - the counting settings (see SplitWords)
+                graphemeCache (dict) - optional { word or morpheme, list of graphemes }, found
+                                       with the same orthography settings (added to as we go)
+    Return value: tuple of (teachingOrder, graphemeExampleWords)
+    '''
+    findGraphemes = GraphemeRegex(digraphs, separateCombDiacritics)
+    if graphemeCache is None:
+        graphemeCache = {}
+
+    def FindGraphemes(text):
+        graphemes = graphemeCache.get(text)
+        if graphemes is None:
+            graphemes = graphemeCache[text] = findGraphemes.findall(text)
+        return graphemes
+
+    (wordsAsGraphemes, morphemesAsGraphemes, analysisWords, analysisMorphemes,
+     graphemeUse) = SplitWords(words, excludeAffixes, countWords, FindGraphemes)
+    kWordAffixForm = 3
+    wordAffixForms = {word: word_info[kWordAffixForm] for word, word_info in words.items()}
+    return TeachingOrder(algorithm, graphemeUse, morphemesAsGraphemes, analysisMorphemes, wordsAsGraphemes,
+                         BuildGraphemeWordIndex(wordsAsGraphemes), analysisWords, BuildWordRank(analysisWords),
+                         wordAffixForms, countWords)
+
+
+# the data shared by all variants calculated in a worker process (set by _InitVariantWorker)
+_variantData = None
+
+
+def _InitVariantWorker(words, digraphs, separateCombDiacritics, graphemeCache):
+    global _variantData
+    _variantData = (words, digraphs, separateCombDiacritics, graphemeCache)
+
+
+def _CalculateVariantInWorker(variant):
+    words, digraphs, separateCombDiacritics, graphemeCache = _variantData
+    algorithm, excludeAffixes, countWords = variant
+    teachingOrder, graphemeExampleWords = CalculateVariant(words, digraphs, separateCombDiacritics, algorithm,
+                                                           excludeAffixes, countWords, graphemeCache)
+    # only send back what is needed for comparing (the example word lists can be very long)
+    return teachingOrder, {gr: len(exampleWords) for gr, exampleWords in graphemeExampleWords.items()}
+
+
+def AllVariants():
+    '''
+    Return a list of all combinations of (algorithm, excludeAffixes, countWords).
+    '''
+    return [(algorithm, excludeAffixes, countWords)
+            for algorithm in ALGORITHMS for excludeAffixes in (True, False) for countWords in (True, False)]
+
+
+def CompareVariants(words, digraphs, separateCombDiacritics, variants, graphemeCache=None, maxWorkers=None):
+    '''
+    Calculate the teaching order for each of the given variants, in parallel worker processes.
+    The words (and grapheme cache) are sent once to each worker process, not once per variant,
+    so with enough cores this takes about as long as calculating a single teaching order.
+
+    Parameters: words, digraphs, separateCombDiacritics, graphemeCache - as for CalculateVariant
+                variants (list) - tuples of (algorithm, excludeAffixes, countWords), e.g. from AllVariants()
+                maxWorkers (int) - maximum number of processes (default: one per core, up to one per variant)
+    Return value: list (in the order of variants) of tuples of
+                  (teachingOrder, { grapheme, number of example words })
+    '''
+    if maxWorkers is None:
+        maxWorkers = os.cpu_count() or 1
+    maxWorkers = max(1, min(maxWorkers, len(variants)))
+    # start the worker processes fresh (as on Windows and macOS), since forking a process
+    # with other threads running (e.g. the GTK main loop) can deadlock
+    with ProcessPoolExecutor(max_workers=maxWorkers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_InitVariantWorker,
+                             initargs=(words, digraphs, separateCombDiacritics, graphemeCache)) as pool:
+        return list(pool.map(_CalculateVariantInWorker, variants))
+
+
+# default time (in seconds) that OptimizeTeachingOrder searches for a better teaching order
+OPTIMIZE_SECONDS = 15
+
+
+class CoverageScorer:
+    '''
+    Score a teaching order by how soon the words become decodable, and rescore it
+    incrementally as pairs of lessons are swapped.
+
+    A word is decodable from the lesson of its last taught grapheme. The cumulative
+    coverage is the sum, over all lessons, of the (token or type) counts of the words
+    decodable by that lesson, so the cost to minimize is the sum of count x lesson of
+    each word. Swapping two lessons can only change the words that use either of the
+    two graphemes, which are found from the grapheme->words index, so each move costs
+    about as much as the words it touches (not the whole word list).
+    '''
+
+    def __init__(self, teachingOrder, wordGraphemes, wordCounts):
+        '''
+        teachingOrder: list of graphemes (no sight word lessons)
+        wordGraphemes: list of sets of graphemes, one per word
+        wordCounts:    list of word counts (the same length as wordGraphemes)
+        Words using a grapheme that is not in the teaching order are never decodable, so
+        they are left out of the cost (but their counts are still in the total).
+        '''
+        self.order = list(teachingOrder)
+        # work with grapheme ids (their position in the starting order)
+        ids = {gr: i for i, gr in enumerate(self.order)}
+        self.position = list(range(len(self.order)))
+        self.totalCount = sum(wordCounts)
+        self.words = []
+        self.counts = []
+        self.wordsWithGrapheme = [[] for gr in self.order]
+        for graphemes, count in zip(wordGraphemes, wordCounts):
+            if count == 0 or not graphemes or any(gr not in ids for gr in graphemes):
+                continue
+            w = len(self.words)
+            self.words.append(tuple(ids[gr] for gr in graphemes))
+            self.counts.append(count)
+            for gid in self.words[w]:
+                self.wordsWithGrapheme[gid].append(w)
+        # lesson: the lesson (position in the order) from which each word is decodable
+        self.lesson = [max(self.position[gid] for gid in word) for word in self.words]
+        self.cost = sum(count * lesson for count, lesson in zip(self.counts, self.lesson))
+        self.ids = ids
+
+    def Coverage(self, cost=None):
+        '''
+        Return the average (over all lessons) fraction of the word count that is decodable.
+        '''
+        if cost is None:
+            cost = self.cost
+        numLessons = len(self.order)
+        decodable = sum(self.counts)
+        if numLessons == 0 or self.totalCount == 0:
+            return 0.0
+        # each decodable word counts in every lesson from its own to the last one
+        return (numLessons * decodable - cost) / (numLessons * self.totalCount)
+
+    def SwapDelta(self, i, j):
+        '''
+        Return (change in cost, list of (word, new lesson)) for swapping lessons i and j.
+        '''
+        a = self.ids[self.order[i]]
+        b = self.ids[self.order[j]]
+        position = self.position
+        position[a], position[b] = j, i
+        delta = 0
+        changes = []
+        for w in set(self.wordsWithGrapheme[a]).union(self.wordsWithGrapheme[b]):
+            lesson = max(position[gid] for gid in self.words[w])
+            if lesson != self.lesson[w]:
+                delta += self.counts[w] * (lesson - self.lesson[w])
+                changes.append((w, lesson))
+        position[a], position[b] = i, j
+        return delta, changes
+
+    def Swap(self, i, j, delta, changes):
+        '''
+        Swap lessons i and j, given the result of SwapDelta(i, j).
+        '''
+        a = self.ids[self.order[i]]
+        b = self.ids[self.order[j]]
+        self.position[a], self.position[b] = j, i
+        self.order[i], self.order[j] = self.order[j], self.order[i]
+        for w, lesson in changes:
+            self.lesson[w] = lesson
+        self.cost += delta
+
+
+def ImproveTeachingOrder(scorer, seconds, seed):
+    '''
+    Local search: try random swaps of lessons (mostly nearby ones), keeping every swap
+    that doesn't make the cost worse, until the time is up.
+    Returns:
+        the scorer, with its improved order and cost
+    '''
+    rng = random.Random(seed)
+    n = len(scorer.order)
+    if n < 2:
+        return scorer
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        # check the time every so often, not for every move
+        for _ in range(200):
+            i = rng.randrange(n)
+            if rng.random() < 0.5:
+                # a nearby lesson
+                j = min(n - 1, max(0, i + rng.choice((-3, -2, -1, 1, 2, 3))))
+            else:
+                j = rng.randrange(n)
+            if i == j:
+                continue
+            delta, changes = scorer.SwapDelta(i, j)
+            if delta <= 0:
+                # keep moves that are no worse, so the search can cross flat stretches
+                scorer.Swap(i, j, delta, changes)
+    return scorer
+
+
+# the words shared by all searches in a worker process (set by _InitOptimizeWorker)
+_optimizeData = None
+
+
+def _InitOptimizeWorker(wordGraphemes, wordCounts):
+    global _optimizeData
+    _optimizeData = (wordGraphemes, wordCounts)
+
+
+def _ImproveTeachingOrderInWorker(teachingOrder, seconds, seed):
+    wordGraphemes, wordCounts = _optimizeData
+    scorer = ImproveTeachingOrder(CoverageScorer(teachingOrder, wordGraphemes, wordCounts), seconds, seed)
+    return scorer.order, scorer.cost
+
+
+def OptimizeTeachingOrder(teachingOrder, wordsAsGraphemes, analysisWords, seconds=OPTIMIZE_SECONDS,
+                          progress=None, stop=None, roundSeconds=1.0, maxWorkers=None):
+    '''
+    Search for a teaching order with more cumulative decodable coverage than the
+    given one (e.g. from the elimination algorithm), by local search in worker processes.
+    The search runs in rounds: in each round every worker process improves the best
+    order so far (with a different random seed), and the best result is kept.
+
+    Parameters: teachingOrder (list) - graphemes to reorder (no sight word lessons)
+                wordsAsGraphemes (dict) - { word, list of graphemes in word }
+                analysisWords (dict) - { word, word count (tokens or types) }
+                seconds (float) - time budget for the search
+                progress (callable) - optional, called after each round with the fraction of time used
+                stop (callable) - optional, returns True to stop after the current round
+                roundSeconds (float) - time for each round
+                maxWorkers (int) - maximum number of processes (default: one per core)
+    Return value: tuple of (best teaching order, its coverage, coverage of the given order),
+                  coverage being as returned by CoverageScorer.Coverage
+    '''
+    words = list(analysisWords)
+    wordGraphemes = [set(wordsAsGraphemes[word]) for word in words]
+    wordCounts = [analysisWords[word] for word in words]
+    scorer = CoverageScorer(teachingOrder, wordGraphemes, wordCounts)
+    startCoverage = scorer.Coverage()
+    bestOrder, bestCost = list(teachingOrder), scorer.cost
+
+    if maxWorkers is None:
+        maxWorkers = os.cpu_count() or 1
+    start = time.monotonic()
+    seed = 0
+    # start the worker processes fresh, not forked (see CompareVariants)
+    with ProcessPoolExecutor(max_workers=maxWorkers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_InitOptimizeWorker,
+                             initargs=(wordGraphemes, wordCounts)) as pool:
+        while True:
+            elapsed = time.monotonic() - start
+            if elapsed >= seconds or (stop is not None and stop()):
+                break
+            roundTime = min(roundSeconds, seconds - elapsed)
+            futures = [pool.submit(_ImproveTeachingOrderInWorker, bestOrder, roundTime, seed + k)
+                       for k in range(maxWorkers)]
+            seed += maxWorkers
+            for future in futures:
+                order, cost = future.result()
+                if cost < bestCost:
+                    bestOrder, bestCost = order, cost
+            if progress is not None:
+                progress(min(1.0, (time.monotonic() - start) / seconds))
+    return bestOrder, scorer.Coverage(bestCost), startCoverage
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+#
+# test_concordance
+#
+# Checks the concordance and the phrases found from the word index of the texts against
+# the search through the lines of the texts that they replaced. Run with: python -m unittest discover tests
+
+import os
+import re
+import sys
+import random
+import gettext
+import tempfile
+import unittest
+
+# run PrimerPrep without a user interface (see BATCH_MODE), so GTK isn't needed
+if '--batch' not in sys.argv[1:]:
+    sys.argv.append('--batch')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import PrimerPrep
+PrimerPrep._ = gettext.gettext
+
+
+def Breaks(wordBreakChars, start):
+    '''The word break characters, escaped for a RegEx character class.'''
+    breaks = start
+    for char in wordBreakChars:
+        if char in '.^$*+-?{}\\[]|()':
+            breaks = breaks + '\\'
+        breaks = breaks + char
+    return breaks
+
+
+def DirectConcordance(analysis, word):
+    '''The concordance as it was found before the texts were indexed, by splitting every line
+    of every text on the word.'''
+    breaks = Breaks(analysis.wordBreakChars, ' ')
+    concordance = ""
+    for fileNum in range(len(analysis.fileNames)):
+        for line in analysis.fileLines[fileNum]:
+            wordsFound = re.split("(" + word + ")", line, 0, re.I)
+            for i in range(1, len(wordsFound), 2):
+                pretext = "".join(wordsFound[:i])
+                if len(pretext) > 0 and pretext[-1] not in breaks:
+                    continue
+                posttext = "".join(wordsFound[i+1:])
+                if len(posttext) > 0 and posttext[0] not in breaks:
+                    continue
+                if len(pretext) > 40: pretext = pretext[-40:]
+                if len(posttext) > 40: posttext = posttext[:40]
+                m = re.search(r'[\s' + breaks + ']+(.+)', pretext)
+                if m:
+                    pretext = m.group(1)
+                m = re.search(r'(.+[\s' + breaks + ']+)', posttext)
+                if m:
+                    posttext = m.group(1)
+                concordance += pretext.replace('\t', ' ') + "\t" + \
+                               wordsFound[i].replace('\t', ' ') + "\t" + \
+                               posttext.replace('\t', ' ') + "\n"
+    return concordance[:-1]
+
+
+def DirectPhrases(analysis, row):
+    '''The phrases as they were found before the words were ranked by lesson, by splitting every
+    line of every text and looking up each word in the list of possible words.'''
+    breaks = Breaks(analysis.wordBreakChars, '')
+    possibleWords = []
+    for i in range(row+1):
+        letter = analysis.teachingOrder[i]
+        if isinstance(letter, int):
+            possibleWords.extend(analysis.sightWords[letter-1])
+        else:
+            possibleWords.extend(analysis.graphemeExampleWords[letter])
+    phraseList = []
+    for fileNum in range(len(analysis.fileNames)):
+        for line in analysis.fileLines[fileNum]:
+            line = line.replace('\t', ' ')
+            linewords = re.split(r'([\s' + breaks + r']+)', line)
+            i = 0
+            while i < len(linewords):
+                if linewords[i].lower() in possibleWords:
+                    j = i+2
+                    while j < len(linewords) and linewords[j].lower() in possibleWords:
+                        j += 2
+                    if j > i+2:
+                        strt = max(i-6, 0)
+                        fnsh = min(j+6, len(linewords))
+                        phrase = ''.join(linewords[strt:i]) + "\t"
+                        possiblePhrase = ''.join(linewords[i:j-1])
+                        phrase += possiblePhrase + "\t"
+                        phrase += ''.join(linewords[j-1:fnsh]) + "\n"
+                        phraseList.append((len(possiblePhrase), phrase))
+                        i = j
+                i += 1
+    return ''.join(s for (ln, s) in sorted(phraseList, reverse=True))[:-1]
+
+
+def MakeText(seed):
+    '''Return the lines of a fixed text, with capitals, punctuation, tabs and long lines.'''
+    rng = random.Random(seed)
+    words = ['bala', 'Bala', 'mota', 'sina', 'tobi', 'kunga', 'ngoma', 'bébé', 'mabala', 'ka', 'ba', 'la',
+             'tobitobi', 'shoko', 'ngo', 'Ngoma', 'ima', 'lamo', 'bo']
+    breaks = [' ', ' ', ' ', ' ', ', ', '. ', '! ', ' (', ') ', '\t', ' "', '" ', '; ', ' - ', '  ']
+    lines = []
+    for i in range(120):
+        line = ''
+        for j in range(rng.randint(0, 25)):
+            line += rng.choice(words) + rng.choice(breaks)
+        lines.append(line.strip(' ') + '\n')
+    return ''.join(lines)
+
+
+class ConcordanceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.analysis = PrimerPrep.WordAnalysis()
+        self.analysis.AddWordsFromFiles([self.WriteText('first.txt', MakeText(1)),
+                                         self.WriteText('second.txt', MakeText(2))])
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def WriteText(self, name, text):
+        filename = os.path.join(self.folder.name, name)
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return filename
+
+    def test_concordance_matches_direct_search(self):
+        for word in self.analysis.words:
+            self.assertEqual(self.analysis.GetConcordance(word), DirectConcordance(self.analysis, word), word)
+        # a word that is not in the texts, or only part of a word
+        self.assertEqual(self.analysis.GetConcordance('xyz'), '')
+        self.assertEqual(self.analysis.GetConcordance('bal'), DirectConcordance(self.analysis, 'bal'))
+
+    def test_concordance_after_word_breaks_change(self):
+        # the user makes the hyphen word forming, so the texts are split into words again
+        self.analysis.wordBreakChars.remove('-')
+        self.analysis.wordFormChars.append('-')
+        self.analysis.ReprocessTextsForWords()
+        for word in self.analysis.words:
+            self.assertEqual(self.analysis.GetConcordance(word), DirectConcordance(self.analysis, word), word)
+
+    def test_concordances_text_has_each_word(self):
+        words = ['bala', 'ngoma', 'xyz', 'tobi']
+        expected = ''.join(word + '\t' + line + '\n' for word in words
+                           for line in DirectConcordance(self.analysis, word).split('\n') if line)
+        self.assertEqual(''.join(self.analysis.IterConcordancesText(words)), expected)
+
+    def test_phrases_match_direct_search(self):
+        analysis = self.analysis
+        analysis.CalculateTeachingOrder(True, True)
+        for row in range(len(analysis.teachingOrder)):
+            self.assertEqual(analysis.GetPhrases(row), DirectPhrases(analysis, row), row)
+        # with a sight word lesson, and the lessons in another order
+        analysis.sightWords = [['mota', 'sina']]
+        analysis.teachingOrder.insert(2, 1)
+        analysis.teachingOrder.reverse()
+        analysis.StoreTeachingOrderBuildExampleWordsLists(analysis.teachingOrder)
+        for row in range(len(analysis.teachingOrder)):
+            self.assertEqual(analysis.GetPhrases(row), DirectPhrases(analysis, row), row)
+
+
+if __name__ == '__main__':
+    unittest.main()
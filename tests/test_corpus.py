@@ -0,0 +1,310 @@
+#!/usr/bin/python3
+#
+# test_corpus
+#
+# Checks the compact storage of the texts (corpus.py), and the word tokenizer
+# (text_import.py), against the lists of lines they store or split.
+# Run with: python -m unittest discover tests
+
+import os
+import re
+import sys
+import pickle
+import random
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import corpus
+import text_import
+
+
+# word breaking characters, with RegEx special characters and one with a ZWJ
+WORD_BREAK_CHARS = [' ', '\xa0', ',', '.', '!', '?', '(', ')', '"', '-', ']', '^', '\\', '\u200d\u0964']
+
+
+def MakeLines(seed, numLines):
+    '''Return a fixed list of lines, with empty lines and lines that aren't ASCII.'''
+    rng = random.Random(seed)
+    words = ['bala', 'Bala', 'mota', 'sina', 'tobi', 'ngoma', 'bébé', 'ka', 'का',
+             '\U0001d11e', '12', 'ba-li']
+    breaks = [' ', ' ', ' ', ', ', '. ', '! ', ' (', ') ', '\t', ' "', '" ', '? ', ' - ']
+    lines = []
+    for i in range(numLines):
+        line = ''
+        for j in range(rng.choice([0, 1, 3, 8, 20])):
+            line += rng.choice(words) + rng.choice(breaks)
+        lines.append(line)
+    return lines
+
+
+class TextLinesTests(unittest.TestCase):
+
+    def setUp(self):
+        # more lines than are decoded at one time
+        self.lines = MakeLines(1, corpus.TextLines.CHUNK_LINES * 2 + 17)
+
+    def CheckLines(self, textLines, lines):
+        self.assertEqual(len(textLines), len(lines))
+        self.assertEqual(list(textLines), lines)
+        self.assertEqual(textLines, lines)
+        for i in (0, len(lines) // 2, -1) if lines else ():
+            self.assertEqual(textLines[i], lines[i])
+        for start, stop in ((0, None), (5, 40), (None, 3), (-10, None), (1200, 1000), (0, len(lines) + 5)):
+            self.assertEqual(textLines[start:stop], lines[start:stop])
+            self.assertEqual(textLines.Text(start, stop), '\n'.join(lines[start:stop]))
+        self.assertEqual(''.join(chunk + '\n' for chunk in textLines.Chunks(100)),
+                         ''.join(line + '\n' for line in lines))
+        with self.assertRaises(IndexError):
+            textLines[len(lines)]
+
+    def test_lines_round_trip(self):
+        textLines = corpus.TextLines(self.lines)
+        self.CheckLines(textLines, self.lines)
+        # the offsets are where the lines start in the UTF-8 buffer
+        self.assertEqual(bytes(textLines.data), ''.join(line + '\n' for line in self.lines).encode('utf-8'))
+        # adding lines to the end
+        more = MakeLines(2, 50)
+        textLines.Extend(more)
+        self.CheckLines(textLines, self.lines + more)
+        # an empty text
+        self.CheckLines(corpus.TextLines(), [])
+
+    def test_line_with_newline(self):
+        # (e.g. from a lexicon)
+        lines = ['ba', 'first\nsecond', '', 'la']
+        self.CheckLines(corpus.TextLines(lines), lines)
+
+    def test_pickled_lines(self):
+        textLines = corpus.TextLines(self.lines)
+        unpickled = pickle.loads(pickle.dumps(textLines))
+        self.assertEqual(unpickled, textLines)
+        self.CheckLines(unpickled, self.lines)
+        # an unpickled text can be added to
+        unpickled.Extend(['one more'])
+        self.CheckLines(unpickled, self.lines + ['one more'])
+
+
+class CacheFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cacheFolder = os.path.join(self.folder.name, 'cache')
+        corpus.SetCacheFolder(self.cacheFolder)
+        self.lines = MakeLines(3, 500)
+        self.textLines = []
+
+    def tearDown(self):
+        # (the files have to be closed before they can be deleted on some systems)
+        for textLines in self.textLines:
+            textLines.Unmap()
+        corpus.SetCacheFolder(None)
+        self.folder.cleanup()
+
+    def TextLines(self, lines):
+        textLines = corpus.TextLines(lines)
+        self.textLines.append(textLines)
+        return textLines
+
+    def test_lines_from_cache_file(self):
+        textLines = self.TextLines(self.lines)
+        self.assertIsNone(textLines.cacheFile)
+        textLines.UpdateCache()
+        # the cache file is named after the text, and has the lines as they were stored
+        data = ''.join(line + '\n' for line in self.lines).encode('utf-8')
+        self.assertEqual(textLines.cacheFile,
+                         os.path.join(self.cacheFolder, hashlib.sha1(data).hexdigest() + '.txt'))
+        with open(textLines.cacheFile, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(list(textLines), self.lines)
+        self.assertEqual(textLines.Text(10, 20), '\n'.join(self.lines[10:20]))
+        # adding lines brings the text back into memory
+        textLines.Extend(['one more'])
+        self.assertIsNone(textLines.cacheFile)
+        self.assertEqual(list(textLines), self.lines + ['one more'])
+        # and keeping texts in memory again
+        textLines.UpdateCache()
+        corpus.SetCacheFolder(None)
+        textLines.UpdateCache()
+        self.assertIsNone(textLines.cacheFile)
+        self.assertEqual(list(textLines), self.lines + ['one more'])
+
+    def test_same_text_reuses_cache_file(self):
+        textLines = self.TextLines(self.lines)
+        textLines.UpdateCache()
+        stat = os.stat(textLines.cacheFile)
+        # the same text (e.g. loaded again, or unpickled from a project) uses the same file, without writing it
+        again = self.TextLines(self.lines)
+        again.UpdateCache()
+        unpickled = pickle.loads(pickle.dumps(textLines))
+        self.textLines.append(unpickled)
+        for other in (again, unpickled):
+            self.assertEqual(other.cacheFile, textLines.cacheFile)
+            self.assertEqual(other, textLines)
+        self.assertEqual(os.stat(textLines.cacheFile).st_mtime_ns, stat.st_mtime_ns)
+        self.assertEqual(os.listdir(self.cacheFolder), [os.path.basename(textLines.cacheFile)])
+        # a different text has its own file, and the files no text uses are deleted
+        other = self.TextLines(MakeLines(4, 10))
+        other.UpdateCache()
+        self.assertEqual(len(os.listdir(self.cacheFolder)), 2)
+        corpus.RemoveUnusedCacheFiles([other])
+        self.assertEqual(os.listdir(self.cacheFolder), [os.path.basename(other.cacheFile)])
+
+    def test_empty_text_stays_in_memory(self):
+        textLines = self.TextLines([])
+        textLines.UpdateCache()
+        self.assertIsNone(textLines.cacheFile)
+        self.assertEqual(list(textLines), [])
+
+
+class WordTokenizerTests(unittest.TestCase):
+
+    def test_split_matches_regex_split(self):
+        tokenizer = text_import.WordTokenizer(WORD_BREAK_CHARS)
+        # the RegEx that the texts were split with before there was a shared tokenizer
+        breaks = ''
+        for char in WORD_BREAK_CHARS:
+            if char in '.^$*+-?{}\\[]|()':
+                breaks = breaks + '\\'
+            breaks = breaks + char
+        lines = MakeLines(5, 200) + ['a]b^c\\d\u0964e', '  ba\u200d la  ', '', '-']
+        for line in lines:
+            words = re.split('[\\s' + breaks + ']+', line)
+            self.assertEqual(tokenizer.Split(line), words, line)
+            withBreaks = tokenizer.SplitWithBreaks(line)
+            self.assertEqual(withBreaks[0::2], words)
+            self.assertEqual(''.join(withBreaks), line)
+            self.assertEqual(tokenizer.Words(line), [word for word in words if word])
+            tokens = list(tokenizer.Tokens(line))
+            self.assertEqual([word for start, end, word in tokens], tokenizer.Words(line))
+            for start, end, word in tokens:
+                self.assertEqual(line[start:end], word)
+                word, wordBreaks = tokenizer.WordAndBreaks(line, start)
+                self.assertEqual(line[start:end], word)
+                self.assertEqual(tokenizer.Split(wordBreaks), ['', ''] if wordBreaks else [''])
+
+
+class TokenizedLinesTests(unittest.TestCase):
+
+    def setUp(self):
+        # more lines than are split at one time
+        self.lines = corpus.TextLines(MakeLines(6, corpus.TextLines.CHUNK_LINES + 300))
+        self.tokenizer = text_import.WordTokenizer(WORD_BREAK_CHARS)
+
+    def CheckTokens(self, tokens, lines, tokenizer):
+        self.assertEqual(len(tokens), len(lines))
+        for lineNum, line in enumerate(lines):
+            lineIds = tokens.Line(lineNum)
+            self.assertEqual([tokens.vocab[tokenId] for tokenId in lineIds], tokenizer.SplitWithBreaks(line))
+            self.assertEqual(tokens.Join(lineIds), line)
+        # the words counted from the tokens are the words counted from the lines
+        self.assertEqual(list(text_import.FilterWordCounts(tokens.WordCounts()).items()),
+                         list(text_import.FilterWordCounts(text_import.CountWords(lines, tokenizer)).items()))
+
+    def test_tokens_match_lines(self):
+        tokens = corpus.TokenizedLines(self.lines, self.tokenizer)
+        self.CheckTokens(tokens, self.lines, self.tokenizer)
+        # and in some of the lines (with the empty words at the start and end of lines)
+        lineNums = [0, 5, 999, 1000, 1299]
+        expected = Counter(word for lineNum in lineNums for word in self.tokenizer.Split(self.lines[lineNum]))
+        self.assertEqual(list(tokens.WordCounts(lineNums).items()), list(expected.items()))
+
+    def test_retokenized_lines_match_new_tokens(self):
+        tokens = corpus.TokenizedLines(self.lines, self.tokenizer)
+        # the hyphen becomes word forming, so only the lines with a hyphen are split again
+        tokenizer = text_import.WordTokenizer([char for char in WORD_BREAK_CHARS if char != '-'])
+        lineNums = [lineNum for lineNum, line in enumerate(self.lines) if '-' in line]
+        tokens.Retokenize(lineNums, [self.lines[lineNum] for lineNum in lineNums], tokenizer)
+        self.assertEqual(tokens.wordBreakChars, tokenizer.wordBreakChars)
+        self.CheckTokens(tokens, self.lines, tokenizer)
+        self.assertIn('ba-li', tokens.WordCounts())
+        # and back again, a part of the lines at a time
+        tokens.Retokenize(lineNums[::2], [self.lines[lineNum] for lineNum in lineNums[::2]], self.tokenizer)
+        tokens.Retokenize(lineNums[1::2], [self.lines[lineNum] for lineNum in lineNums[1::2]], self.tokenizer)
+        self.CheckTokens(tokens, self.lines, self.tokenizer)
+        self.assertEqual(list(tokens.WordCounts().items()),
+                         list(corpus.TokenizedLines(self.lines, self.tokenizer).WordCounts().items()))
+        # splitting no lines again changes nothing
+        ids = tokens.ids
+        tokens.Retokenize([], [], self.tokenizer)
+        self.assertEqual(tokens.ids, ids)
+
+    def NumpyOptions(self):
+        '''Return numpy (if it is installed) and None, to check that the words are found the same way
+        without it.'''
+        return [corpus.np, None] if corpus.np is not None else [None]
+
+    def test_word_positions_match_direct_scan(self):
+        for np in self.NumpyOptions():
+            with self.subTest(numpy=np is not None), mock.patch.object(corpus, 'np', np):
+                tokens = corpus.TokenizedLines(self.lines, self.tokenizer)
+                wordIds = tokens.ids[0::2]
+                for word in ['bala', 'bébé', '\U0001d11e', 'ba', 'xyz', '']:
+                    tokenIds = tokens.WordIds(word)
+                    self.assertEqual(sorted(tokenIds),
+                                     [tokenId for tokenId, token in enumerate(tokens.vocab) if token.lower() == word])
+                    expected = [wordNum for wordNum, tokenId in enumerate(wordIds) if tokenId in tokenIds]
+                    self.assertEqual(tokens.WordPositions(tokenIds), expected, word)
+                    found = [(lineNum, pos) for lineNum in range(len(tokens))
+                             for pos, tokenId in enumerate(tokens.Line(lineNum))
+                             if pos % 2 == 0 and tokenId in tokenIds]
+                    self.assertEqual(tokens.Find(tokenIds), found, word)
+                # both cases of bala
+                self.assertEqual(len(tokens.WordIds('bala')), 2)
+
+    def test_ranked_pairs_match_direct_scan(self):
+        wordRanks = {'bala': 0, 'ka': 1, 'mota': 1, 'sina': 2, 'tobi': 3, 'bébé': 5}
+        for np in self.NumpyOptions():
+            with self.subTest(numpy=np is not None), mock.patch.object(corpus, 'np', np):
+                tokens = corpus.TokenizedLines(self.lines, self.tokenizer)
+                tokens.RankWords(wordRanks)
+                for maxRank in range(7):
+                    # the words ranked up to maxRank that are followed by another one in the same line
+                    found = []
+                    for lineNum in range(len(tokens)):
+                        words = [wordRanks.get(tokens.vocab[tokenId].lower(), maxRank + 1) <= maxRank
+                                 for tokenId in tokens.Line(lineNum)[0::2]]
+                        found += [(lineNum, i * 2) for i in range(len(words) - 1) if words[i] and words[i + 1]]
+                    self.assertEqual(list(tokens.FindRanked(maxRank)), found, maxRank)
+
+    def DirectSentences(self, tokens, wordRanks, sentenceEnds):
+        '''Split each line into sentences, and rank the sentences with all their words ranked
+        by the highest rank of their words.'''
+        sentences = []
+        for lineNum in range(len(tokens)):
+            lineStart = tokens.lineStarts[lineNum]
+            lineStop = tokens.lineStarts[lineNum + 1]
+            lineTokens = [tokens.vocab[tokenId] for tokenId in tokens.ids[lineStart:lineStop]]
+            start = 0
+            for pos in range(1, len(lineTokens), 2):
+                if lineTokens[pos] == '' or any(char in sentenceEnds for char in lineTokens[pos]):
+                    words = [word for word in lineTokens[start:pos:2] if word]
+                    if words and all(word.lower() in wordRanks for word in words):
+                        rank = max(wordRanks[word.lower()] for word in words)
+                        sentences.append((rank, lineStart + start, lineStart + pos + 1))
+                    start = pos + 1
+        return sentences
+
+    def test_ranked_sentences_match_direct_split(self):
+        for np in self.NumpyOptions():
+            with self.subTest(numpy=np is not None), mock.patch.object(corpus, 'np', np):
+                wordRanks = {'bala': 0, 'ka': 1, 'mota': 1, 'sina': 2, 'tobi': 3, 'bébé': 5, 'ba': 6, 'li': 6}
+                tokens = corpus.TokenizedLines(self.lines, self.tokenizer)
+                tokens.RankWords(dict(wordRanks))
+                expected = self.DirectSentences(tokens, wordRanks, text_import.SENTENCE_ENDS)
+                self.assertTrue(expected)
+                self.assertEqual(list(tokens.RankSentences(text_import.SENTENCE_ENDS)), expected)
+                # the sentences are ranked again when the ranks change
+                del wordRanks['ba']
+                tokens.RankWords(dict(wordRanks))
+                self.assertEqual(list(tokens.RankSentences(text_import.SENTENCE_ENDS)),
+                                 self.DirectSentences(tokens, wordRanks, text_import.SENTENCE_ENDS))
+                # and with other sentence ends
+                self.assertEqual(list(tokens.RankSentences('.')), self.DirectSentences(tokens, wordRanks, '.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
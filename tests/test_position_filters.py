@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+#
+# test_position_filters
+#
+# Checks the syllable and word position filters of the Teaching Order tab against the
+# per-word check they replaced. Run with: python -m unittest discover tests
+
+import os
+import sys
+import random
+import gettext
+import itertools
+import tempfile
+import unittest
+
+# run PrimerPrep without a user interface (see BATCH_MODE), so GTK isn't needed
+if '--batch' not in sys.argv[1:]:
+    sys.argv.append('--batch')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import PrimerPrep
+PrimerPrep._ = gettext.gettext
+
+
+def DirectPositionFilter(graphemes, letter, position_filters, vowels, vowelsTogether, consonantsTogether):
+    '''The position filter as it was checked for each example word, before the syllables were
+    cached: True if a single occurrence of the letter passes both the syllable and the word filter.'''
+    syl_part    = position_filters[:3]
+    word_part   = position_filters[3:]
+    syl_active  = not all(syl_part) and any(syl_part)
+    word_active = not all(word_part) and any(word_part)
+    _, syllabified = PrimerPrep.process_syllables(graphemes, letter, vowel_graphemes=vowels,
+                                                  vowels_together=vowelsTogether,
+                                                  consonants_together=consonantsTogether)
+    n_orig = len(graphemes)
+    m      = len(syllabified)
+    oi = 0
+    for si, g in enumerate(syllabified):
+        if g == '.':
+            continue
+        if g == letter:
+            prev_g = syllabified[si - 1] if si > 0 else None
+            next_g = syllabified[si + 1] if si < m - 1 else None
+            is_syl_init = (prev_g is None or prev_g == '.')
+            is_syl_fin  = (next_g is None or next_g == '.')
+            is_syl_med  = not is_syl_init and not is_syl_fin
+            is_word_init = (oi == 0)
+            is_word_fin  = (oi == n_orig - 1)
+            is_word_med  = not is_word_init and not is_word_fin
+            syl_ok  = (not syl_active or
+                       (syl_part[0] and is_syl_init) or
+                       (syl_part[1] and is_syl_med)  or
+                       (syl_part[2] and is_syl_fin))
+            word_ok = (not word_active or
+                       (word_part[0] and is_word_init) or
+                       (word_part[1] and is_word_med)  or
+                       (word_part[2] and is_word_fin))
+            if syl_ok and word_ok:
+                return True
+        oi += 1
+    return False
+
+
+class PositionFilterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        # a fixed text, with doubled vowels and consonants and a digraph (ng)
+        rng = random.Random(13)
+        syllables = ['a', 'ba', 'ka', 'ma', 'na', 'nga', 'ta', 'bi', 'ki', 'mi', 'ngi', 'ti', 'u', 'tu',
+                     'ku', 'aa', 'maa', 'i', 'ang', 'am', 'it', 'ul', 'ka', 'mma', 'tta']
+        words = ['bala', 'kaamba', 'ngoma', 'mmala', 'banga', 'a', 'ng']
+        words += [''.join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for i in range(200)]
+        filename = os.path.join(self.folder.name, 'text.txt')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(' '.join(words) + '\n')
+        self.analysis = PrimerPrep.WordAnalysis()
+        self.analysis.AddWordsFromFiles([filename])
+        self.analysis.digraphs = ['ng']
+        self.analysis.CalculateTeachingOrder(True, True)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def CheckAllFilters(self):
+        analysis = self.analysis
+        for position_filters in itertools.product((True, False), repeat=6):
+            mask = PrimerPrep.position_filter_mask(position_filters)
+            for letter, words in analysis.graphemeWords.items():
+                expected = {word for word in words
+                            if DirectPositionFilter(analysis.wordsAsGraphemes[word], letter, position_filters,
+                                                    analysis.user_defined_vowels,
+                                                    analysis.syllable_vowels_together,
+                                                    analysis.syllable_consonants_together)}
+                self.assertEqual(analysis.GetPositionWords(letter, mask), expected, (letter, position_filters))
+                # and again, as found for the last filters
+                self.assertEqual(analysis.GetPositionWords(letter, mask), expected, (letter, position_filters))
+
+    def test_position_words_match_direct_check(self):
+        self.CheckAllFilters()
+
+    def test_position_words_after_settings_change(self):
+        self.CheckAllFilters()
+        # the syllables are found again when the settings they depend on change
+        self.analysis.syllable_vowels_together = True
+        self.analysis.syllable_consonants_together = True
+        self.CheckAllFilters()
+        self.analysis.user_defined_vowels = {'a', 'i'}
+        self.CheckAllFilters()
+        self.analysis.digraphs = []
+        self.analysis.CalculateTeachingOrder(True, True)
+        self.CheckAllFilters()
+
+    def test_teaching_order_row_uses_filters(self):
+        analysis = self.analysis
+        analysis.position_filters = (True, True, True, True, False, False)
+        letter = 'b'
+        row = analysis.TeachingOrderRow(letter)
+        expected = [word for word in analysis.graphemeExampleWords[letter]
+                    if DirectPositionFilter(analysis.wordsAsGraphemes[word], letter, analysis.position_filters,
+                                            None, False, False)]
+        self.assertTrue(expected)
+        self.assertEqual(row[2].replace('<b>', '').replace('</b>', ''), '\u200B' + '  '.join(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+#
+# test_remove_text
+#
+# Checks that removing a text (or lexicon) leaves the analysis as if the other texts
+# had been loaded on their own. Run with: python -m unittest discover tests
+
+import os
+import sys
+import gettext
+import tempfile
+import unittest
+
+# run PrimerPrep without a user interface (see BATCH_MODE), so GTK isn't needed
+if '--batch' not in sys.argv[1:]:
+    sys.argv.append('--batch')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import PrimerPrep
+PrimerPrep._ = gettext.gettext
+
+
+class RemoveTextTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def WriteText(self, name, text):
+        filename = os.path.join(self.folder.name, name)
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return filename
+
+    def test_remove_lexicon_parts_of_speech(self):
+        analysis = PrimerPrep.WordAnalysis()
+        analysis.AddWordsFromFiles([self.WriteText('text.txt', "bala mota\n")])
+        analysis.AddLexiconData('nouns.lift', [{'lexeme': 'bala', 'pos': 'Noun'},
+                                               {'lexeme': 'Mota', 'pos': 'Noun'}])
+        analysis.AddLexiconData('verbs.lift', [{'lexeme': 'bala', 'pos': 'Verb'},
+                                               {'lexeme': 'sina', 'pos': 'Verb'},
+                                               {'lexeme': 'kuna'}])
+        self.assertEqual(analysis.pos_tags, {'Noun', 'Verb'})
+        self.assertEqual(analysis.words_with_pos['bala'], ['Noun', 'Verb'])
+        analysis.active_pos_filters = {'Verb'}
+
+        analysis.RemoveFile(2)
+        self.assertEqual(analysis.pos_tags, {'Noun'})
+        self.assertEqual(analysis.words_with_pos, {'bala': ['Noun'], 'mota': ['Noun']})
+        # the filter on a part of speech that is gone is dropped
+        self.assertIsNone(analysis.active_pos_filters)
+        self.assertNotIn('sina', analysis.words)
+
+        # removing a text keeps the parts of speech of the lexicon
+        analysis.RemoveFile(0)
+        self.assertEqual(analysis.words_with_pos, {'bala': ['Noun'], 'mota': ['Noun']})
+        self.assertEqual(analysis.fileNames, ['nouns.lift'])
+
+    def test_remove_from_old_project_keeps_parts_of_speech(self):
+        analysis = PrimerPrep.WordAnalysis()
+        analysis.AddLexiconData('nouns.lift', [{'lexeme': 'bala', 'pos': 'Noun'}])
+        analysis.AddWordsFromFiles([self.WriteText('text.txt', "bala mota\n")])
+        # (as for a project saved before the parts of speech of each file were kept)
+        analysis.filePOS = [None, None]
+        analysis.RemoveFile(1)
+        self.assertEqual(analysis.words_with_pos, {'bala': ['Noun']})
+
+
+if __name__ == '__main__':
+    unittest.main()
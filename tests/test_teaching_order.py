@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+#
+# test_teaching_order
+#
+# Checks the teaching order engines (teaching_order.py) against a direct calculation
+# on a fixed word list. Run with: python -m unittest discover tests
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import teaching_order
+
+
+def MakeWords():
+    '''Return a fixed word list, as WordAnalysis.words: { word, [count, manual?, excluded?, affix form, markup] }.'''
+    words = {}
+    def Add(word, count, affixForm=None, excluded=False):
+        affixForm = affixForm or word
+        words[word] = [count, affixForm != word, excluded, affixForm, '<b>' + affixForm + '</b>']
+    Add('bala', 5)
+    Add('mabala', 2, 'ma- bala')
+    Add('balang', 1, 'bala -ng')
+    Add('ngoma', 3)
+    Add('sina', 1)
+    Add('tobi', 4)
+    Add('kunga', 2)
+    Add('mota', 2, excluded=True)
+    Add('bébé', 1)
+    Add('shoko', 3)
+    # and some more words made up from the same letters (the same ones every time)
+    rng = random.Random(7)
+    letters = ['a', 'b', 'd', 'e', 'i', 'k', 'l', 'm', 'n', 'o', 's', 't', 'u', 'ng', 'sh', 'é']
+    for i in range(300):
+        word = ''.join(rng.choice(letters) for _ in range(rng.randint(1, 6)))
+        if word not in words:
+            Add(word, rng.choice([1, 1, 1, 2, 3, 5, 8]))
+    return words
+
+
+def SplitWords(words, excludeAffixes, countWords):
+    '''Split the words into graphemes (with the digraphs ng and sh), as CalculateTeachingOrder does.'''
+    findGraphemes = teaching_order.GraphemeRegex(['ng', 'sh'], False)
+    return teaching_order.SplitWords(words, excludeAffixes, countWords, findGraphemes.findall)
+
+
+def DirectElimination(graphemeUse, morphemesAsGraphemes, analysisMorphemes, wordsAsGraphemes,
+                      analysisWords, wordAffixForms, countWords):
+    '''The elimination algorithm as it was written before the engines were indexed: every round,
+    count each remaining grapheme in all remaining morphemes, and take the least frequent.'''
+    remainingGraphemes = list(graphemeUse)
+    remainingMorphemes = dict(analysisMorphemes)
+    remainingWords = list(analysisWords)
+    teachingOrder = []
+    graphemeExampleWords = {}
+    while remainingGraphemes:
+        freq = {gr: sum((cnt if countWords else 1) for morph, cnt in remainingMorphemes.items()
+                        if gr in morphemesAsGraphemes[morph])
+                for gr in remainingGraphemes}
+        last = min(freq, key=freq.get)
+        remainingGraphemes.remove(last)
+        if graphemeUse[last] > 0:
+            teachingOrder.append(last)
+        words = [word for word in remainingWords if last in wordsAsGraphemes[word]]
+        for word in words:
+            remainingWords.remove(word)
+            for morph in wordAffixForms[word].split(' '):
+                remainingMorphemes.pop(teaching_order.MorphemeKeyForRemoval(morph), None)
+        graphemeExampleWords[last] = sorted(words, key=lambda word: -analysisWords[word])
+    teachingOrder.reverse()
+    return teachingOrder, graphemeExampleWords
+
+
+class TeachingOrderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.words = MakeWords()
+        self.wordAffixForms = {word: info[3] for word, info in self.words.items()}
+
+    def Split(self, excludeAffixes, countWords):
+        (self.wordsAsGraphemes, self.morphemesAsGraphemes, self.analysisWords, self.analysisMorphemes,
+         self.graphemeUse) = SplitWords(self.words, excludeAffixes, countWords)
+        self.graphemeWords = teaching_order.BuildGraphemeWordIndex(self.wordsAsGraphemes)
+        self.wordRank = teaching_order.BuildWordRank(self.analysisWords)
+
+    def Elimination(self, countWords):
+        return teaching_order.EliminationTeachingOrder(
+            self.graphemeUse, self.morphemesAsGraphemes, self.analysisMorphemes, self.graphemeWords,
+            self.analysisWords, self.wordRank, self.wordAffixForms, countWords)
+
+    def test_elimination_matches_direct_calculation(self):
+        for excludeAffixes in (True, False):
+            for countWords in (True, False):
+                with self.subTest(excludeAffixes=excludeAffixes, countWords=countWords):
+                    self.Split(excludeAffixes, countWords)
+                    expected = DirectElimination(self.graphemeUse, self.morphemesAsGraphemes,
+                                                 self.analysisMorphemes, self.wordsAsGraphemes,
+                                                 self.analysisWords, self.wordAffixForms, countWords)
+                    self.assertEqual(self.Elimination(countWords), expected)
+
+    def test_elimination_small_word_list(self):
+        words = {'ba': [3, False, False, 'ba', '<b>ba</b>'],
+                 'ab': [1, False, False, 'ab', '<b>ab</b>'],
+                 'bi': [1, False, False, 'bi', '<b>bi</b>']}
+        self.words = words
+        self.wordAffixForms = {word: info[3] for word, info in words.items()}
+        self.Split(True, True)
+        # i is the least used (1), so it is taught last; without bi, a and b are both used 4 times,
+        # and the tie goes to the grapheme found first (b), which is taught later
+        self.assertEqual(self.Elimination(True), (['a', 'b', 'i'], {'i': ['bi'], 'b': ['ba', 'ab'], 'a': []}))
+
+    def test_moved_lessons_match_full_rebuild(self):
+        self.Split(True, True)
+        teachingOrder, graphemeExampleWords = self.Elimination(True)
+        # the example words found by the elimination are the ones given out from the end of the order
+        self.assertEqual(graphemeExampleWords, teaching_order.ExampleWordsLists(
+            teachingOrder, self.graphemeWords, self.analysisWords, self.wordRank))
+        # with a sight word lesson, drag lessons around as the user would
+        teachingOrder.insert(4, 1)
+        rng = random.Random(3)
+        for move in range(100):
+            i = rng.randrange(len(teachingOrder))
+            j = rng.randrange(len(teachingOrder))
+            newOrder = list(teachingOrder)
+            newOrder.insert(j, newOrder.pop(i))
+            lo, hi = teaching_order.ChangedSpan(teachingOrder, newOrder)
+            if i != j:
+                self.assertEqual((lo, hi), (min(i, j), max(i, j)))
+            else:
+                # nothing changed
+                self.assertGreater(lo, hi)
+            graphemeExampleWords.update(teaching_order.ReassignExampleWords(
+                newOrder, lo, hi, graphemeExampleWords, self.graphemeWords, self.analysisWords, self.wordRank))
+            teachingOrder = newOrder
+            self.assertEqual(graphemeExampleWords, teaching_order.ExampleWordsLists(
+                teachingOrder, self.graphemeWords, self.analysisWords, self.wordRank), move)
+
+    def test_changed_span_only_for_reordering(self):
+        self.assertEqual(teaching_order.ChangedSpan(['a', 'b', 'c', 'd'], ['a', 'c', 'b', 'd']), (1, 2))
+        self.assertIsNone(teaching_order.ChangedSpan(['a', 'b', 'c'], ['a', 'b', 'x']))
+        self.assertIsNone(teaching_order.ChangedSpan(['a', 'b', 'c'], ['a', 'b']))
+
+    def test_swapped_lessons_match_full_cost(self):
+        self.Split(True, True)
+        teachingOrder = self.Elimination(True)[0]
+        words = list(self.wordsAsGraphemes)
+        wordGraphemes = [set(self.wordsAsGraphemes[word]) for word in words]
+        wordCounts = [self.analysisWords[word] for word in words]
+        # a word with a grapheme that is never taught, and one with no count
+        wordGraphemes += [{'a', 'x'}, {'a'}]
+        wordCounts += [4, 0]
+
+        def FullCost(order):
+            lessons = {gr: i for i, gr in enumerate(order)}
+            return sum(count * max(lessons[gr] for gr in graphemes)
+                       for graphemes, count in zip(wordGraphemes, wordCounts)
+                       if count and all(gr in lessons for gr in graphemes))
+
+        scorer = teaching_order.CoverageScorer(teachingOrder, wordGraphemes, wordCounts)
+        self.assertEqual(scorer.cost, FullCost(teachingOrder))
+        self.assertEqual(scorer.totalCount, sum(wordCounts))
+        rng = random.Random(11)
+        for move in range(200):
+            i = rng.randrange(len(teachingOrder))
+            j = rng.randrange(len(teachingOrder))
+            newOrder = list(scorer.order)
+            newOrder[i], newOrder[j] = newOrder[j], newOrder[i]
+            delta, changes = scorer.SwapDelta(i, j)
+            self.assertEqual(scorer.cost + delta, FullCost(newOrder), move)
+            # only keep some of the moves, as the search does
+            if rng.random() < 0.5:
+                scorer.Swap(i, j, delta, changes)
+                self.assertEqual(scorer.order, newOrder)
+            self.assertEqual(scorer.cost, FullCost(scorer.order), move)
+        # the coverage is the average fraction of the count that is decodable at each lesson
+        n = len(scorer.order)
+        lessons = {gr: i for i, gr in enumerate(scorer.order)}
+        decodable = [sum(count for graphemes, count in zip(wordGraphemes, wordCounts)
+                         if all(gr in lessons and lessons[gr] <= k for gr in graphemes))
+                     for k in range(n)]
+        self.assertAlmostEqual(scorer.Coverage(), sum(decodable) / (n * sum(wordCounts)))
+
+    @unittest.skipIf(teaching_order.np is None, "numpy is not installed")
+    def test_bitset_engine_matches_indexed_engine(self):
+        for excludeAffixes in (True, False):
+            for countWords in (True, False):
+                with self.subTest(excludeAffixes=excludeAffixes, countWords=countWords):
+                    self.Split(excludeAffixes, countWords)
+                    bitsets = teaching_order.EliminationTeachingOrderBitsets(
+                        self.graphemeUse, self.morphemesAsGraphemes, self.analysisMorphemes,
+                        self.wordsAsGraphemes, self.analysisWords, self.wordAffixForms, countWords)
+                    self.assertEqual(bitsets, self.Elimination(countWords))
+
+    @unittest.skipIf(teaching_order.np is None, "numpy is not installed")
+    def test_bitsets_weighted_sums(self):
+        np = teaching_order.np
+        # more graphemes than fit in a byte, and more rows than are unpacked at one time
+        graphemes = ['g{}'.format(i) for i in range(21)]
+        graphemeIds = {gr: i for i, gr in enumerate(graphemes)}
+        rng = random.Random(5)
+        sets = [rng.sample(graphemes, rng.randint(0, 6)) + ['not a grapheme']
+                for row in range(teaching_order.GraphemeBitsets.CHUNK_ROWS + 100)]
+        bitsets = teaching_order.GraphemeBitsets(graphemeIds, sets)
+        weights = np.array([rng.randint(0, 9) for row in sets], dtype=np.int64)
+        rows = np.array(sorted(rng.sample(range(len(sets)), 500)))
+        for gr, gid in graphemeIds.items():
+            self.assertEqual(bitsets.Column(gid).tolist(), [gr in s for s in sets])
+            self.assertEqual(bitsets.WeightedSums(weights)[gid],
+                             sum(weight for s, weight in zip(sets, weights) if gr in s))
+            self.assertEqual(bitsets.WeightedSums(weights[rows], rows)[gid],
+                             sum(weights[row] for row in rows if gr in sets[row]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+#
+# test_word_breaks
+#
+# Checks that words are split the same way however the texts are added, when the
+# user has changed which characters break words, and that the characters of the texts
+# are counted as they are found line by line. Run with: python -m unittest discover tests
+
+import os
+import sys
+import gettext
+import tempfile
+import unittest
+
+# run PrimerPrep without a user interface (see BATCH_MODE), so GTK isn't needed
+if '--batch' not in sys.argv[1:]:
+    sys.argv.append('--batch')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import PrimerPrep
+PrimerPrep._ = gettext.gettext
+
+
+def DirectChars(fileLines, separateCombDiacritics):
+    '''Find and count the characters of the texts line by line, as they were found before the
+    character clusters of each text were counted.
+    Return value: (chars, wordFormChars, wordBreakChars), as in WordAnalysis'''
+    findChars = PrimerPrep.text_import.CharsRegex(separateCombDiacritics)
+    chars = {' ': 0, '\xa0': 0}
+    wordFormChars = []
+    wordBreakChars = [' ', '\xa0']
+    for lines in fileLines:
+        for line in lines:
+            for char in findChars.findall(line):
+                PrimerPrep.text_import.AddChar(char, chars, wordFormChars, wordBreakChars)
+                chars[PrimerPrep.text_import.CharKey(char)] += 1
+    return chars, wordFormChars, wordBreakChars
+
+
+# a text with combining diacritics (also on punctuation), ZWJs and word joiners
+CHARS_TEXT = ("ba\u0301la mo\u0300ta-\u0301 \u200d\u2060ka\u200dlo 'tobi' ndo\u0301\u0300ngo.\n"
+              "o\u0302 sa\u200d\u0301; e\u0301 ba\u0301la (mo\u0300ta)\n")
+
+
+class WordBreakTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def WriteText(self, name, text):
+        filename = os.path.join(self.folder.name, name)
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return filename
+
+    def test_text_added_after_break_made_word_forming(self):
+        analysis = PrimerPrep.WordAnalysis()
+        analysis.AddWordsFromFiles([self.WriteText('first.txt', "it's here\n")])
+        # the user makes the apostrophe word forming
+        analysis.wordBreakChars.remove("'")
+        analysis.wordFormChars.append("'")
+        analysis.ReprocessTextsForWords()
+        analysis.AddWordsFromFiles([self.WriteText('second.txt', "don't go. it's\n")])
+        self.assertEqual(sorted(analysis.words), sorted(["it's", 'here', "don't", 'go']))
+        # the second text's words were split with the project's word break characters
+        self.assertNotIn("'", analysis.fileWordBreakChars[1])
+        # and removing the first text leaves the words of the second one
+        analysis.RemoveFile(0)
+        self.assertEqual(sorted(analysis.words), sorted(["it's", "don't", 'go']))
+
+    def test_words_stay_in_text_order(self):
+        analysis = PrimerPrep.WordAnalysis()
+        analysis.AddWordsFromFiles([self.WriteText('first.txt', "ba-li mo ba\n"),
+                                    self.WriteText('second.txt', "na li ba-li\n")])
+        self.assertEqual(list(analysis.words), ['ba', 'li', 'mo', 'na'])
+        analysis.words['mo'][2] = True
+        # the user makes the hyphen word forming, so ba-li is a word (found first in the texts)
+        analysis.wordBreakChars.remove('-')
+        analysis.wordFormChars.append('-')
+        analysis.ReprocessTextsForWords()
+        self.assertEqual(list(analysis.words), ['ba-li', 'mo', 'ba', 'na', 'li'])
+        # what is set for a word is kept
+        self.assertTrue(analysis.words['mo'][2])
+        # removing a text gives the words of the other text in the same order as loading it on its own
+        analysis.RemoveFile(0)
+        self.assertEqual([(word, info[0]) for word, info in analysis.words.items()],
+                         [('na', 1), ('li', 1), ('ba-li', 1)])
+
+    def test_char_counts_match_direct_count(self):
+        for separate in (False, True):
+            with self.subTest(separateCombDiacritics=separate):
+                analysis = PrimerPrep.WordAnalysis()
+                analysis.separateCombDiacritics = separate
+                analysis.AddWordsFromFiles([self.WriteText('first.txt', CHARS_TEXT),
+                                            self.WriteText('second.txt', "kalo, ba\u0301la\n")])
+                expected = DirectChars(analysis.fileLines, separate)
+                self.assertEqual((analysis.chars, analysis.wordFormChars, analysis.wordBreakChars), expected)
+                self.assertEqual(list(analysis.chars), list(expected[0]))
+                # the lists are made again from the counts of each text when the setting is changed
+                analysis.separateCombDiacritics = not separate
+                analysis.ReprocessTextsForChars()
+                expected = DirectChars(analysis.fileLines, not separate)
+                self.assertEqual((analysis.chars, analysis.wordFormChars, analysis.wordBreakChars), expected)
+                # and the counts are the same when they are counted again (as for an old project)
+                analysis.BuildFileCharCounts()
+                self.assertEqual(analysis.chars, expected[0])
+                # removing a text subtracts its counts
+                analysis.RemoveFile(1)
+                self.assertEqual({char: cnt for char, cnt in analysis.chars.items() if cnt},
+                                 {char: cnt for char, cnt in DirectChars(analysis.fileLines, not separate)[0].items()
+                                  if cnt})
+
+    def test_reprocessed_words_match_fresh_load(self):
+        texts = [self.WriteText('first.txt', "it's ba-li, mo. na'a li-li\n" * 3 + "plain words only\n"),
+                 self.WriteText('second.txt', "no breaks here\n"),
+                 self.WriteText('third.txt', "ba-li 'na' it's-it's\n")]
+        analysis = PrimerPrep.WordAnalysis()
+        analysis.AddWordsFromFiles(texts)
+        # split the first text into words (as for a concordance), so it is only split again where needed
+        analysis.GetConcordance('li')
+        for formChars in (["'"], ["'", '-'], ['-'], []):
+            with self.subTest(formChars=formChars):
+                for char in ("'", '-'):
+                    if char in formChars and char in analysis.wordBreakChars:
+                        analysis.wordBreakChars.remove(char)
+                        analysis.wordFormChars.append(char)
+                    elif char not in formChars and char in analysis.wordFormChars:
+                        analysis.wordFormChars.remove(char)
+                        analysis.wordBreakChars.append(char)
+                analysis.ReprocessTextsForWords()
+                # load the texts again with the same word break characters
+                fresh = PrimerPrep.WordAnalysis()
+                fresh.wordBreakChars = list(analysis.wordBreakChars)
+                fresh.wordFormChars = list(analysis.wordFormChars)
+                fresh.chars = dict.fromkeys(analysis.chars, 0)
+                fresh.AddWordsFromFiles(texts)
+                self.assertEqual([(word, info[0]) for word, info in analysis.words.items()],
+                                 [(word, info[0]) for word, info in fresh.words.items()])
+                self.assertEqual(analysis.fileWordCounts, fresh.fileWordCounts)
+                for word in ('li', "it's", 'ba-li', "na'a", 'li-li'):
+                    self.assertEqual(analysis.GetConcordance(word), fresh.GetConcordance(word), word)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,486 @@
+#!/usr/bin/python3
+#
+# text_import
+#
+# Reading texts and finding their characters and words for PrimerPrep. Nothing
+# in this module uses GTK, so texts can be analyzed in worker processes.
+
+import os
+import re
+import itertools
+import unicodedata
+from collections import Counter
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import corpus
+try:
+    # numpy is only needed to count the characters of a text faster
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# number of lines analyzed at a time
+CHUNK_LINES = 1000
+
+# characters that end a sentence (when they aren't word forming characters)
+SENTENCE_ENDS = '.!?\u037e\u0589\u061f\u06d4\u0964\u0965\u104b\u1362\u1367\u203c\u2047\u2048\u2049\u3002\uff01\uff0e\uff1f'
+
+
+def ReadTextLines(filename, isSFMFile, processSFMs, ignoreLines, onlyLines):
+    '''
+    Read the lines of a text file one at a time, processing SFMs as we go: lines without
+    an SFM are attached to the previous line, and SFM lines are removed or kept as configured.
+
+    Parameters: filename (str) - file name and path of file to read
+                isSFMFile (bool) - True if the file is an SFM file
+                processSFMs (bool) - True to remove the SFMs (and the ignored lines)
+                ignoreLines, onlyLines (str) - '|' separated SFMs whose lines are removed/kept
+    Return value: generator of str, each non-empty line of text (not yet normalized)
+    '''
+    # compile the SFM marker patterns once for the whole file
+    ignoreMatch = None
+    onlyMatch = None
+    if processSFMs:
+        if len(ignoreLines) > 0:
+            ignoreMatch = re.compile(r'\\(' + ignoreLines + ')( |\n)')
+        if len(onlyLines) > 0:
+            onlyMatch = re.compile(r'\\(' + onlyLines + ')( |\n)')
+    removeSFMs = re.compile(r'\\\w+')
+
+    # the current line is kept as a list of parts, so attaching continuation lines isn't quadratic
+    parts = None
+    prevLineRemoved = False
+    firstline = True
+    with open(filename, 'r', encoding='utf-8', newline='') as f:
+        for block in f:
+            # split at any Unicode line boundary (as codecs did), not just at \r and \n
+            for line in block.splitlines(True):
+                if firstline:
+                    # get rid of any Unicode BOM at the beginning of the file
+                    line = re.sub('^\ufeff', '', line)
+                    firstline = False
+
+                if isSFMFile and not line.startswith('\\') and parts is not None:
+                    # no SFM on this line
+                    if not prevLineRemoved:
+                        # attach to previous (with SFM) line
+                        parts.append(line.strip())
+                else:
+                    prevLineRemoved = False
+                    if processSFMs:
+                        # remove entire line including text for certain SFMs
+                        if ignoreMatch is not None and ignoreMatch.match(line):
+                            line = ''
+                        # keep only certain SFM markers/lines in text
+                        if onlyMatch is not None and not onlyMatch.match(line):
+                            line = ''
+                        line = removeSFMs.sub('', line)  # remove any other SFMs
+                    line = line.strip()  # remove leading/trailing spaces
+                    # check to see if we have anything left in the line
+                    if len(line) > 0:
+                        # the previous line is complete now
+                        if parts is not None:
+                            yield ' '.join(parts)
+                        parts = [line]
+                    else:
+                        prevLineRemoved = True
+    if parts is not None:
+        yield ' '.join(parts)
+
+
+def NormalizeLines(lines, checkDecomposed=True):
+    '''
+    Convert lines to NFD, checking in the same pass whether they had any composed characters
+    (weren't NFD) and any decomposed characters (weren't NFC). The quick checks of
+    unicodedata.is_normalized are used, so text that is already NFD is not normalized at all.
+    The lines are handled all at once, joined with newlines (which never combine with anything).
+
+    Parameters: lines (list of str) - lines of text
+                checkDecomposed (bool) - False to skip checking for decomposed characters (e.g. if already found)
+    Return value: (list of str, bool, bool) - the NFD lines, and whether composed/decomposed characters were found
+    '''
+    text = '\n'.join(lines)
+    decomposed = checkDecomposed and not unicodedata.is_normalized('NFC', text)
+    composed = not unicodedata.is_normalized('NFD', text)
+    if not composed:
+        return lines, composed, decomposed
+    nfdLines = unicodedata.normalize('NFD', text).split('\n')
+    if len(nfdLines) != len(lines):
+        # a line has a newline in it (e.g. from a lexicon), so normalize line by line
+        nfdLines = [unicodedata.normalize('NFD', line) for line in lines]
+    return nfdLines, composed, decomposed
+
+
+def CharsRegex(separateCombDiacritics):
+    '''
+    Build a RegEx that splits out individual characters (combining diacritics or not).
+    '''
+    # make sure to attach any zero width joiners (ZWJs U+200d)
+    # but remove/ignore Word Joiners (WJs U+2060) - they are only there
+    # to ensure that the ZWJs get attached to the right character
+    if separateCombDiacritics:
+        # RegEx that treats combining diacritics separately
+        return re.compile(r'(\u200d?[^\u2060]\u200d?)')
+    else:
+        # RegEx that includes combining diacritics with their preceding base characters
+        return re.compile(r'(\u200d?[^\u2060][\u0300-\u036f]*\u200d?)')
+
+
+def CharKey(char):
+    '''
+    Return the character (from CharsRegex) as it is listed: a base character that is not a letter
+    or mark with combining diacritics is listed as a space.
+    '''
+    if 0x300 <= ord(char[-1]) < 0x36f:
+        # last character is a combining diacritic
+        #  get base character
+        ch = char[0]
+        if ch == '\u200d':
+            # skip over initial ZWJ, if present
+            ch = char[1]
+        if unicodedata.category(ch)[0] not in 'LM':
+            # base is not a letter or a mark
+            # just ignore it for building the character list
+            # this addresses problems like when the base character is '-' or ']', messing up regexes
+            return ' '
+    return char
+
+
+def AddChar(char, chars, wordFormChars, wordBreakChars):
+    '''
+    If the character (from CharsRegex) has not been seen yet, add it to the word forming
+    or word breaking list (based on unicodedata.category).
+
+    Parameters: char (str) - character, with any combining diacritics and ZWJs
+                chars (dict) - characters seen so far, with their counts
+                wordFormChars, wordBreakChars (list of str) - word forming/breaking characters
+    Return value: the character if it was added to wordBreakChars, otherwise None
+    '''
+    char = CharKey(char)
+    if char in chars:
+        return None
+    # this char has not been seen yet, mark as seen (not counted yet)
+    chars[char] = 0
+    ch = char[0]
+    if ch == '\u200d':
+        # if it's a ZWJ, get the next letter
+        ch = char[1]
+    # add to either word forming/breaking character list
+    if unicodedata.category(ch)[0] in 'LM':
+        # only letters or combining marks
+        wordFormChars.append(char)
+        return None
+    #  this would include punctuation, symbols, spaces, control codes
+    wordBreakChars.append(char)
+    return char
+
+
+def CharCounts(clusterCounts, separateCombDiacritics):
+    '''
+    Count the characters as they are listed (see CharKey), from the counts of the character
+    clusters (found by CharsRegex(False), i.e. with their combining diacritics and ZWJs), splitting
+    the clusters into separate characters if we treat combining diacritics separately.
+    The characters are in the order they were first found, if the clusters are.
+
+    Parameters: clusterCounts (Counter) - { character cluster, count }
+                separateCombDiacritics (bool) - True to treat combining diacritics as separate characters
+    Return value: Counter of { character, count }
+    '''
+    splitChars = CharsRegex(True) if separateCombDiacritics else None
+    charCounts = Counter()
+    for cluster, cnt in clusterCounts.items():
+        for char in (splitChars.findall(cluster) if splitChars else (cluster,)):
+            charCounts[CharKey(char)] += cnt
+    return charCounts
+
+
+def CountCodePoints(text):
+    '''
+    Count the code points in the text (with numpy, if available).
+
+    Return value: Counter of { code point, count } (not in any particular order)
+    '''
+    if np is None or len(text) == 0:
+        return Counter(text)
+    codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    if codes.max() < 0x10000:
+        counts = np.bincount(codes)
+        codes = np.flatnonzero(counts)
+        counts = counts[codes]
+    else:
+        # (the counts of all possible code points would take too much memory)
+        codes, counts = np.unique(codes, return_counts=True)
+    return Counter(dict(zip(map(chr, codes.tolist()), counts.tolist())))
+
+
+def CountCharClusters(lines):
+    '''
+    Count the character clusters (found by CharsRegex(False)) in the lines.
+
+    Return value: Counter of { character cluster, count }, in the order the clusters are first found
+    '''
+    findClusters = CharsRegex(False)
+    clusterCounts = Counter()
+    for i in range(0, len(lines), CHUNK_LINES):
+        clusterCounts.update(findClusters.findall('\u2060'.join(lines[i:i+CHUNK_LINES])))
+    return clusterCounts
+
+
+class WordTokenizer:
+    '''
+    Splits text into words, at spaces (including newlines) or any of the word breaking characters.
+    The RegExes are compiled once, so one tokenizer can be shared by everything that splits text
+    into words (word counts, concordances, phrases, lesson texts), which then all split it the same way.
+    '''
+
+    def __init__(self, wordBreakChars):
+        '''
+        wordBreakChars: iterable of str, the word breaking characters
+        '''
+        # (a tuple, so it can be compared with the current word breaking characters)
+        self.wordBreakChars = tuple(wordBreakChars)
+        # RegEx character class of the word breaks; each code point is escaped, since a word
+        # breaking character can be more than one code point (with a ZWJ)
+        self.breakClass = '[\\s' + re.escape(''.join(self.wordBreakChars)) + ']'
+        wordClass = '[^' + self.breakClass[1:]
+        self.splitWords = re.compile(self.breakClass + '+')
+        self.splitWordsAndBreaks = re.compile('(' + self.breakClass + '+)')
+        self.findWords = re.compile(wordClass + '+')
+        self.matchWordAndBreaks = re.compile('(' + wordClass + '*)(' + self.breakClass + '*)')
+
+    def Split(self, text):
+        '''
+        Return the list of words in the text (with an empty word first/last if the text
+        starts/ends with word breaks).
+        '''
+        return self.splitWords.split(text)
+
+    def SplitWithBreaks(self, text):
+        '''
+        Return the list of words in the text (as Split) with the word breaks between them,
+        so the words are the even elements and joining the list gives the text again.
+        '''
+        return self.splitWordsAndBreaks.split(text)
+
+    def Words(self, text):
+        '''Return the list of (non-empty) words in the text.'''
+        return self.findWords.findall(text)
+
+    def Tokens(self, text):
+        '''Return a generator of (start, end, word) for each word in the text.'''
+        for m in self.findWords.finditer(text):
+            yield m.start(), m.end(), m.group()
+
+    def WordAndBreaks(self, text, pos):
+        '''
+        Return the word that starts at pos in the text (empty if there are word breaks at pos)
+        and the word breaks after it (empty at the end of the text).
+        '''
+        return self.matchWordAndBreaks.match(text, pos).groups()
+
+
+def CountWords(lines, tokenizer):
+    '''
+    Split the lines into words and count them (as they are, not lowercased or filtered).
+    Lines are split a chunk at a time, joined with newlines (which are always word breaks).
+
+    Parameters: lines (corpus.TextLines or list of str) - lines of text
+                tokenizer (WordTokenizer) - splits the lines into words
+    Return value: Counter of { word, count }, in the order the words are first found
+    '''
+    if isinstance(lines, corpus.TextLines):
+        # the stored text already has the lines joined with newlines
+        chunks = lines.Chunks(CHUNK_LINES)
+    else:
+        chunks = ('\n'.join(lines[i:i+CHUNK_LINES]) for i in range(0, len(lines), CHUNK_LINES))
+    wordCounts = Counter()
+    for chunk in chunks:
+        wordCounts.update(tokenizer.Split(chunk))
+    return wordCounts
+
+
+def FilterWordCounts(wordCounts):
+    '''
+    Lowercase the words counted by CountWords, leaving out empty words and words that are just
+    numbers/hyphens.
+
+    Return value: Counter of { word, count }, in the order the words are first found
+    '''
+    numbersOnly = re.compile(r'^[-\d]+$')
+    filtered = Counter()
+    for word, cnt in wordCounts.items():
+        if (len(word) == 0) or numbersOnly.match(word):
+            # this word is empty or just numbers/hyphens, skip to next word
+            continue
+        filtered[word.lower()] += cnt
+    return filtered
+
+
+class TextAnalysis:
+    '''
+    The characters and words of one text, found by AnalyzeLines, starting from no characters
+    seen yet (except space and no-break space), so that texts can be analyzed independently and
+    then merged (in order) into the analysis.
+    '''
+
+    def __init__(self):
+        # the lines of the text, normalized to NFD
+        self.lines = corpus.TextLines()
+        # the characters found (as in WordAnalysis.chars), in the order they were first found
+        self.chars = {' ': 0, '\xa0': 0}
+        self.wordFormChars = []
+        self.wordBreakChars = [' ', '\xa0']
+        # Counter of { word, count }, words split with wordBreakChars (not lowercased or filtered)
+        self.wordCounts = Counter()
+        # whether any of the lines had composed/decomposed characters (wasn't NFD/NFC)
+        self.containsNFC = False
+        self.containsNFD = False
+        # all code points used in the characters found
+        self.codePoints = set()
+        # Counter of { character cluster (with its combining diacritics and ZWJs), count },
+        # in the order the clusters were first found (see CharCounts)
+        self.clusterCounts = Counter()
+
+
+def AnalyzeLines(lines, separateCombDiacritics):
+    '''
+    Analyze the lines of a text in a single pass: check the encoding, normalize to NFD,
+    count the characters (word forming or breaking) and count the words. Words are counted a
+    chunk of lines at a time, with the word break characters known at that point, so the
+    counts are the same as finding all the characters first and then counting the words.
+
+    Parameters: lines (iterable of str) - lines of text to be analyzed
+                separateCombDiacritics (bool) - True to treat combining diacritics as separate characters
+    Return value: TextAnalysis
+    '''
+    result = TextAnalysis()
+    chars = result.chars
+    wordBreakChars = result.wordBreakChars
+
+    # the character clusters (with their combining diacritics) are always found and counted,
+    # and split into separate characters if we treat combining diacritics separately
+    findClusters = CharsRegex(False)
+    splitChars = CharsRegex(True) if separateCombDiacritics else None
+    # (base characters with combining diacritics)
+    findDiacritics = re.compile(r'[^\u2060][\u0300-\u036f]+')
+    tokenizer = WordTokenizer(wordBreakChars)
+    # clusters and characters (with their diacritics/ZWJs) already looked at, in the order they were found,
+    # and the code points found before the current chunk (and in the current chunk)
+    clusterOrder = {}
+    seenChars = set(chars)
+    seenCodePoints = set()
+    chunkCodePoints = set()
+    clusterCounts = Counter()
+    # set if a new word break character could split a word counted in an earlier chunk
+    recount = False
+
+    lines = iter(lines)
+    while True:
+        # take the next chunk of lines
+        chunk = list(itertools.islice(lines, CHUNK_LINES))
+        if not chunk:
+            break
+        # check the lines for encoding errors and convert them to NFD encoding
+        chunk, composed, decomposed = NormalizeLines(chunk, not result.containsNFD)
+        result.containsNFC = result.containsNFC or composed
+        result.containsNFD = result.containsNFD or decomposed
+        result.lines.Extend(chunk)
+
+        # look at the whole chunk at once (joined with Word Joiners, which findClusters never matches,
+        # so it finds exactly the same clusters as line by line)
+        text = '\u2060'.join(chunk)
+        if '\u200d' in text:
+            chunkClusters = findClusters.findall(text)
+            chunkCounts = Counter(chunkClusters)
+        else:
+            # without ZWJs, the clusters are just the code points, except for the base characters
+            # with diacritics, so count those quickly, and only find the clusters if there are new ones
+            chunkCounts = CountCodePoints(text)
+            for cluster, cnt in Counter(findDiacritics.findall(text)).items():
+                for codePoint in cluster:
+                    chunkCounts[codePoint] -= cnt
+                chunkCounts[cluster] += cnt
+            chunkCounts['\u2060'] = 0
+            chunkCounts = +chunkCounts
+            chunkClusters = findClusters.findall(text) if not clusterOrder.keys() >= chunkCounts.keys() else []
+        clusterCounts.update(chunkCounts)
+        newClusters = chunkCounts.keys() - clusterOrder.keys()
+        for cluster in chunkClusters:
+            if not newClusters:
+                break
+            if cluster not in newClusters:
+                continue
+            # a new cluster (in the order they occur), look at any characters that haven't been seen before
+            newClusters.discard(cluster)
+            clusterOrder[cluster] = None
+            for char in (splitChars.findall(cluster) if splitChars else (cluster,)):
+                if char in seenChars:
+                    continue
+                seenChars.add(char)
+                chunkCodePoints.update(char)
+                breakChar = AddChar(char, chars, result.wordFormChars, wordBreakChars)
+                if breakChar is not None:
+                    tokenizer = WordTokenizer(wordBreakChars)
+                    # (each code point of a new word break character now breaks words)
+                    if seenCodePoints and not seenCodePoints.isdisjoint(breakChar):
+                        recount = True
+
+        # count the words in the chunk (lines can be joined since \n is a word break)
+        result.wordCounts.update(tokenizer.Split('\n'.join(chunk)))
+        seenCodePoints |= chunkCodePoints
+        chunkCodePoints = set()
+
+    if recount:
+        # rare: count the words again with the final word break characters
+        result.wordCounts = CountWords(result.lines, tokenizer)
+    result.codePoints = seenCodePoints
+    result.clusterCounts = Counter({cluster: clusterCounts[cluster] for cluster in clusterOrder})
+    for char, cnt in CharCounts(result.clusterCounts, separateCombDiacritics).items():
+        chars[char] += cnt
+    return result
+
+
+def AnalyzeTextFile(filename, isSFMFile, processSFMs, ignoreLines, onlyLines, separateCombDiacritics):
+    '''
+    Read and analyze a text file (see ReadTextLines and AnalyzeLines). Any error reading the
+    file is passed on.
+
+    Return value: TextAnalysis
+    '''
+    lines = ReadTextLines(filename, isSFMFile, processSFMs, ignoreLines, onlyLines)
+    return AnalyzeLines(lines, separateCombDiacritics)
+
+
+def AnalyzeTextFiles(jobs, maxWorkers=None):
+    '''
+    Analyze text files in parallel worker processes (one file per job). The results come back
+    in the order of the jobs, and an error reading a file is returned as the exception
+    (instead of the TextAnalysis), so the other files can still be used.
+
+    Parameters: jobs (list) - tuples of the parameters of AnalyzeTextFile
+                maxWorkers (int) - maximum number of processes (default: one per core, up to one per file)
+    Return value: list of TextAnalysis (or Exception)
+    '''
+    if maxWorkers is None:
+        maxWorkers = os.cpu_count() or 1
+    maxWorkers = max(1, min(maxWorkers, len(jobs)))
+    results = []
+    if maxWorkers == 1:
+        # no need to start a worker process for a single file (or a single core)
+        for job in jobs:
+            try:
+                results.append(AnalyzeTextFile(*job))
+            except Exception as e:
+                results.append(e)
+        return results
+    # start the worker processes fresh (as on Windows and macOS), since forking a process
+    # with other threads running (e.g. the GTK main loop) can deadlock
+    with ProcessPoolExecutor(max_workers=maxWorkers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(AnalyzeTextFile, *job) for job in jobs]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return results